@@ -0,0 +1,195 @@
+"""Multi-athlete mode: per-athlete tokens and caches in one server process."""
+
+import contextlib
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+
+from activity_store import ActivityStore
+from streams import StreamStore
+
+# Written to a new athlete's .env; strava_auth.py --athlete fills it in
+TOKEN_TEMPLATE = "STRAVA_ACCESS_TOKEN=\nSTRAVA_REFRESH_TOKEN=\n"
+
+_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# Athlete whose client and caches the current tool call uses (None: the .env athlete)
+_current_athlete = contextvars.ContextVar('strava_athlete', default=None)
+
+
+class UnknownAthlete(ValueError):
+    """No athlete directory with a token file for this name"""
+
+
+def current_athlete():
+    """Athlete of the current context, or None in single-athlete use"""
+    return _current_athlete.get()
+
+
+@contextlib.contextmanager
+def using_athlete(athlete):
+    """Serve all Strava calls and cache lookups inside this block for `athlete`"""
+    token = _current_athlete.set(athlete)
+    try:
+        yield athlete
+    finally:
+        _current_athlete.reset(token)
+
+
+def athlete_dir(root, name):
+    """Directory of athlete `name` under `root`; ValueError for names that are not plain"""
+    if not isinstance(name, str) or not _NAME.match(name):
+        raise UnknownAthlete(f"Invalid athlete name: {name!r} (letters, digits, '.', '_' and '-')")
+    return os.path.join(root, name)
+
+
+def create_athlete(root, name):
+    """Create the directory and an empty token file for a new athlete, returns the .env path"""
+    directory = athlete_dir(root, name)
+    os.makedirs(directory, exist_ok=True)
+    env_path = os.path.join(directory, '.env')
+    if not os.path.exists(env_path):
+        fd = os.open(env_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(TOKEN_TEMPLATE)
+    return env_path
+
+
+class Athlete:
+    """
+    One athlete's token file, activity store, stream cache and (lazy) client
+    client_factory(athlete) builds the Strava client from athlete.env_path.
+    """
+
+    def __init__(self, name, directory, client_factory):
+        self.name = name
+        self.directory = directory
+        self.env_path = os.path.join(directory, '.env')
+        self.store = ActivityStore(os.path.join(directory, 'strava_cache.db'))
+        self.stream_store = StreamStore(os.path.join(directory, 'streams'))
+        self.sync_lock = threading.Lock()
+        self.series_lock = threading.Lock()
+        self.backfill = None
+        self.active = 0
+        self.last_used = None
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def client(self):
+        """Authenticated Strava client, created on first use"""
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._client_factory(self)
+        return self._client
+
+    def call(self, func, *args, **kwargs):
+        """func(*args, **kwargs) on behalf of this athlete"""
+        with using_athlete(self):
+            return func(*args, **kwargs)
+
+    def bind(self, func):
+        """func bound to this athlete, for threads that do not inherit the context"""
+        return functools.partial(self.call, func)
+
+    def busy(self):
+        return self.active > 0 or (self.backfill is not None and self.backfill.state == 'running')
+
+
+class AthletePool:
+    """
+    The athletes this process serves, opened on first use
+    Every athlete has a directory under `root` with its own .env token file,
+    cache database and stream cache. An athlete without tool calls or a
+    running backfill for `idle_timeout` seconds is dropped (client, token
+    manager and open stores); its next call opens it again from disk.
+    """
+
+    def __init__(self, root, client_factory, idle_timeout=900, clock=time.monotonic):
+        self.root = root
+        self.client_factory = client_factory
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._athletes = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        """Athletes with a token file, sorted"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if _NAME.match(name) and os.path.isfile(os.path.join(self.root, name, '.env')))
+
+    def stored_athlete_id(self, name):
+        """Strava id kept in athlete `name`'s store (see ActivityStore.athlete_id), read without opening the athlete"""
+        with self._lock:
+            athlete = self._athletes.get(name)
+        if athlete is not None:
+            return athlete.store.athlete_id()
+        return ActivityStore(os.path.join(athlete_dir(self.root, name), 'strava_cache.db')).athlete_id()
+
+    def acquire(self, name, touch=True):
+        """
+        Open (or reuse) athlete `name` for one call; pair with release()
+        touch=False (background work) does not count as use for the idle timeout.
+        """
+        directory = athlete_dir(self.root, name)
+        with self._lock:
+            self._evict_idle()
+            athlete = self._athletes.get(name)
+            if athlete is None:
+                if not os.path.isfile(os.path.join(directory, '.env')):
+                    known = ', '.join(self.names()) or 'none'
+                    raise UnknownAthlete(f"Unknown athlete '{name}' (known: {known}). "
+                                         f"Add one with: python strava_auth.py --athlete {name}")
+                athlete = self._athletes[name] = Athlete(name, directory, self.client_factory)
+                athlete.last_used = self.clock()
+            athlete.active += 1
+            if touch:
+                athlete.last_used = self.clock()
+        return athlete
+
+    def release(self, athlete, touch=True):
+        with self._lock:
+            athlete.active -= 1
+            if touch:
+                athlete.last_used = self.clock()
+
+    @contextlib.contextmanager
+    def use(self, name):
+        """Acquire athlete `name` and make it the current athlete for the block"""
+        athlete = self.acquire(name)
+        try:
+            with using_athlete(athlete):
+                yield athlete
+        finally:
+            self.release(athlete)
+
+    def loaded(self):
+        """Names of the athletes currently open"""
+        with self._lock:
+            return list(self._athletes)
+
+    def _evict_idle(self):
+        now = self.clock()
+        idle = [name for name, athlete in self._athletes.items()
+                if not athlete.busy() and now - athlete.last_used >= self.idle_timeout]
+        for name in idle:
+            del self._athletes[name]
+        return idle
+
+    def evict_idle(self):
+        """Drop athletes that have been idle too long, returns their names"""
+        with self._lock:
+            return self._evict_idle()
+
+    def stop(self):
+        """Stop running backfills (at shutdown)"""
+        with self._lock:
+            open_athletes = list(self._athletes.values())
+        for athlete in open_athletes:
+            if athlete.backfill is not None:
+                athlete.backfill.stop()
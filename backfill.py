@@ -0,0 +1,173 @@
+"""Resumable, concurrent backfill of the athlete's full activity history."""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import BACKGROUND, request_lane
+
+PER_PAGE = 200
+DEFAULT_WORKERS = 4
+
+
+class Backfill:
+    """
+    Pages through /athlete/activities older than a fixed cursor
+    Pages are numbered from the cursor, so they stay stable while new
+    activities arrive and can be fetched concurrently. Every stored page is
+    checkpointed in the activity store; an interrupted backfill continues
+    with the pages that are still missing.
+
+    fetch_page(page, before, per_page) returns the raw activity dicts of a page.
+    estimate_total() optionally returns the expected number of activities (for ETA).
+    """
+
+    def __init__(self, store, fetch_page, estimate_total=None, workers=DEFAULT_WORKERS,
+                 per_page=PER_PAGE, lane=BACKGROUND):
+        self.store = store
+        self.fetch_page = fetch_page
+        self.estimate_total = estimate_total
+        self.workers = workers
+        self.per_page = per_page
+        self.lane = lane
+
+        self.state = 'idle'
+        self.error = None
+        self.total_estimate = None
+        self.started_at = None
+        self.finished_at = None
+        self.pages_fetched = 0
+        self.activities_fetched = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _fetch(self, page, before):
+        # Executor threads do not inherit the caller's lane
+        with request_lane(self.lane):
+            return self.fetch_page(page, before, self.per_page)
+
+    def _next_pages(self, checkpoint):
+        """Up to `workers` missing page numbers, lowest first"""
+        pages, page = [], 1
+        while len(pages) < self.workers:
+            if checkpoint["last_page"] is not None and page > checkpoint["last_page"]:
+                break
+            if page not in checkpoint["pages_done"]:
+                pages.append(page)
+            page += 1
+        return pages
+
+    def run(self):
+        """Fetch all missing pages (blocking), returns the final status"""
+        with self._lock:
+            self.state = 'running'
+            self.error = None
+            self.started_at = time.monotonic()
+            self.finished_at = None
+            self.pages_fetched = self.activities_fetched = 0
+        self._stop.clear()
+
+        try:
+            if self.estimate_total is not None:
+                try:
+                    # Runs in the backfill's own thread, which has no lane either
+                    with request_lane(self.lane):
+                        self.total_estimate = self.estimate_total()
+                except Exception as e:
+                    print(f"Backfill: no activity total for ETA ({e})", file=sys.stderr)
+
+            self.store.start_backfill(self.store.oldest_start() or int(time.time()))
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='strava-backfill') as pool:
+                while not self._stop.is_set():
+                    checkpoint = self.store.backfill_state()
+                    pages = self._next_pages(checkpoint)
+                    if checkpoint["complete"] or not pages:
+                        break
+
+                    before = checkpoint["before"]
+                    futures = [(page, pool.submit(self._fetch, page, before)) for page in pages]
+                    for page, future in futures:
+                        activities = future.result()
+                        self.store.save_backfill_page(page, activities, self.per_page)
+                        with self._lock:
+                            self.pages_fetched += 1
+                            self.activities_fetched += len(activities)
+
+            with self._lock:
+                self.state = 'complete' if self.store.backfill_state()["complete"] else 'stopped'
+        except Exception as e:
+            with self._lock:
+                self.state = 'failed'
+                self.error = str(e)
+        finally:
+            self.finished_at = time.monotonic()
+
+        return self.status()
+
+    def start(self):
+        """Run in a daemon thread, returns False if a run is already in progress"""
+        with self._lock:
+            if self.state == 'running':
+                return False
+            self.state = 'running'
+        threading.Thread(target=self.run, name='strava-backfill', daemon=True).start()
+        return True
+
+    def stop(self):
+        """Stop after the pages currently in flight"""
+        self._stop.set()
+
+    def status(self):
+        """Progress, throughput (activities/sec) and ETA"""
+        checkpoint = self.store.backfill_state()
+        stored = self.store.count()
+
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.monotonic()) - self.started_at
+            rate = self.activities_fetched / elapsed if elapsed else 0.0
+
+            eta = None
+            if self.state == 'running' and rate > 0 and self.total_estimate:
+                eta = max(0, self.total_estimate - stored) / rate
+
+            return {
+                "state": 'complete' if checkpoint["complete"] else self.state,
+                "error": self.error,
+                "stored_activities": stored,
+                "total_estimate": self.total_estimate,
+                "pages_done": len(checkpoint["pages_done"]),
+                "pages_this_run": self.pages_fetched,
+                "activities_this_run": self.activities_fetched,
+                "elapsed": elapsed,
+                "activities_per_sec": round(rate, 1),
+                "eta_seconds": round(eta) if eta is not None else None,
+            }
+
+
+def main():
+    """Run the backfill in the foreground: python backfill.py"""
+    import server
+
+    backfill = server.get_backfill()
+    backfill.start()
+    while True:
+        time.sleep(2)
+        status = backfill.status()
+        eta = f", ETA {status['eta_seconds']}s" if status['eta_seconds'] is not None else ""
+        print(f"{status['stored_activities']} activities stored, "
+              f"{status['activities_per_sec']} activities/sec{eta}")
+        if status['state'] != 'running':
+            break
+
+    if status['error']:
+        print(f"Backfill failed: {status['error']} (run again to resume)")
+    elif status['state'] == 'complete':
+        print("Backfill complete.")
+
+
+if __name__ == "__main__":
+    main()
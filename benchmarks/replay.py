@@ -0,0 +1,85 @@
+"""
+Offline benchmark of call_tool against a recorded Strava cassette
+
+    # once, with real credentials: record the traffic of a normal session
+    STRAVA_CASSETTE=strava.cassette.jsonl.gz STRAVA_CASSETTE_MODE=record python server.py
+
+    # any time later, without network or quota
+    python benchmarks/replay.py strava.cassette.jsonl.gz [--runs 20] [--latency 0.05|recorded]
+
+Every run starts from an empty local cache, so each one includes the
+initial sync from the cassette. Tools whose requests are not in the
+cassette are reported as errors.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CALLS = (
+    ("get_recent_activities", {"limit": 10}),
+    ("get_weekly_stats", {"weeks": 4}),
+    ("get_training_load_analysis", {}),
+    ("get_weekly_training_plan", {}),
+)
+
+
+def replay_session(cassette, calls=DEFAULT_CALLS, latency=None):
+    """Run `calls` once on a fresh cache, returns [(tool, seconds, ok)]"""
+    import server
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        saved = (server.CASSETTE_PATH, server.CASSETTE_MODE, server.CASSETTE_LATENCY,
+                 server._client, server._store, server._stream_store)
+        server.CASSETTE_PATH = os.path.abspath(cassette)
+        server.CASSETTE_MODE = 'replay'
+        server.CASSETTE_LATENCY = latency
+        server._client = None
+        server._store = server.ActivityStore(os.path.join(cache_dir, 'strava_cache.db'))
+        server._stream_store = server.StreamStore(os.path.join(cache_dir, 'streams'))
+        try:
+            for name, arguments in calls:
+                start = time.perf_counter()
+                content = asyncio.run(server.call_tool(name, arguments))
+                elapsed = time.perf_counter() - start
+                results.append((name, elapsed, not content[0].text.startswith("Error executing")))
+        finally:
+            (server.CASSETTE_PATH, server.CASSETTE_MODE, server.CASSETTE_LATENCY,
+             server._client, server._store, server._stream_store) = saved
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('cassette')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--latency', default=None,
+                        help="seconds added to every replayed response, or 'recorded'")
+    args = parser.parse_args()
+    latency = args.latency if args.latency in (None, 'recorded') else float(args.latency)
+
+    timings = {}
+    errors = set()
+    for _ in range(args.runs):
+        for name, seconds, ok in replay_session(args.cassette, latency=latency):
+            timings.setdefault(name, []).append(seconds)
+            if not ok:
+                errors.add(name)
+
+    print(f"Replayed {args.cassette} {args.runs}x (latency: {args.latency or 'none'})")
+    for name, values in timings.items():
+        note = "  (not in cassette)" if name in errors else ""
+        print(f"  {name:<28} median {statistics.median(values) * 1000:8.1f} ms | "
+              f"min {min(values) * 1000:8.1f} ms | max {max(values) * 1000:8.1f} ms{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold-start benchmark: process spawn -> MCP initialize -> first tools/list response
+
+    python benchmarks/startup.py [--runs 10] [--max-ms 2000]
+
+Spawns server.py the way an MCP client does (JSON-RPC over stdio) with the
+background sync disabled and an empty cache, so no Strava credentials or
+network are needed. Exits non-zero when the median time to the tools/list
+response exceeds --max-ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server.py')
+PROTOCOL_VERSION = '2024-11-05'
+TIMEOUT = 60
+
+
+def _send(proc, message):
+    proc.stdin.write((json.dumps(message) + '\n').encode())
+    proc.stdin.flush()
+
+
+def _response(proc, request_id):
+    """Read stdout until the response to `request_id` arrives"""
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited before responding")
+        message = json.loads(line)
+        if message.get('id') == request_id:
+            if 'error' in message:
+                raise RuntimeError(f"server returned an error: {message['error']}")
+            return message['result']
+
+
+def measure_startup(server=SERVER):
+    """One cold start, returns {initialize_ms, list_tools_ms, tools}"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ)
+        env.update({
+            'STRAVA_BACKGROUND_SYNC_INTERVAL': '0',
+            'STRAVA_DB_PATH': os.path.join(cache_dir, 'strava_cache.db'),
+            'STRAVA_STREAMS_DIR': os.path.join(cache_dir, 'streams'),
+        })
+        env.pop('STRAVA_WEBHOOK_PORT', None)
+
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, server], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+        watchdog = threading.Timer(TIMEOUT, proc.kill)
+        watchdog.start()
+        try:
+            _send(proc, {
+                "jsonrpc": "2.0", "id": 1, "method": "initialize",
+                "params": {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "startup-benchmark", "version": "1.0"},
+                },
+            })
+            _response(proc, 1)
+            initialized = time.perf_counter()
+
+            _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+            tools = _response(proc, 2)['tools']
+            listed = time.perf_counter()
+        finally:
+            watchdog.cancel()
+            proc.stdin.close()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+
+    return {
+        "initialize_ms": (initialized - start) * 1000,
+        "list_tools_ms": (listed - start) * 1000,
+        "tools": [tool['name'] for tool in tools],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="fail if the median spawn -> tools/list time is above this")
+    args = parser.parse_args()
+
+    # One unmeasured run to warm the OS file cache and .pyc files
+    measure_startup()
+    runs = [measure_startup() for _ in range(args.runs)]
+
+    print(f"Cold start over {args.runs} runs ({len(runs[0]['tools'])} tools)")
+    for key, label in (("initialize_ms", "spawn -> initialize"), ("list_tools_ms", "spawn -> tools/list")):
+        values = [run[key] for run in runs]
+        print(f"  {label:<22} median {statistics.median(values):7.1f} ms | "
+              f"min {min(values):7.1f} ms | max {max(values):7.1f} ms")
+
+    median = statistics.median(run["list_tools_ms"] for run in runs)
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.1f} ms > {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
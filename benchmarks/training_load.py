@@ -0,0 +1,251 @@
+"""
+Micro-benchmarks for the training-load functions on synthetic histories
+
+    python benchmarks/training_load.py              # compare with the baseline
+    python benchmarks/training_load.py --save       # record a new baseline
+    python benchmarks/training_load.py --years 1 5  # only some history sizes
+
+Each case is timed on 1, 5 and 10 years of generated daily activities.
+Results are compared with benchmarks/baseline.json; any case more than
+--tolerance slower than its baseline fails the run (exit code 1). Timings
+are scaled by a small pure-Python calibration loop so a baseline recorded
+on a faster or slower machine stays roughly comparable.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+HISTORY_YEARS = (1, 5, 10)
+DEFAULT_TOLERANCE = 0.3
+REPEAT = 5
+
+
+@dataclass
+class SyntheticActivity:
+    """Summary activity with the fields the store and the load functions read"""
+    id: int
+    name: str
+    sport_type: str
+    start_date: datetime
+    start_date_local: datetime
+    distance: float
+    moving_time: int
+    elapsed_time: int
+    total_elevation_gain: float
+    average_heartrate: float | None
+    max_heartrate: float | None
+    average_watts: float | None
+    suffer_score: int | None
+
+
+def synthetic_history(years, seed=42, end=None):
+    """
+    Daily training over `years` years, newest first (like the Strava API)
+    Most days have one session, some a second one, with a weekly rest day
+    and build/recovery blocks so ATL, CTL and the ramp rate actually move.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+    activities = []
+    activity_id = 1
+
+    for day in range(years * 365):
+        start = end - timedelta(days=day)
+        if start.weekday() == 0 and rng.random() < 0.8:
+            continue
+        # 4-week blocks: three building weeks, one recovery week
+        block_factor = 0.6 if (day // 7) % 4 == 0 else 1.0 + 0.1 * ((day // 7) % 4)
+
+        for session in range(2 if rng.random() < 0.15 else 1):
+            sport = rng.choice(("Ride", "Ride", "Ride", "Run", "VirtualRide"))
+            minutes = max(20, int(rng.gauss(75, 30) * block_factor))
+            speed = 8.0 if 'Ride' in sport else 3.2
+            session_start = start + timedelta(hours=10 * session)
+            activities.append(SyntheticActivity(
+                id=activity_id,
+                name=f"{sport} {activity_id}",
+                sport_type=sport,
+                start_date=session_start,
+                start_date_local=session_start.replace(tzinfo=None) + timedelta(hours=1),
+                distance=round(minutes * 60 * speed * rng.uniform(0.85, 1.15), 1),
+                moving_time=minutes * 60,
+                elapsed_time=minutes * 60 + rng.randint(0, 900),
+                total_elevation_gain=round(rng.uniform(0, 1200), 1),
+                average_heartrate=round(rng.uniform(120, 160), 1),
+                max_heartrate=round(rng.uniform(165, 190), 1),
+                average_watts=round(rng.uniform(150, 260), 1) if 'Ride' in sport else None,
+                suffer_score=max(5, int(minutes * rng.uniform(0.5, 1.4))),
+            ))
+            activity_id += 1
+
+    return activities
+
+
+def calibrate():
+    """Seconds for a fixed pure-Python workload on this machine"""
+    def workload():
+        total = 0
+        for i in range(200_000):
+            total += i * i % 7
+        return total
+
+    return min(timeit.repeat(workload, number=1, repeat=REPEAT))
+
+
+def time_call(func):
+    """Best per-call time in seconds (timeit autorange, best of REPEAT)"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def _prepare_store(activities, cache_dir):
+    """Point server.py at a store holding `activities`, marked freshly synced"""
+    import server
+    from activity_store import ActivityStore
+
+    store = ActivityStore(os.path.join(cache_dir, f'bench-{len(activities)}.db'))
+    store.upsert_activities(activities)
+    with store._connect() as conn:
+        store._set_state(conn, 'last_sync_at', time.time() + 365 * 24 * 3600)
+    server._store = store
+    return store
+
+
+def benchmark_cases(years, cache_dir):
+    """{case name: callable} for one history size"""
+    import server
+
+    activities = synthetic_history(years)
+    daily_loads = server.daily_loads_from_activities(activities)
+    loads = server.calculate_training_loads(activities)
+    weekly_trends = server.calculate_weekly_trends(daily_loads)
+    ramp_rate = server.calculate_ramp_rate(weekly_trends)
+
+    _prepare_store(activities, cache_dir)
+    # The text rendering of call_tool (run_tool is its synchronous body)
+    for name in ("get_training_load_analysis", "get_weekly_stats", "get_weekly_training_plan"):
+        server.run_tool(name, {"weeks": 52})
+
+    prefix = f"{years}y"
+    return {
+        f"{prefix}/calculate_training_loads": lambda: server.calculate_training_loads(activities),
+        f"{prefix}/calculate_weekly_trends": lambda: server.calculate_weekly_trends(daily_loads),
+        f"{prefix}/calculate_ramp_rate": lambda: server.calculate_ramp_rate(weekly_trends),
+        f"{prefix}/generate_weekly_recommendation": lambda: server.generate_weekly_recommendation(
+            loads["tsb"], loads["atl"], loads["ctl"], ramp_rate),
+        f"{prefix}/render_training_load_analysis": lambda: server.run_tool("get_training_load_analysis", {}),
+        f"{prefix}/render_weekly_stats": lambda: server.run_tool("get_weekly_stats", {"weeks": 52}),
+        f"{prefix}/render_weekly_training_plan": lambda: server.run_tool("get_weekly_training_plan", {}),
+    }
+
+
+def run_benchmarks(years=HISTORY_YEARS):
+    """{case name: seconds per call}"""
+    import server
+
+    results = {}
+    saved_store = server._store
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for history_years in years:
+                for name, func in benchmark_cases(history_years, cache_dir).items():
+                    results[name] = time_call(func)
+    finally:
+        server._store = saved_store
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, scale=1.0):
+    """
+    Cases slower than baseline * (1 + tolerance), as (name, seconds, baseline seconds)
+    `scale` converts baseline timings to this machine (calibration ratio).
+    Cases without a baseline are skipped.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name] * scale
+        if seconds > expected * (1 + tolerance):
+            regressions.append((name, seconds, expected))
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(results, calibration, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump({"calibration": calibration, "results": results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def _format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.1f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, nargs='+', default=list(HISTORY_YEARS))
+    parser.add_argument('--save', action='store_true', help="record the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown vs. the baseline (0.3 = 30%%)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = run_benchmarks(args.years)
+    baseline = load_baseline(args.baseline)
+
+    scale = 1.0
+    if baseline:
+        scale = calibration / baseline["calibration"]
+
+    print(f"{'Case':<45} {'Time':>12} {'Baseline':>12}")
+    for name, seconds in results.items():
+        expected = baseline["results"].get(name) if baseline else None
+        reference = _format_time(expected * scale) if expected else f"{'—':>12}"
+        print(f"{name:<45} {_format_time(seconds):>12} {reference:>12}")
+
+    if args.save:
+        merged = dict(baseline["results"]) if baseline and scale == 1.0 else {}
+        merged.update(results)
+        save_baseline(merged, calibration, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print("\nNo baseline yet, record one with --save")
+        return
+
+    regressions = compare(results, baseline["results"], args.tolerance, scale)
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} case(s) more than {args.tolerance:.0%} slower than the baseline")
+        for name, seconds, expected in regressions:
+            print(f"  {name}: {_format_time(seconds).strip()} vs {_format_time(expected).strip()}")
+        sys.exit(1)
+    print(f"\nOK: no case more than {args.tolerance:.0%} slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,19 @@ echo -e "${YELLOW}[1/3]${NC} Copying files..."
 # Copy project files
 cp "$PROJECT_DIR/server.py"         "$STAGING_DIR/Strava MCP/"
 cp "$PROJECT_DIR/strava_auth.py"    "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/activity_store.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/rate_limit.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/webhook.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/streams.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/training_stress.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/power_curve.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/backfill.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/tokens.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/metrics.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/cassette.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/output_format.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/athletes.py" "$STAGING_DIR/Strava MCP/"
+cp "$PROJECT_DIR/singleflight.py" "$STAGING_DIR/Strava MCP/"
 cp "$PROJECT_DIR/requirements.txt"  "$STAGING_DIR/Strava MCP/"
 cp "$PROJECT_DIR/.env.example"      "$STAGING_DIR/Strava MCP/"
 
@@ -0,0 +1,160 @@
+"""Record and replay Strava HTTP exchanges (offline profiling and CI performance tests)."""
+
+import gzip
+import json
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Response headers worth keeping: body decoding and the rate-limit quota
+KEPT_HEADERS = ('Content-Type', 'X-RateLimit-Limit', 'X-RateLimit-Usage',
+                'X-ReadRateLimit-Limit', 'X-ReadRateLimit-Usage')
+
+# Token values are never written to a cassette
+SECRET_FIELDS = ('access_token', 'refresh_token')
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Replay found no recorded response for a request"""
+
+
+def request_key(method, url):
+    """'GET /api/v3/athlete/activities?page=1&per_page=200' (query sorted, tokens dropped)"""
+    parsed = urlparse(url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query) if k not in SECRET_FIELDS)
+    return f"{method.upper()} {parsed.path}" + (f"?{urlencode(query)}" if query else '')
+
+
+def _open(path, mode):
+    return gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+
+
+def _redact(text):
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(body, dict) and any(field in body for field in SECRET_FIELDS):
+        body.update({field: 'recorded' for field in SECRET_FIELDS if field in body})
+        return json.dumps(body)
+    return text
+
+
+def load_cassette(path):
+    """Recorded exchanges as a list of dicts, in recording order"""
+    with _open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Sends requests for real and appends each exchange to a cassette
+    One compact JSON object per line (gzip when the path ends in .gz); tokens
+    in OAuth responses are redacted and the Authorization header is not kept.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        duration = time.perf_counter() - start
+
+        entry = {
+            "key": request_key(request.method, request.url),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            "body": _redact(response.text),
+            "duration": round(duration, 4),
+        }
+        with self._lock, _open(self.path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers requests from a cassette without touching the network
+    Repeated requests get the recorded responses in order; once those run
+    out the last one is served again, so a cassette can drive benchmark loops.
+    latency: None (answer immediately), a number of seconds added to every
+    response, or 'recorded' to wait as long as the original request took.
+    """
+
+    def __init__(self, entries, latency=None):
+        super().__init__()
+        self.latency = latency
+        self.entries = {}
+        for entry in entries:
+            self.entries.setdefault(entry["key"], []).append(entry)
+        self._positions = {}
+        self._lock = threading.Lock()
+        self.served = 0
+
+    @classmethod
+    def from_file(cls, path, latency=None):
+        return cls(load_cassette(path), latency)
+
+    def _delay(self, entry):
+        if self.latency == 'recorded':
+            return entry["duration"]
+        return float(self.latency or 0)
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url)
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recorded response for {key}", request=request)
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.served += 1
+        entry = recorded[min(position, len(recorded) - 1)]
+
+        delay = self._delay(entry)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["body"].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_cassette(session, path, mode=REPLAY, latency=None):
+    """Route the session's HTTPS traffic through a recording or replaying adapter"""
+    if mode == RECORD:
+        adapter = RecordingAdapter(path)
+    elif mode == REPLAY:
+        adapter = ReplayAdapter.from_file(path, latency)
+    else:
+        raise ValueError(f"Unknown cassette mode: {mode} (use '{RECORD}' or '{REPLAY}')")
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
+
+
+def parse_latency(value):
+    """STRAVA_CASSETTE_LATENCY: '' -> None, 'recorded', or seconds"""
+    if not value:
+        return None
+    return value if value == 'recorded' else float(value)
@@ -87,6 +87,19 @@ if exist "%INSTALL_DIR%" (
 mkdir "%INSTALL_DIR%" 2>nul
 copy /y "%SCRIPT_DIR%server.py" "%INSTALL_DIR%\" >nul
 copy /y "%SCRIPT_DIR%strava_auth.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%activity_store.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%rate_limit.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%webhook.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%streams.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%training_stress.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%power_curve.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%backfill.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%tokens.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%metrics.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%cassette.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%output_format.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%athletes.py" "%INSTALL_DIR%\" >nul
+copy /y "%SCRIPT_DIR%singleflight.py" "%INSTALL_DIR%\" >nul
 copy /y "%SCRIPT_DIR%requirements.txt" "%INSTALL_DIR%\" >nul
 
 if not exist "%INSTALL_DIR%\.env" (
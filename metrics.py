@@ -0,0 +1,256 @@
+"""In-process metrics: tool latency, upstream Strava calls, cache hits, rate-limit usage."""
+
+import contextlib
+import contextvars
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Where the time of a tool call went, besides computation
+PHASES = ('upstream', 'token_refresh', 'rate_limit_wait')
+
+# Per-call phase totals of the tool call running in this context
+_current_call = contextvars.ContextVar('strava_tool_call', default=None)
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(url):
+    """'https://www.strava.com/api/v3/activities/123/streams?x=1' -> '/activities/{id}/streams'"""
+    path = urlparse(url).path
+    if path.startswith('/api/v3'):
+        path = path[len('/api/v3'):]
+    return _ID_SEGMENT.sub('/{id}', path) or '/'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus style)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        """[(le, cumulative count)] including +Inf"""
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms for the server
+    Tool calls are measured with track_tool(); upstream requests made inside
+    it (on any thread that inherited the context) add their time to that call,
+    so a slow answer can be split into Strava time, token refresh, rate-limit
+    wait and computation.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.tools = {}
+        self.tool_errors = {}
+        self.tool_phases = {}
+        self.upstream = {}
+        self.upstream_status = {}
+        self.rate_limit_wait = 0.0
+        self.cache = {}
+        self.flights = {}
+
+    @contextlib.contextmanager
+    def track_tool(self, name):
+        """Measure one tool call, including the phases recorded while it runs"""
+        phases = dict.fromkeys(PHASES, 0.0)
+        token = _current_call.set(phases)
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            _current_call.reset(token)
+            with self._lock:
+                self.tools.setdefault(name, Histogram()).observe(elapsed)
+                totals = self.tool_phases.setdefault(name, dict.fromkeys(PHASES, 0.0))
+                for phase, seconds in phases.items():
+                    totals[phase] += seconds
+
+    def count_tool_error(self, name):
+        with self._lock:
+            self.tool_errors[name] = self.tool_errors.get(name, 0) + 1
+
+    def _add_phase(self, phase, seconds):
+        phases = _current_call.get()
+        if phases is not None:
+            phases[phase] += seconds
+
+    def observe_upstream(self, url, seconds, status):
+        """One HTTP request to Strava; status is the HTTP status or 'error'"""
+        endpoint = endpoint_label(url)
+        self._add_phase('token_refresh' if endpoint.startswith('/oauth/') else 'upstream', seconds)
+        with self._lock:
+            self.upstream.setdefault(endpoint, Histogram()).observe(seconds)
+            key = (endpoint, str(status))
+            self.upstream_status[key] = self.upstream_status.get(key, 0) + 1
+
+    def observe_rate_limit_wait(self, seconds):
+        self._add_phase('rate_limit_wait', seconds)
+        with self._lock:
+            self.rate_limit_wait += seconds
+
+    def count_cache(self, cache, hit):
+        with self._lock:
+            hits, misses = self.cache.get(cache, (0, 0))
+            self.cache[cache] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+    def count_flight(self, name, outcome):
+        """One request for a shared upstream fetch (see singleflight.py): fetched, coalesced or hit"""
+        with self._lock:
+            counts = self.flights.setdefault(name, {'fetched': 0, 'coalesced': 0, 'hit': 0})
+            counts[outcome] += 1
+
+    def snapshot(self):
+        """Plain-data copy of all metrics"""
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started_at,
+                "tools": {
+                    name: {
+                        "count": h.count,
+                        "sum": h.sum,
+                        "max": h.max,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                        "errors": self.tool_errors.get(name, 0),
+                        "phases": dict(self.tool_phases[name]),
+                    }
+                    for name, h in self.tools.items()
+                },
+                "upstream": {
+                    endpoint: {
+                        "count": h.count,
+                        "sum": h.sum,
+                        "max": h.max,
+                        "status": {status: n for (e, status), n in self.upstream_status.items() if e == endpoint},
+                    }
+                    for endpoint, h in self.upstream.items()
+                },
+                "rate_limit_wait": self.rate_limit_wait,
+                "cache": {name: {"hits": hits, "misses": misses} for name, (hits, misses) in self.cache.items()},
+                "flights": {name: dict(counts) for name, counts in self.flights.items()},
+            }
+
+    def prometheus_text(self, rate_limit=None):
+        """Prometheus text exposition format; `rate_limit` is a RateLimitScheduler.status()"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, label, histograms):
+            for value, h in sorted(histograms.items()):
+                for bound, count in h.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{value}"}} {h.sum}')
+                lines.append(f'{name}_count{{{label}="{value}"}} {h.count}')
+
+        with self._lock:
+            header('strava_mcp_tool_latency_seconds', 'histogram', 'Tool call latency')
+            histogram('strava_mcp_tool_latency_seconds', 'tool', self.tools)
+
+            header('strava_mcp_tool_errors_total', 'counter', 'Tool calls that ended in an error')
+            for name, count in sorted(self.tool_errors.items()):
+                lines.append(f'strava_mcp_tool_errors_total{{tool="{name}"}} {count}')
+
+            header('strava_mcp_tool_phase_seconds_total', 'counter',
+                   'Time tool calls spent on Strava requests, token refresh and rate-limit waits')
+            for name, phases in sorted(self.tool_phases.items()):
+                for phase, seconds in phases.items():
+                    lines.append(f'strava_mcp_tool_phase_seconds_total{{tool="{name}",phase="{phase}"}} {seconds}')
+
+            header('strava_mcp_upstream_latency_seconds', 'histogram', 'Strava API request duration')
+            histogram('strava_mcp_upstream_latency_seconds', 'endpoint', self.upstream)
+
+            header('strava_mcp_upstream_requests_total', 'counter', 'Strava API requests by status')
+            for (endpoint, status), count in sorted(self.upstream_status.items()):
+                lines.append(f'strava_mcp_upstream_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            header('strava_mcp_rate_limit_wait_seconds_total', 'counter', 'Time spent waiting for API budget')
+            lines.append(f'strava_mcp_rate_limit_wait_seconds_total {self.rate_limit_wait}')
+
+            header('strava_mcp_cache_requests_total', 'counter', 'Cache lookups by result')
+            for name, (hits, misses) in sorted(self.cache.items()):
+                lines.append(f'strava_mcp_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+                lines.append(f'strava_mcp_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+
+            header('strava_mcp_shared_fetches_total', 'counter',
+                   'Requests for shared upstream fetches: sent, joined while in flight, or reused')
+            for name, counts in sorted(self.flights.items()):
+                for outcome, count in counts.items():
+                    lines.append(f'strava_mcp_shared_fetches_total{{fetch="{name}",result="{outcome}"}} {count}')
+
+        if rate_limit is not None:
+            header('strava_mcp_rate_limit_usage', 'gauge', 'Strava requests used in the current window')
+            lines.append(f'strava_mcp_rate_limit_usage{{window="15min"}} {rate_limit["short_usage"]}')
+            lines.append(f'strava_mcp_rate_limit_usage{{window="daily"}} {rate_limit["long_usage"]}')
+            header('strava_mcp_rate_limit_limit', 'gauge', 'Strava request quota per window')
+            lines.append(f'strava_mcp_rate_limit_limit{{window="15min"}} {rate_limit["short_limit"]}')
+            lines.append(f'strava_mcp_rate_limit_limit{{window="daily"}} {rate_limit["long_limit"]}')
+            header('strava_mcp_rate_limit_requests_total', 'counter', 'Requests sent per priority lane')
+            for lane, count in sorted(rate_limit["requests"].items()):
+                lines.append(f'strava_mcp_rate_limit_requests_total{{lane="{lane}"}} {count}')
+            header('strava_mcp_rate_limit_throttled_total', 'counter', 'Requests refused for lack of budget')
+            lines.append(f'strava_mcp_rate_limit_throttled_total {rate_limit["throttled"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, rate_limit=None):
+        """Write prometheus_text() to `path` atomically (for node_exporter's textfile collector)"""
+        text = self.prometheus_text(rate_limit)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,133 @@
+"""Compact and JSON renderings of tool results, with a fixed schema per tool."""
+
+import json
+import numbers
+from datetime import date, datetime, timedelta
+
+TEXT = 'text'
+COMPACT = 'compact'
+JSON = 'json'
+FORMATS = (TEXT, COMPACT, JSON)
+
+# Added to the inputSchema of every tool that supports structured output
+FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": list(FORMATS),
+    "default": TEXT,
+    "description": "Output format: text (readable, default), compact (key=value lines and a | table) or json",
+}
+
+_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _value(value):
+    """Plain JSON-able value: durations in seconds, dates as ISO strings, floats to 2 decimals"""
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, numbers.Integral):
+        return int(value)  # also numpy integers and stravalib's int subclasses (e.g. Duration)
+    if isinstance(value, numbers.Real):
+        return round(float(value), 2)
+    return str(getattr(value, 'root', value))
+
+
+def _cell(value):
+    """One compact cell: '' for missing, no separators or line breaks inside"""
+    if value is None:
+        return ''
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+class Schema:
+    """
+    Fields and table columns of one tool's structured result
+    The row template and header are built once, so rendering a result is a
+    single format call per row.
+    """
+
+    def __init__(self, tool, fields=(), columns=()):
+        self.tool = tool
+        self.fields = tuple(fields)
+        self.columns = tuple(columns)
+        self._header = '|'.join(self.columns)
+        self._row = '|'.join(['{}'] * len(self.columns)).format
+
+    def as_dict(self, record=None, rows=()):
+        """{'tool', <fields>..., 'columns', 'rows'} with every field present (None when missing)"""
+        record = record or {}
+        data = {"tool": self.tool}
+        data.update((field, _value(record.get(field))) for field in self.fields)
+        if self.columns:
+            data["columns"] = list(self.columns)
+            data["rows"] = [[_value(v) for v in row] for row in rows]
+        return data
+
+    def json(self, record=None, rows=()):
+        return _json.encode(self.as_dict(record, rows))
+
+    def compact(self, record=None, rows=()):
+        record = record or {}
+        lines = [f"# {self.tool}"]
+        lines.extend(f"{field}={_cell(_value(record.get(field)))}" for field in self.fields)
+        if self.columns:
+            lines.append(self._header)
+            lines.extend(self._row(*(_cell(_value(v)) for v in row)) for row in rows)
+        return '\n'.join(lines) + '\n'
+
+    def render(self, output, record=None, rows=()):
+        if output == JSON:
+            return self.json(record, rows)
+        if output == COMPACT:
+            return self.compact(record, rows)
+        raise ValueError(f"No structured rendering for format '{output}'")
+
+
+SCHEMAS = {schema.tool: schema for schema in (
+    Schema("get_recent_activities",
+           fields=("next_cursor",),
+           columns=("id", "start_local", "name", "sport_type", "distance_km", "moving_s", "avg_hr")),
+    Schema("get_activity_details",
+           fields=("id", "name", "sport_type", "start_local", "distance_km", "moving_s", "avg_kmh", "avg_hr",
+                   "max_hr", "avg_watts", "suffer_score", "normalized_power", "intensity_factor", "tss", "trimp",
+                   "description")),
+    Schema("get_activity_details_batch",
+           fields=("requested", "found", "failed"),
+           columns=("id", "name", "sport_type", "start_local", "distance_km", "moving_s", "avg_kmh", "avg_hr",
+                    "max_hr", "avg_watts", "suffer_score", "tss", "description", "error")),
+    Schema("get_activity_streams",
+           fields=("id", "samples", "duration_s", "distance_km", "normalized_power", "intensity_factor", "tss",
+                   "trimp"),
+           columns=("stream", "unit", "avg", "min", "max")),
+    Schema("get_weekly_stats",
+           fields=("weeks",),
+           columns=("weeks_ago", "activities", "distance_km", "hours")),
+    Schema("get_period_stats",
+           fields=("granularity", "start_date", "end_date", "history_start"),
+           columns=("period", "sport_type", "count", "distance_km", "moving_s", "elevation_m", "load")),
+    Schema("get_training_load_analysis",
+           fields=("atl", "ctl", "tsb", "ramp_rate", "ramp_status", "status", "advice"),
+           columns=("week", "atl", "ctl", "tsb")),
+    Schema("get_weekly_training_plan",
+           fields=("current_hours", "target_hours", "volume_advice", "intensity_note"),
+           columns=("workout", "count")),
+    Schema("get_power_curve",
+           fields=("start_date", "end_date", "rides", "pending", "ftp_estimate"),
+           columns=("duration_s", "watts", "date", "activity_id")),
+)}
+
+
+def parse_format(arguments):
+    """The 'format' tool argument; ValueError for unknown formats"""
+    output = arguments.get("format") or TEXT
+    if output not in FORMATS:
+        raise ValueError(f"Unknown format '{output}'. Use one of: {', '.join(FORMATS)}.")
+    return output
+
+
+def render(tool, output, record=None, rows=()):
+    """Structured result of `tool` in the compact or json format"""
+    return SCHEMAS[tool].render(output, record, rows)
@@ -0,0 +1,39 @@
+"""Mean-maximal power curve from power streams."""
+
+import numpy as np
+
+from training_stress import resample_1hz
+
+# Standard durations (seconds) reported in the power curve
+STANDARD_DURATIONS = (5, 60, 300, 1200, 3600)
+
+
+def format_duration(seconds):
+    """5 -> '5s', 300 -> '5min', 3600 -> '60min'"""
+    return f"{seconds}s" if seconds < 60 else f"{seconds // 60}min"
+
+
+def mean_max_power(watts_1hz, durations=STANDARD_DURATIONS):
+    """
+    Best average power for each duration ({duration: watts})
+    One cumulative sum is shared by all durations, each duration is then a
+    single vectorized sliding-window difference: O(len(durations) * n).
+    Durations longer than the ride are left out.
+    """
+    watts_1hz = np.nan_to_num(np.asarray(watts_1hz, dtype=float))
+    sums = np.cumsum(np.insert(watts_1hz, 0, 0.0))
+
+    curve = {}
+    for duration in durations:
+        if duration > len(watts_1hz):
+            continue
+        curve[duration] = round(float(np.max(sums[duration:] - sums[:-duration]) / duration), 1)
+    return curve
+
+
+def activity_power_curve(streams, durations=STANDARD_DURATIONS):
+    """Mean-maximal power of one activity from its cached streams ({} without power)"""
+    watts = streams.get('watts')
+    if watts is None or not len(watts):
+        return {}
+    return mean_max_power(resample_1hz(streams.get('time'), watts), durations)
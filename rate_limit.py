@@ -0,0 +1,243 @@
+"""Rate-limit-aware scheduling of Strava API requests."""
+
+import contextlib
+import contextvars
+import math
+import threading
+import time
+
+import requests
+
+# Priority lanes: interactive tool calls always go before background work
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+SHORT_WINDOW = 15 * 60
+LONG_WINDOW = 24 * 60 * 60
+
+_current_lane = contextvars.ContextVar('strava_request_lane', default=INTERACTIVE)
+
+
+class RateLimitExceeded(Exception):
+    """No request budget is left within the allowed wait"""
+
+
+@contextlib.contextmanager
+def request_lane(lane):
+    """Send all Strava requests made inside this block through `lane`"""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane():
+    """Lane the Strava requests of the current context go through"""
+    return _current_lane.get()
+
+
+def _next_window_start(now, window):
+    """Epoch of the next window boundary (Strava windows align to UTC quarters/midnight)"""
+    return (int(now) // window + 1) * window
+
+
+def _parse_pair(value):
+    """'600,30000' -> (600, 30000)"""
+    try:
+        short, long = (int(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    return short, long
+
+
+class RateLimitScheduler:
+    """
+    Central gate for Strava API requests
+    Tracks the 15-minute and daily quota from response headers, smooths
+    bursts with a token bucket refilled at the 15-minute rate, and keeps a
+    share of the quota reserved for interactive tool calls. Background
+    requests also yield to any interactive request that is waiting.
+    """
+
+    def __init__(self, short_limit=100, long_limit=1000, burst=20,
+                 background_reserve=0.2, max_wait=10.0, clock=time.time):
+        self.short_limit = short_limit
+        self.long_limit = long_limit
+        self.burst = burst
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self.clock = clock
+
+        now = clock()
+        self.short_usage = 0
+        self.long_usage = 0
+        self._short_reset = _next_window_start(now, SHORT_WINDOW)
+        self._long_reset = _next_window_start(now, LONG_WINDOW)
+        self.tokens = float(burst)
+        self._refilled_at = now
+
+        self._cond = threading.Condition()
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.requests = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.throttled = 0
+        self.headers_seen = False
+        self._closed = False
+
+    def _roll_windows(self, now):
+        if now >= self._short_reset:
+            self.short_usage = 0
+            self._short_reset = _next_window_start(now, SHORT_WINDOW)
+        if now >= self._long_reset:
+            self.long_usage = 0
+            self._long_reset = _next_window_start(now, LONG_WINDOW)
+
+    def _refill(self, now):
+        rate = self.short_limit / SHORT_WINDOW
+        self.tokens = min(float(self.burst), self.tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _wait_time(self, lane, now):
+        """Seconds until `lane` may send its next request (0 = now)"""
+        short_left = self.short_limit - self.short_usage
+        long_left = self.long_limit - self.long_usage
+        if lane == BACKGROUND:
+            short_left -= math.ceil(self.short_limit * self.background_reserve)
+            long_left -= math.ceil(self.long_limit * self.background_reserve)
+
+        if long_left <= 0:
+            return self._long_reset - now
+        if short_left <= 0:
+            return self._short_reset - now
+        if lane == BACKGROUND and self._waiting[INTERACTIVE]:
+            # Woken up again once the interactive request is through
+            return 1.0
+        if self.tokens < 1:
+            return (1 - self.tokens) * SHORT_WINDOW / self.short_limit
+        return 0
+
+    def acquire(self, lane=None, max_wait=None):
+        """
+        Block until a request may be sent on `lane` (default: the current lane)
+        Interactive requests wait at most `max_wait` seconds (default: the
+        scheduler's max_wait), background requests wait as long as needed
+        unless a max_wait is given. Raises RateLimitExceeded when the budget
+        does not free up in time.
+        """
+        lane = lane or _current_lane.get()
+        if max_wait is None and lane == INTERACTIVE:
+            max_wait = self.max_wait
+        deadline = self.clock() + max_wait if max_wait is not None else None
+
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise RateLimitExceeded("Request scheduler is shut down")
+                    now = self.clock()
+                    self._roll_windows(now)
+                    self._refill(now)
+                    wait = self._wait_time(lane, now)
+                    if wait <= 0:
+                        break
+                    if deadline is not None and now + wait > deadline:
+                        self.throttled += 1
+                        raise RateLimitExceeded(
+                            f"Strava API budget exhausted, next request possible in {int(wait)}s"
+                        )
+                    self._cond.wait(min(wait, 1.0))
+
+                self.tokens -= 1
+                self.short_usage += 1
+                self.long_usage += 1
+                self.requests[lane] += 1
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def update_from_headers(self, headers):
+        """Take quota limits and usage from a Strava response.
+
+        Strava reports overall (X-RateLimit-*) and read (X-ReadRateLimit-*)
+        quotas; this server only reads, so the read quota wins when present.
+        """
+        limits = _parse_pair(headers.get('X-ReadRateLimit-Limit')) or _parse_pair(headers.get('X-RateLimit-Limit'))
+        usage = _parse_pair(headers.get('X-ReadRateLimit-Usage')) or _parse_pair(headers.get('X-RateLimit-Usage'))
+        if not limits or not usage:
+            return
+
+        with self._cond:
+            self._roll_windows(self.clock())
+            self.short_limit, self.long_limit = limits
+            # Requests still in flight are not in Strava's count yet
+            self.short_usage = max(self.short_usage, usage[0])
+            self.long_usage = max(self.long_usage, usage[1])
+            self.headers_seen = True
+            self._cond.notify_all()
+
+    def shutdown(self):
+        """Release all waiting requests with RateLimitExceeded (used on server shutdown)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def mark_exhausted(self):
+        """Strava answered 429: treat the 15-minute window as used up"""
+        with self._cond:
+            self.short_usage = max(self.short_usage, self.short_limit)
+
+    def status(self):
+        """Snapshot of the current budget"""
+        with self._cond:
+            now = self.clock()
+            self._roll_windows(now)
+            self._refill(now)
+            return {
+                "short_usage": self.short_usage,
+                "short_limit": self.short_limit,
+                "short_reset_in": int(self._short_reset - now),
+                "long_usage": self.long_usage,
+                "long_limit": self.long_limit,
+                "long_reset_in": int(self._long_reset - now),
+                "tokens": round(self.tokens, 1),
+                "burst": self.burst,
+                "requests": dict(self.requests),
+                "waiting": dict(self._waiting),
+                "throttled": self.throttled,
+                "from_headers": self.headers_seen,
+            }
+
+
+class ScheduledSession(requests.Session):
+    """requests.Session that sends every Strava API call through a scheduler"""
+
+    def __init__(self, scheduler, metrics=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.metrics = metrics
+
+    def request(self, method, url, *args, **kwargs):
+        # OAuth token requests do not count against the API quota
+        api_call = '/oauth/' not in url
+        if api_call:
+            waited = time.perf_counter()
+            self.scheduler.acquire()
+            if self.metrics is not None:
+                self.metrics.observe_rate_limit_wait(time.perf_counter() - waited)
+
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.observe_upstream(url, time.perf_counter() - start, 'error')
+            raise
+        if self.metrics is not None:
+            self.metrics.observe_upstream(url, time.perf_counter() - start, response.status_code)
+
+        if api_call:
+            self.scheduler.update_from_headers(response.headers)
+            if response.status_code == 429:
+                self.scheduler.mark_exhausted()
+        return response
@@ -1,40 +1,100 @@
 import os
 import sys
-import stat
 import asyncio
-import tempfile
+import contextlib
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import numpy as np
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-from stravalib.client import Client
-from stravalib.exc import AccessUnauthorized
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from activity_store import (GRANULARITIES, ActivityStore, decode_cursor, encode_cursor, encode_position, period_start,
+                            project_activity)
+from athletes import AthletePool, current_athlete
+from backfill import Backfill
+from cassette import REPLAY, mount_cassette, parse_latency
+from metrics import Metrics
+from output_format import FORMAT_PROPERTY, SCHEMAS, TEXT, parse_format, render
+from power_curve import STANDARD_DURATIONS, activity_power_curve, format_duration
+from singleflight import SingleFlight
+from rate_limit import BACKGROUND, INTERACTIVE, RateLimitExceeded, RateLimitScheduler, current_lane, request_lane
+from streams import STREAM_TYPES, StreamStore
+from tokens import AuthorizedSession, EnvTokenStore, TokenManager
+from training_stress import training_stress
+from webhook import WebhookReceiver
 
 # Load credentials
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
 load_dotenv()
 
+# All Strava API requests share one quota-aware scheduler
+scheduler = RateLimitScheduler(
+    short_limit=int(os.getenv('STRAVA_RATE_LIMIT_15MIN', '100')),
+    long_limit=int(os.getenv('STRAVA_RATE_LIMIT_DAILY', '1000')),
+)
 
-def get_authenticated_client():
-    """Create authenticated client with auto token refresh"""
-    client_id = os.getenv('STRAVA_CLIENT_ID')
-    client_secret = os.getenv('STRAVA_CLIENT_SECRET')
-    access_token = os.getenv('STRAVA_ACCESS_TOKEN')
-    refresh_token = os.getenv('STRAVA_REFRESH_TOKEN')
+# One connection pool for every Strava client in the process (all athletes)
+HTTP_POOL_SIZE = int(os.getenv('STRAVA_HTTP_POOL_SIZE', '20'))
+http_adapter = HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
 
-    placeholder_values = {'your_client_id_here', 'your_client_secret_here',
-                          'your_access_token_here', 'your_refresh_token_here', ''}
+# Tool latency, upstream calls and cache hits (get_server_metrics)
+metrics = Metrics()
 
-    missing = []
-    if not client_id or client_id in placeholder_values:
-        missing.append('STRAVA_CLIENT_ID')
-    if not client_secret or client_secret in placeholder_values:
-        missing.append('STRAVA_CLIENT_SECRET')
-    if not access_token or access_token in placeholder_values:
-        missing.append('STRAVA_ACCESS_TOKEN')
-    if not refresh_token or refresh_token in placeholder_values:
-        missing.append('STRAVA_REFRESH_TOKEN')
+# Identical Strava fetches that overlap are sent once; a result is reused for
+# COALESCE_WINDOW seconds (e.g. the same activity asked for by two tools)
+COALESCE_WINDOW = float(os.getenv('STRAVA_COALESCE_WINDOW', '5'))
+flights = SingleFlight(COALESCE_WINDOW, metrics)
 
+# Record Strava traffic to a cassette file, or replay it offline
+CASSETTE_PATH = os.getenv('STRAVA_CASSETTE')
+CASSETTE_MODE = os.getenv('STRAVA_CASSETTE_MODE', REPLAY)
+CASSETTE_LATENCY = parse_latency(os.getenv('STRAVA_CASSETTE_LATENCY'))
+
+
+CREDENTIAL_VARS = ('STRAVA_CLIENT_ID', 'STRAVA_CLIENT_SECRET', 'STRAVA_ACCESS_TOKEN', 'STRAVA_REFRESH_TOKEN')
+PLACEHOLDER_VALUES = {'your_client_id_here', 'your_client_secret_here',
+                      'your_access_token_here', 'your_refresh_token_here', ''}
+
+
+def env_credentials():
+    """
+    (client_id, client_secret, access_token, refresh_token) of the .env athlete
+    and the names of those that are missing
+    """
+    values = tuple(os.getenv(name) for name in CREDENTIAL_VARS)
+    if CASSETTE_PATH and CASSETTE_MODE == REPLAY:
+        # A replayed session needs no Strava account
+        values = tuple(value if value and value not in PLACEHOLDER_VALUES else 'replay' for value in values)
+    missing = [name for name, value in zip(CREDENTIAL_VARS, values)
+               if not value or value in PLACEHOLDER_VALUES]
+    return values, missing
+
+
+def has_tokens(athlete=None):
+    """True when a client can be built for `athlete` (None: the .env athlete) without asking for tokens"""
+    if athlete is None:
+        return not env_credentials()[1]
+    saved = EnvTokenStore(athlete.env_path).load()
+    return bool(os.getenv('STRAVA_CLIENT_ID') and os.getenv('STRAVA_CLIENT_SECRET')
+                and saved["access_token"] and saved["refresh_token"])
+
+
+def get_authenticated_client(athlete=None):
+    """
+    Create authenticated client with auto token refresh
+    For an athlete of the multi-athlete mode the tokens come from (and are
+    refreshed into) the athlete's own .env; the Strava app is the shared one.
+    """
+    if athlete is not None:
+        return _athlete_client(athlete, os.getenv('STRAVA_CLIENT_ID'), os.getenv('STRAVA_CLIENT_SECRET'))
+
+    (client_id, client_secret, access_token, refresh_token), missing = env_credentials()
+    replaying = bool(CASSETTE_PATH) and CASSETTE_MODE == REPLAY
     if missing:
         print("\n[ERROR] Missing or invalid Strava credentials.", file=sys.stderr)
         print(f"  The following environment variables are not set: {', '.join(missing)}", file=sys.stderr)
@@ -45,118 +105,225 @@ def get_authenticated_client():
         print("  4. Your .env file will be populated automatically\n", file=sys.stderr)
         sys.exit(1)
 
-    client = Client()
-
-    # Try with access token first
-    client.access_token = access_token
-
-    # Check if token is still valid
-    try:
-        client.get_athlete()
-        return client
-    except AccessUnauthorized:
-        # Token expired, refresh it
-        print("Token expired, refreshing...")
-        token_response = client.refresh_access_token(
+    def refresh(token):
+        return client.refresh_access_token(
             client_id=client_id,
             client_secret=client_secret,
-            refresh_token=refresh_token
+            refresh_token=token
         )
 
-        # Update .env with new tokens
-        update_env_tokens(
-            token_response['access_token'],
-            token_response['refresh_token']
+    # No validation call up front: the token is refreshed shortly before
+    # expires_at, or once on a 401 when the expiry is not known. The .env
+    # file is shared with other server processes through its lock.
+    tokens = TokenManager(access_token, refresh_token, None if replaying else os.getenv('STRAVA_TOKEN_EXPIRES_AT'),
+                          refresh=refresh, store=None if replaying else EnvTokenStore(ENV_PATH),
+                          on_refresh=None if replaying else lambda _: load_dotenv(ENV_PATH, override=True))
+    client = _client_with_tokens(access_token, tokens)
+    return client
+
+
+def _athlete_client(athlete, client_id, client_secret):
+    """Client of a multi-athlete mode athlete; errors are reported to the tool call"""
+    store = EnvTokenStore(athlete.env_path)
+    saved = store.load()
+    if not client_id or not client_secret:
+        raise RuntimeError("STRAVA_CLIENT_ID and STRAVA_CLIENT_SECRET must be set in .env")
+    if not saved["access_token"] or not saved["refresh_token"]:
+        raise RuntimeError(f"No Strava tokens for athlete '{athlete.name}'. "
+                           f"Run: python strava_auth.py --athlete {athlete.name}")
+
+    def refresh(token):
+        return client.refresh_access_token(
+            client_id=client_id,
+            client_secret=client_secret,
+            refresh_token=token
         )
 
-        # Update client
-        client.access_token = token_response['access_token']
-        return client
+    tokens = TokenManager(saved["access_token"], saved["refresh_token"], saved["expires_at"],
+                          refresh=refresh, store=store)
+    client = _client_with_tokens(saved["access_token"], tokens)
+    return client
 
 
-def update_env_tokens(access_token, refresh_token):
-    """Update .env file with new tokens (atomic write)"""
-    env_path = os.path.join(os.path.dirname(__file__), '.env')
+def _client_with_tokens(access_token, tokens):
+    """stravalib client on a scheduled, token-managed session over the shared connection pool"""
+    session = AuthorizedSession(scheduler, tokens, metrics)
+    session.mount('https://', http_adapter)
+    if CASSETTE_PATH:
+        mount_cassette(session, CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY)
 
-    with open(env_path, 'r') as file:
-        lines = file.readlines()
+    # Deferred until the first API call: stravalib (pydantic models, unit
+    # registry) takes longer to import than the whole MCP handshake
+    from stravalib.client import Client
 
-    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(env_path))
-    try:
-        with os.fdopen(fd, 'w') as tmp_file:
-            for line in lines:
-                if line.startswith('STRAVA_ACCESS_TOKEN='):
-                    tmp_file.write(f'STRAVA_ACCESS_TOKEN={access_token}\n')
-                elif line.startswith('STRAVA_REFRESH_TOKEN='):
-                    tmp_file.write(f'STRAVA_REFRESH_TOKEN={refresh_token}\n')
-                else:
-                    tmp_file.write(line)
-        os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
-        os.replace(tmp_path, env_path)
-    except Exception:
-        os.unlink(tmp_path)
-        raise
+    # The scheduler replaces stravalib's own (sleeping) rate limiter
+    client = Client(access_token=access_token, rate_limit_requests=False,
+                    requests_session=session)
+    # Refreshing is the session's job; stravalib's own refresh would not update .env
+    client.protocol.client_id = client.protocol.client_secret = None
+    return client
+
+
+def update_env_tokens(access_token, refresh_token, expires_at=None):
+    """Update .env file with new tokens (atomic write, under the token file lock)"""
+    store = EnvTokenStore(ENV_PATH)
+    with store.lock():
+        store.save(access_token, refresh_token, expires_at)
 
     # Reload environment
     load_dotenv(override=True)
 
 
-# ============= TRAINING LOAD FUNCTIONS =============
+# ============= TRAINING LOAD ENGINE =============
 
-def calculate_training_loads(activities, days_atl=7, days_ctl=42):
-    """
-    Calculate ATL, CTL and TSB
-    ATL (Acute Training Load) = short-term fatigue (7 days)
-    CTL (Chronic Training Load) = long-term fitness (42 days)
-    TSB (Training Stress Balance) = CTL - ATL (form indicator)
-    """
-    now = datetime.now()
+# Days per block in the vectorized EWMA; keeps decay**-n well inside float range
+EWMA_BLOCK_DAYS = 256
 
-    # Collect suffer scores per day
+
+def daily_loads_from_activities(activities, since=None):
+    """Sum training load per local calendar day ({date: load})"""
     daily_loads = {}
 
     for activity in activities:
         activity_date = activity.start_date_local.replace(tzinfo=None).date()
-        days_ago = (now.date() - activity_date).days
-
-        if days_ago > days_ctl:
+        if since is not None and activity_date < since:
             continue
 
-        suffer_score = activity.suffer_score if activity.suffer_score else 0
+        # Computed TSS/TRIMP when available, otherwise Strava's suffer score
+        load = getattr(activity, 'training_stress', None)
+        if load is None:
+            load = activity.suffer_score if activity.suffer_score else 0
+        daily_loads[activity_date] = daily_loads.get(activity_date, 0) + load
+
+    return daily_loads
+
+
+def daily_load_array(daily_loads, end_date=None, start_date=None):
+    """
+    Dense per-day load array from a {date: load} mapping
+    Returns (start_date, loads) where loads[i] is the load on start_date + i days.
+    The array runs from start_date (default: first recorded load) up to and
+    including end_date (default: today).
+    """
+    end_date = end_date or datetime.now().date()
+    dates = [d for d in daily_loads if d <= end_date and (start_date is None or d >= start_date)]
+    if start_date is None:
+        start_date = min(dates) if dates else end_date
 
-        if activity_date not in daily_loads:
-            daily_loads[activity_date] = 0
-        daily_loads[activity_date] += suffer_score
+    loads = np.zeros((end_date - start_date).days + 1)
+    if dates:
+        offsets = np.fromiter(((d - start_date).days for d in dates), dtype=np.int64, count=len(dates))
+        values = np.fromiter((daily_loads[d] for d in dates), dtype=float, count=len(dates))
+        np.add.at(loads, offsets, values)
 
-    # Calculate ATL (last 7 days average)
-    atl_sum = 0
-    for i in range(days_atl):
-        date = (now - timedelta(days=i)).date()
-        if date in daily_loads:
-            atl_sum += daily_loads[date]
+    return start_date, loads
 
-    atl = atl_sum / days_atl if days_atl > 0 else 0
 
-    # Calculate CTL (last 42 days average)
-    ctl_sum = 0
-    for i in range(days_ctl):
-        date = (now - timedelta(days=i)).date()
-        if date in daily_loads:
-            ctl_sum += daily_loads[date]
+def ewma(loads, days, initial=0.0):
+    """
+    Exponentially-weighted moving average as used for ATL/CTL:
+    y[t] = y[t-1] + (x[t] - y[t-1]) / days, seeded with y[-1] = initial.
+
+    Computed block-wise in closed form (scaled cumulative sums) instead of
+    a per-day Python loop.
+    """
+    loads = np.asarray(loads, dtype=float)
+    if days <= 0:
+        return np.zeros_like(loads)
+    if days == 1:
+        return loads.copy()
 
-    ctl = ctl_sum / days_ctl if days_ctl > 0 else 0
+    k = 1.0 / days
+    decay = 1.0 - k
+    powers = decay ** np.arange(min(len(loads), EWMA_BLOCK_DAYS))
 
-    # TSB = difference between fitness and fatigue
-    tsb = ctl - atl
+    out = np.empty_like(loads)
+    prev = initial
+    for start in range(0, len(loads), EWMA_BLOCK_DAYS):
+        block = loads[start:start + EWMA_BLOCK_DAYS]
+        p = powers[:len(block)]
+        # y[j] = decay^(j+1) * prev + k * sum_{i<=j} decay^(j-i) * x[i]
+        out[start:start + len(block)] = decay * p * prev + k * p * np.cumsum(block / p)
+        prev = out[start + len(block) - 1]
+
+    return out
+
+
+def training_load_series(daily_loads, end_date=None, days_atl=7, days_ctl=42):
+    """
+    ATL, CTL and TSB for every day of the history in one pass
+    Returns {"start_date", "atl", "ctl", "tsb"} with one array entry per day
+    from the first recorded load up to end_date (default: today).
+    """
+    start_date, loads = daily_load_array(daily_loads, end_date)
+    atl = ewma(loads, days_atl)
+    ctl = ewma(loads, days_ctl)
+
+    return {
+        "start_date": start_date,
+        "atl": atl,
+        "ctl": ctl,
+        "tsb": ctl - atl
+    }
+
+
+def current_training_loads(series):
+    """Latest ATL, CTL and TSB from a training load series"""
+    atl = float(series["atl"][-1])
+    ctl = float(series["ctl"][-1])
 
     return {
         "atl": round(atl, 1),
         "ctl": round(ctl, 1),
-        "tsb": round(tsb, 1),
-        "daily_loads": daily_loads
+        "tsb": round(ctl - atl, 1)
     }
 
 
+def weekly_trends_from_series(series, weeks=8):
+    """ATL, CTL and TSB at the end of each of the last `weeks` weeks (oldest first)"""
+    last = len(series["atl"]) - 1
+    offsets = np.arange(weeks - 1, -1, -1)
+    indices = last - offsets * 7
+
+    # Weeks that end before the first recorded load have no load yet
+    valid = indices >= 0
+    clipped = np.clip(indices, 0, None)
+    atl = np.where(valid, series["atl"][clipped], 0.0)
+    ctl = np.where(valid, series["ctl"][clipped], 0.0)
+
+    return [
+        {
+            "week_offset": int(week_offset),
+            "week_label": f"Week -{week_offset}" if week_offset > 0 else "This week",
+            "atl": round(float(a), 1),
+            "ctl": round(float(c), 1),
+            "tsb": round(float(c) - float(a), 1)
+        }
+        for week_offset, a, c in zip(offsets, atl, ctl)
+    ]
+
+
+# ============= TRAINING LOAD FUNCTIONS =============
+
+def calculate_training_loads(activities, days_atl=7, days_ctl=42):
+    """
+    Calculate ATL, CTL and TSB
+    ATL (Acute Training Load) = short-term fatigue (7 days)
+    CTL (Chronic Training Load) = long-term fitness (42 days)
+    TSB (Training Stress Balance) = CTL - ATL (form indicator)
+
+    Only the last `days_ctl` days are counted; use training_load_series
+    for the full-history values.
+    """
+    today = datetime.now().date()
+    daily_loads = daily_loads_from_activities(activities, since=today - timedelta(days=days_ctl))
+
+    series = training_load_series(daily_loads, today, days_atl, days_ctl)
+    loads = current_training_loads(series)
+    loads["daily_loads"] = daily_loads
+    return loads
+
+
 def get_training_recommendation(tsb, atl, ctl):
     """Get training recommendation based on TSB"""
     if tsb < -30:
@@ -199,37 +366,8 @@ def get_training_recommendation(tsb, atl, ctl):
 
 def calculate_weekly_trends(daily_loads, weeks=8):
     """Calculate ATL and CTL per week for trend analysis"""
-    now = datetime.now()
-    weekly_trends = []
-
-    for week_offset in range(weeks):
-        week_end = now - timedelta(days=week_offset * 7)
-
-        # ATL for this week (7 days average)
-        atl_sum = 0
-        for i in range(7):
-            date = (week_end - timedelta(days=i)).date()
-            if date in daily_loads:
-                atl_sum += daily_loads[date]
-        atl = atl_sum / 7
-
-        # CTL for this week (42 days average up to that week)
-        ctl_sum = 0
-        for i in range(42):
-            date = (week_end - timedelta(days=i)).date()
-            if date in daily_loads:
-                ctl_sum += daily_loads[date]
-        ctl = ctl_sum / 42
-
-        weekly_trends.append({
-            "week_offset": week_offset,
-            "week_label": f"Week -{week_offset}" if week_offset > 0 else "This week",
-            "atl": round(atl, 1),
-            "ctl": round(ctl, 1),
-            "tsb": round(ctl - atl, 1)
-        })
-
-    return list(reversed(weekly_trends))  # Oldest first
+    series = training_load_series(daily_loads)
+    return weekly_trends_from_series(series, weeks)  # Oldest first
 
 
 def calculate_ramp_rate(weekly_trends):
@@ -338,33 +476,447 @@ def generate_weekly_recommendation(tsb, atl, ctl, ramp_rate_data):
 
 # Lazy client initialization
 _client = None
+_client_lock = threading.Lock()
 
 
 def get_client():
     """Get or initialize the authenticated Strava client (lazy init)"""
+    athlete = current_athlete()
+    if athlete is not None:
+        return athlete.client()
     global _client
-    if _client is None:
-        _client = get_authenticated_client()
+    with _client_lock:
+        if _client is None:
+            _client = get_authenticated_client()
     return _client
 
+
+def flight_owner():
+    """Athlete whose shared fetches (see `flights`) the current context makes; None: the .env athlete"""
+    athlete = current_athlete()
+    return athlete.name if athlete is not None else None
+
+
+# Multi-athlete mode: one directory per athlete with its own token file and
+# caches; tools select one with their `athlete` argument
+ATHLETES_DIR = (os.getenv('STRAVA_ATHLETES_DIR')
+                or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'athletes'))
+ATHLETE_IDLE_TIMEOUT = float(os.getenv('STRAVA_ATHLETE_IDLE_TIMEOUT', '900'))
+athletes = AthletePool(ATHLETES_DIR, lambda athlete: get_authenticated_client(athlete), ATHLETE_IDLE_TIMEOUT)
+
+
+# Local activity store, synced incrementally from Strava
+_store = None
+_store_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+# Minimum seconds between two delta syncs; calls in between are served locally
+SYNC_INTERVAL = int(os.getenv('STRAVA_SYNC_INTERVAL', '300'))
+
+
+def get_store():
+    """Get or open the local activity store (lazy init)"""
+    athlete = current_athlete()
+    if athlete is not None:
+        return athlete.store
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ActivityStore()
+    return _store
+
+
+def count_cache(cache, hit):
+    """Record a cache lookup made for a tool call (background work is not counted)"""
+    if current_lane() == INTERACTIVE:
+        metrics.count_cache(cache, hit)
+
+
+def sync_activities(force=False):
+    """Pull new activities into the store unless a sync ran recently"""
+    store = get_store()
+    athlete = current_athlete()
+    # Concurrent tool calls wait for a running sync instead of starting their own
+    with _sync_lock if athlete is None else athlete.sync_lock:
+        last_sync = store.last_sync_at()
+        if not force and last_sync is not None and time.time() - last_sync < SYNC_INTERVAL:
+            count_cache('activities', hit=True)
+            return 0
+        count_cache('activities', hit=False)
+        try:
+            return store.sync(get_client())
+        except Exception as e:
+            # Serve what we have locally rather than failing the tool call
+            if store.count() == 0:
+                raise
+            print(f"Activity sync failed, using local data: {e}", file=sys.stderr)
+            return 0
+
+
+def load_activities(since=None):
+    """Activities from the local store (newest first), after a delta sync"""
+    sync_activities()
+    return get_store().list_activities(since=since)
+
+
+# get_recent_activities page size cap, and the size of the one Strava request
+# a page may need when it reaches past the oldest stored activity
+MAX_PAGE_SIZE = 100
+HISTORY_FETCH_SIZE = 100
+
+
+def fetch_older_activities(per_page):
+    """
+    One Strava page right before the oldest stored activity, stored; returns the count
+    Pages that reach past the local data at the same time share this request.
+    """
+    store = get_store()
+    before = store.oldest_start() or int(time.time())
+
+    def fetch():
+        activities = fetch_activity_page(1, before, per_page)
+        store.upsert_activities(activities)
+        if len(activities) < per_page:
+            store.mark_history_complete()
+        return len(activities)
+
+    return flights.do('older_activities', (flight_owner(), before, per_page), fetch)
+
+
+def activities_page(limit, before=None, after=None, cursor=None):
+    """
+    (activities, next cursor or None) from the local index
+    The store holds every activity from its oldest one on, so only a page
+    that runs past that point costs a Strava request (at most one per page).
+    When that request does not reach back far enough yet, the page is empty
+    but still has a cursor: the next call loads the next older Strava page.
+    """
+    position = None
+    if cursor:
+        position, after = decode_cursor(cursor)
+
+    sync_activities()
+    store = get_store()
+
+    def reaches_past_local_data():
+        # The requested range goes further back than the store is known to be complete
+        if store.history_complete():
+            return False
+        oldest = store.oldest_start_local()
+        return oldest is None or after is None or oldest >= after
+
+    activities = store.page_activities(limit + 1, before, after, position)
+    fetch = len(activities) <= limit and reaches_past_local_data()
+    count_cache('activity_pages', hit=not fetch)
+    if fetch:
+        fetch_older_activities(HISTORY_FETCH_SIZE)
+        activities = store.page_activities(limit + 1, before, after, position)
+
+    more = len(activities) > limit or reaches_past_local_data()
+    activities = activities[:limit]
+    next_cursor = None
+    if more and activities:
+        next_cursor = encode_cursor(activities[-1], after)
+    elif more and (position or before):
+        # Nothing stored in range yet: continue from the same point once more history is loaded
+        next_cursor = encode_position(position or (before, 0), after)
+    return activities, next_cursor
+
+
+# Activity streams never change once recorded, so they are cached for good
+_stream_store = None
+
+
+def get_stream_store():
+    """Get or open the on-disk stream cache (lazy init)"""
+    athlete = current_athlete()
+    if athlete is not None:
+        return athlete.stream_store
+    global _stream_store
+    with _store_lock:
+        if _stream_store is None:
+            _stream_store = StreamStore()
+    return _stream_store
+
+
+def load_activity_streams(activity_id, types=None):
+    """Memory-mapped streams of an activity, downloaded from Strava only the first time"""
+    stream_store = get_stream_store()
+    cached = stream_store.has(activity_id)
+    count_cache('streams', hit=cached)
+    if not cached:
+        def download():
+            if not stream_store.has(activity_id):
+                streams = get_client().get_activity_streams(activity_id, types=STREAM_TYPES)
+                stream_store.save(activity_id, {stream_type: stream.data for stream_type, stream in streams.items()})
+        # A tool and the background stress/power-curve runs may want the same activity
+        flights.do('streams', (flight_owner(), activity_id), download)
+    return stream_store.load(activity_id, types)
+
+
+def fetch_activity(activity_id):
+    """Detailed activity from Strava, shared by overlapping (or just repeated) requests for it"""
+    return flights.do('activity', (flight_owner(), activity_id), lambda: get_client().get_activity(activity_id))
+
+
+# get_activity_details_batch: most IDs per call, parallel Strava requests, and
+# how long a cached detailed activity is served without asking Strava again
+MAX_DETAIL_BATCH = 50
+DETAIL_FETCH_WORKERS = int(os.getenv('STRAVA_DETAIL_FETCH_WORKERS', '4'))
+DETAIL_CACHE_TTL = int(os.getenv('STRAVA_DETAIL_CACHE_TTL', '86400'))
+
+
+def load_activity_details(activity_ids):
+    """
+    ({id: details}, {id: exception}) for `activity_ids` (see project_details)
+    Cached detailed activities are served locally; the others are fetched
+    concurrently, each request waiting for API budget in the scheduler. Once
+    the budget runs out the remaining IDs are served from older cached copies
+    if there are any, or reported as failed instead of each waiting in turn.
+    """
+    store = get_store()
+    details = store.get_details(activity_ids, max_age=DETAIL_CACHE_TTL)
+    for activity_id in activity_ids:
+        count_cache('activity_details', hit=activity_id in details)
+    missing = [activity_id for activity_id in activity_ids if activity_id not in details]
+    if not missing:
+        return details, {}
+
+    exhausted = threading.Event()
+
+    def fetch(activity_id):
+        if exhausted.is_set():
+            raise RateLimitExceeded("Strava API budget exhausted")
+        try:
+            return fetch_activity(activity_id)
+        except RateLimitExceeded:
+            exhausted.set()
+            raise
+
+    errors = {}
+    fetched = []
+    with ThreadPoolExecutor(max_workers=min(DETAIL_FETCH_WORKERS, len(missing))) as pool:
+        # Each request runs in a copy of this context (lane, athlete, tool metrics)
+        futures = [(activity_id, pool.submit(contextvars.copy_context().run, fetch, activity_id))
+                   for activity_id in missing]
+        for activity_id, future in futures:
+            try:
+                fetched.append(future.result())
+            except Exception as e:
+                errors[activity_id] = e
+    details.update(store.save_details(fetched))
+
+    # Out of budget: a copy of any age beats no answer
+    throttled = [activity_id for activity_id, e in errors.items() if isinstance(e, RateLimitExceeded)]
+    for activity_id, activity in store.get_details(throttled).items():
+        details[activity_id] = activity
+        del errors[activity_id]
+    return details, errors
+
+
+
+def _optional_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+# Athlete settings for stream-based training stress
+FTP = _optional_float('STRAVA_FTP')
+MAX_HR = float(os.getenv('STRAVA_MAX_HR', '190'))
+REST_HR = float(os.getenv('STRAVA_REST_HR', '60'))
+TRIMP_SEX = os.getenv('STRAVA_TRIMP_SEX', 'male')
+
+# Activities whose streams are downloaded per background run
+STRESS_BATCH_SIZE = int(os.getenv('STRAVA_STRESS_BATCH_SIZE', '25'))
+
+
+def streams_gone(error):
+    """True when Strava answered 404: the activity was deleted, a retry will not help"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 404
+
+
+def compute_activity_stress(activity_id):
+    """TSS (power) or TRIMP (heart rate) of an activity from its streams, cached in the store"""
+    streams = load_activity_streams(activity_id, types=['time', 'watts', 'heartrate'])
+    stress = training_stress(streams, FTP, MAX_HR, REST_HR, TRIMP_SEX)
+    get_store().save_training_stress(activity_id, stress, FTP)
+    return stress
+
+
+def update_training_stress(limit=STRESS_BATCH_SIZE):
+    """
+    Compute training stress for up to `limit` activities that lack it, returns the number done
+    An activity whose streams cannot be downloaded is skipped; one that is gone
+    on Strava gets a stress row without a method (it counts with its suffer
+    score) so it is not picked again. RateLimitExceeded ends the batch.
+    """
+    activity_ids = get_store().activities_needing_stress(FTP, limit)
+    for activity_id in activity_ids:
+        try:
+            compute_activity_stress(activity_id)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"Training stress of activity {activity_id} failed: {e}", file=sys.stderr)
+            if streams_gone(e):
+                get_store().save_training_stress(activity_id, training_stress({}, FTP, MAX_HR, REST_HR, TRIMP_SEX), FTP)
+    return len(activity_ids)
+
+
+# Activities whose power curve a single get_power_curve call may analyze
+POWER_CURVE_BATCH_SIZE = 20
+
+
+def compute_power_curve(activity_id):
+    """Mean-maximal power of an activity from its streams, cached in the store"""
+    streams = load_activity_streams(activity_id, types=['time', 'watts'])
+    curve = activity_power_curve(streams, STANDARD_DURATIONS)
+    get_store().save_power_curve(activity_id, curve, STANDARD_DURATIONS)
+    return curve
+
+
+def update_power_curves(since=None, until=None, limit=POWER_CURVE_BATCH_SIZE):
+    """
+    Compute power curves for up to `limit` activities that lack one, returns the number done
+    An activity whose streams cannot be downloaded is skipped; one that is gone
+    on Strava gets an empty curve so it is not picked again.
+    RateLimitExceeded ends the batch.
+    """
+    activity_ids = get_store().activities_needing_power_curve(since, until, limit)
+    for activity_id in activity_ids:
+        try:
+            compute_power_curve(activity_id)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"Power curve of activity {activity_id} failed: {e}", file=sys.stderr)
+            if streams_gone(e):
+                get_store().save_power_curve(activity_id, {}, STANDARD_DURATIONS)
+    return len(activity_ids)
+
+
+
+def fetch_activity_page(page, before, per_page):
+    """One raw page of /athlete/activities older than `before` (UTC epoch)"""
+    return get_client().protocol.get('/athlete/activities', before=before, page=page, per_page=per_page)
+
+
+def estimate_activity_total():
+    """Ride + run + swim count from the athlete's stats (other sports are not counted there)"""
+    client = get_client()
+    stats = client.get_athlete_stats(client.get_athlete().id)
+    totals = (stats.all_ride_totals, stats.all_run_totals, stats.all_swim_totals)
+    return sum(t.count or 0 for t in totals if t is not None)
+
+
+_backfill = None
+
+
+def get_backfill():
+    """The full-history backfill job (lazy init)"""
+    athlete = current_athlete()
+    if athlete is not None:
+        with _store_lock:
+            if athlete.backfill is None:
+                # The backfill's threads do not inherit the athlete context
+                athlete.backfill = Backfill(athlete.store, athlete.bind(fetch_activity_page),
+                                            athlete.bind(estimate_activity_total))
+        return athlete.backfill
+    global _backfill
+    with _store_lock:
+        if _backfill is None:
+            _backfill = Backfill(get_store(), fetch_activity_page, estimate_activity_total)
+    return _backfill
+
+
+_series_lock = threading.Lock()
+
+
+def load_training_load_series(days=56):
+    """
+    ATL/CTL/TSB series for the last `days` days, backed by the persisted series
+    Only days after the last persisted day are computed, seeded with the
+    stored ATL/CTL of the day before. When an older activity was added,
+    edited or deleted, the series is recomputed from that day on; a change
+    before the start of the series triggers a full recompute.
+    """
+    sync_activities()
+    store = get_store()
+    athlete = current_athlete()
+    today = datetime.now().date()
+
+    with _series_lock if athlete is None else athlete.series_lock:
+        state = store.load_series_state()
+
+        resume_from = seed = None
+        if state["last_day"] is not None:
+            resume_from = state["last_day"] + timedelta(days=1)
+            if state["dirty_from"] is not None:
+                resume_from = min(resume_from, state["dirty_from"])
+            seed_day = resume_from - timedelta(days=1)
+            seed = store.load_series(since=seed_day, until=seed_day)
+
+        count_cache('load_series', hit=bool(seed) and resume_from > today)
+        if not seed:
+            series = training_load_series(store.daily_loads(), today)
+            store.save_load_series(series["start_date"], series["atl"], series["ctl"],
+                                   state["data_version"], full=True)
+        elif resume_from <= today:
+            _, loads = daily_load_array(store.daily_loads(since=resume_from), today, resume_from)
+            _, seed_atl, seed_ctl = seed[0]
+            store.save_load_series(resume_from, ewma(loads, 7, seed_atl), ewma(loads, 42, seed_ctl),
+                                   state["data_version"])
+
+    rows = store.load_series(since=today - timedelta(days=days - 1), until=today)
+    atl = np.array([row[1] for row in rows])
+    ctl = np.array([row[2] for row in rows])
+
+    return {
+        "start_date": rows[0][0],
+        "atl": atl,
+        "ctl": ctl,
+        "tsb": ctl - atl
+    }
+
 # Create MCP server
 server = Server("strava-mcp")
 
+# Tools about the whole process (API budget, metrics) rather than one athlete
+PROCESS_TOOLS = {"get_rate_limit_status", "get_server_metrics"}
+
+ATHLETE_PROPERTY = {
+    "type": "string",
+    "description": "Athlete name in multi-athlete mode (default: the athlete in .env)"
+}
+
 
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """List available Strava tools"""
-    return [
+    tools = [
         Tool(
             name="get_recent_activities",
-            description="Get recent Strava activities (default: last 10)",
+            description="Get recent Strava activities (default: last 10); page back through older ones with the returned cursor",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "limit": {
                         "type": "number",
-                        "description": "Number of activities (max 30)",
+                        "description": f"Number of activities per page (max {MAX_PAGE_SIZE})",
                         "default": 10
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous response, to get the next (older) page"
+                    },
+                    "before": {
+                        "type": "string",
+                        "description": "Only activities before this date (YYYY-MM-DD)"
+                    },
+                    "after": {
+                        "type": "string",
+                        "description": "Only activities on or after this date (YYYY-MM-DD)"
                     }
                 }
             }
@@ -383,6 +935,35 @@ async def list_tools() -> list[Tool]:
                 "required": ["activity_id"]
             }
         ),
+        Tool(
+            name="get_activity_details_batch",
+            description="Get detailed info for several activities at once, e.g. to compare them",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "activity_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": f"Activity IDs (max {MAX_DETAIL_BATCH}, duplicates are ignored)"
+                    }
+                },
+                "required": ["activity_ids"]
+            }
+        ),
+        Tool(
+            name="get_activity_streams",
+            description="Summarize the recorded data streams (power, heart rate, cadence, altitude, speed) of an activity",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "activity_id": {
+                        "type": "string",
+                        "description": "Activity ID"
+                    }
+                },
+                "required": ["activity_id"]
+            }
+        ),
         Tool(
             name="get_weekly_stats",
             description="Weekly training statistics (distance, time, training load)",
@@ -397,6 +978,38 @@ async def list_tools() -> list[Tool]:
                 }
             }
         ),
+        Tool(
+            name="get_period_stats",
+            description="Totals per day, week, month or year, split by sport type (count, distance, time, elevation, load)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "granularity": {
+                        "type": "string",
+                        "enum": list(GRANULARITIES),
+                        "description": "Period length (default: week)",
+                        "default": "week"
+                    },
+                    "periods": {
+                        "type": "number",
+                        "description": "Number of periods back, including the current one (default: 12)",
+                        "default": 12
+                    },
+                    "start_date": {
+                        "type": "string",
+                        "description": "Start date YYYY-MM-DD (overrides periods)"
+                    },
+                    "end_date": {
+                        "type": "string",
+                        "description": "End date YYYY-MM-DD (default: today)"
+                    },
+                    "sport_type": {
+                        "type": "string",
+                        "description": "Only this sport type (e.g. Ride, Run, Swim)"
+                    }
+                }
+            }
+        ),
         Tool(
             name="get_training_load_analysis",
             description="Analyze training load with ATL, CTL, TSB and get REST or TRAIN advice",
@@ -412,33 +1025,134 @@ async def list_tools() -> list[Tool]:
                 "type": "object",
                 "properties": {}
             }
+        ),
+        Tool(
+            name="get_power_curve",
+            description="Best power for 5s, 1min, 5min, 20min and 60min over a date range (default: last 365 days)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "days": {
+                        "type": "number",
+                        "description": "Number of days back (default: 365)",
+                        "default": 365
+                    },
+                    "start_date": {
+                        "type": "string",
+                        "description": "Start date YYYY-MM-DD (overrides days)"
+                    },
+                    "end_date": {
+                        "type": "string",
+                        "description": "End date YYYY-MM-DD (default: today)"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="backfill_history",
+            description="Import your full Strava history in the background (resumable); call again to see progress",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
+        Tool(
+            name="get_rate_limit_status",
+            description="Show the remaining Strava API budget (15-minute and daily quota)",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
+        Tool(
+            name="get_server_metrics",
+            description="Show server diagnostics: tool latency, Strava API calls per endpoint, cache hit ratio and API budget",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
+    for tool in tools:
+        if tool.name in SCHEMAS:
+            tool.inputSchema["properties"]["format"] = FORMAT_PROPERTY
+        if tool.name not in PROCESS_TOOLS:
+            tool.inputSchema["properties"]["athlete"] = ATHLETE_PROPERTY
+    return tools
 
 
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """Execute tool"""
+    """
+    Execute tool in a worker thread so blocking Strava I/O never stalls the event loop
+    While the server runs, at most MAX_CONCURRENT_TOOLS calls (of all sessions) run at once.
+    """
+    async with _tool_slots or contextlib.nullcontext():
+        with metrics.track_tool(name):
+            return await asyncio.to_thread(run_tool, name, arguments)
+
+
+def run_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Execute tool (blocking)"""
 
     try:
-        if name == "get_recent_activities":
-            limit = min(int(arguments.get("limit", 10)), 30)
-            activities = get_client().get_activities(limit=limit)
+        output = parse_format(arguments)
+        athlete = athletes.acquire(arguments["athlete"]) if arguments.get("athlete") else None
+    except ValueError as e:
+        return [TextContent(type="text", text=str(e))]
+
+    if athlete is not None:
+        try:
+            return athlete.call(run_tool, name, {k: v for k, v in arguments.items() if k != "athlete"})
+        finally:
+            athletes.release(athlete)
 
-            result = "🚴 RECENT ACTIVITIES\n\n"
+    try:
+        if name == "get_recent_activities":
+            limit = max(1, min(int(arguments.get("limit", 10)), MAX_PAGE_SIZE))
+            try:
+                before, after = (
+                    datetime.strptime(arguments[key], "%Y-%m-%d").date().isoformat() if arguments.get(key) else None
+                    for key in ("before", "after")
+                )
+            except ValueError:
+                return [TextContent(type="text", text="Invalid date. Use the format YYYY-MM-DD.")]
+            if arguments.get("cursor"):
+                try:
+                    decode_cursor(arguments["cursor"])
+                except ValueError:
+                    return [TextContent(type="text", text="Invalid cursor. Use the cursor from a previous response.")]
+
+            activities, next_cursor = activities_page(limit, before, after, arguments.get("cursor"))
+
+            if output != TEXT:
+                rows = [(a.id, a.start_date_local, a.name, a.sport_type,
+                         float(a.distance) / 1000 if a.distance else 0.0, a.moving_time,
+                         a.average_heartrate and int(a.average_heartrate)) for a in activities]
+                return structured(name, output, {"next_cursor": next_cursor}, rows)
+
+            # One join instead of growing a string per line (pages have up to MAX_PAGE_SIZE activities)
+            lines = ["🚴 RECENT ACTIVITIES\n\n"]
             for activity in activities:
                 date = activity.start_date_local.strftime("%d-%m-%Y %H:%M")
                 distance = round(float(activity.distance) / 1000, 1) if activity.distance else 0
                 duration = str(activity.moving_time).split('.')[0]  # HH:MM:SS
 
-                result += f"📅 {date}\n"
-                result += f"   {activity.name}\n"
-                result += f"   📏 {distance} km | ⏱️ {duration}\n"
+                lines.append(f"📅 {date}\n")
+                lines.append(f"   {activity.name}\n")
+                lines.append(f"   📏 {distance} km | ⏱️ {duration}\n")
                 if activity.average_heartrate:
-                    result += f"   ❤️ {int(activity.average_heartrate)} bpm avg\n"
-                result += f"   ID: {activity.id}\n\n"
+                    lines.append(f"   ❤️ {int(activity.average_heartrate)} bpm avg\n")
+                lines.append(f"   ID: {activity.id}\n\n")
 
-            return [TextContent(type="text", text=result)]
+            if not activities and next_cursor:
+                lines.append("⏳ Older history is still loading from Strava.\n")
+            elif not activities:
+                lines.append("No activities in this range.\n")
+            if next_cursor:
+                lines.append(f'➡️ More: call again with cursor "{next_cursor}"\n')
+
+            return [TextContent(type="text", text="".join(lines))]
 
         elif name == "get_activity_details":
             activity_id = arguments["activity_id"]
@@ -447,34 +1161,193 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             except (ValueError, TypeError):
                 return [TextContent(type="text", text="Invalid activity ID. Must be a numeric value.")]
 
-            activity = get_client().get_activity(activity_id)
+            details, errors = load_activity_details([activity_id])
+            if activity_id in errors:
+                raise errors[activity_id]
+            activity = details[activity_id]
+            stress = get_store().get_training_stress(activity_id)
+
+            if output != TEXT:
+                record = {
+                    "id": activity["id"],
+                    "name": activity["name"],
+                    "sport_type": activity["sport_type"],
+                    "start_local": datetime.fromisoformat(activity["start_date_local"]),
+                    "distance_km": (activity["distance"] or 0.0) / 1000,
+                    "moving_s": activity["moving_time"],
+                    "avg_kmh": activity["average_speed"] * 3.6 if activity["average_speed"] else None,
+                    "avg_hr": activity["average_heartrate"],
+                    "max_hr": activity["max_heartrate"],
+                    "avg_watts": activity["average_watts"],
+                    "suffer_score": activity["suffer_score"],
+                    "description": activity["description"],
+                }
+                if stress:
+                    record.update(stress)
+                return structured(name, output, record)
 
+            start = datetime.fromisoformat(activity["start_date_local"])
             result = f"📊 ACTIVITY DETAILS\n\n"
-            result += f"🏷️ Name: {activity.name}\n"
-            result += f"📅 Date: {activity.start_date_local.strftime('%d-%m-%Y %H:%M')}\n"
-            result += f"📏 Distance: {round(float(activity.distance) / 1000, 1)} km\n"
-            result += f"⏱️ Time: {activity.moving_time}\n"
-            result += f"⚡ Avg Speed: {round(float(activity.average_speed) * 3.6, 1)} km/h\n"
-
-            if activity.average_heartrate:
-                result += f"❤️ Avg HR: {int(activity.average_heartrate)} bpm\n"
-            if activity.max_heartrate:
-                result += f"❤️ Max HR: {int(activity.max_heartrate)} bpm\n"
-            if activity.average_watts:
-                result += f"⚡ Avg Power: {int(activity.average_watts)}W\n"
-            if activity.suffer_score:
-                result += f"💪 Suffer Score: {activity.suffer_score}\n"
-
-            result += f"\n📝 Description: {activity.description or 'No description'}\n"
+            result += f"🏷️ Name: {activity['name']}\n"
+            result += f"📅 Date: {start.strftime('%d-%m-%Y %H:%M')}\n"
+            result += f"📏 Distance: {round((activity['distance'] or 0.0) / 1000, 1)} km\n"
+            result += f"⏱️ Time: {activity['moving_time']}\n"
+            result += f"⚡ Avg Speed: {round((activity['average_speed'] or 0.0) * 3.6, 1)} km/h\n"
+
+            if activity["average_heartrate"]:
+                result += f"❤️ Avg HR: {int(activity['average_heartrate'])} bpm\n"
+            if activity["max_heartrate"]:
+                result += f"❤️ Max HR: {int(activity['max_heartrate'])} bpm\n"
+            if activity["average_watts"]:
+                result += f"⚡ Avg Power: {int(activity['average_watts'])}W\n"
+            if activity["suffer_score"]:
+                result += f"💪 Suffer Score: {activity['suffer_score']:.0f}\n"
+
+            if stress and stress["method"] == "power":
+                result += f"⚡ NP: {stress['normalized_power']:.0f}W | IF: {stress['intensity_factor']:.2f} | "
+                result += f"TSS: {stress['tss']:.0f}\n"
+            elif stress and stress["trimp"]:
+                result += f"❤️ TRIMP: {stress['trimp']:.0f}\n"
+
+            result += f"\n📝 Description: {activity['description'] or 'No description'}\n"
+
+            return [TextContent(type="text", text=result)]
+
+        elif name == "get_activity_details_batch":
+            activity_ids = arguments.get("activity_ids")
+            if isinstance(activity_ids, (str, int)):
+                activity_ids = [activity_ids]
+            try:
+                activity_ids = list(dict.fromkeys(int(activity_id) for activity_id in activity_ids or ()))
+            except (ValueError, TypeError):
+                return [TextContent(type="text", text="Invalid activity ID. Must be a numeric value.")]
+            if not activity_ids:
+                return [TextContent(type="text", text="No activity IDs given.")]
+            if len(activity_ids) > MAX_DETAIL_BATCH:
+                return [TextContent(type="text", text=f"Too many activity IDs: at most {MAX_DETAIL_BATCH} per call.")]
+
+            details, errors = load_activity_details(activity_ids)
+            store = get_store()
+
+            if output != TEXT:
+                rows = []
+                for activity_id in activity_ids:
+                    activity = details.get(activity_id)
+                    if activity is None:
+                        rows.append((activity_id,) + (None,) * 12 + (errors.get(activity_id),))
+                        continue
+                    stress = store.get_training_stress(activity_id) or {}
+                    rows.append((
+                        activity_id, activity["name"], activity["sport_type"],
+                        datetime.fromisoformat(activity["start_date_local"]),
+                        (activity["distance"] or 0.0) / 1000, activity["moving_time"],
+                        activity["average_speed"] and activity["average_speed"] * 3.6,
+                        activity["average_heartrate"], activity["max_heartrate"], activity["average_watts"],
+                        activity["suffer_score"], stress.get("tss"), activity["description"], None,
+                    ))
+                record = {"requested": len(activity_ids), "found": len(details), "failed": len(errors)}
+                return structured(name, output, record, rows)
+
+            result = f"📊 ACTIVITY DETAILS ({len(details)} of {len(activity_ids)})\n\n"
+            for activity_id in activity_ids:
+                activity = details.get(activity_id)
+                if activity is None:
+                    continue
+                start = datetime.fromisoformat(activity["start_date_local"])
+                result += f"🏷️ {activity['name']} (ID: {activity_id})\n"
+                result += f"   📅 {start.strftime('%d-%m-%Y %H:%M')}"
+                if activity["sport_type"]:
+                    result += f" | {SPORT_EMOJI.get(activity['sport_type'], '🏅')} {activity['sport_type']}"
+                result += "\n"
+                line = (f"   📏 {(activity['distance'] or 0.0) / 1000:.1f} km | "
+                        f"⏱️ {timedelta(seconds=activity['moving_time'] or 0)}")
+                if activity["average_speed"]:
+                    line += f" | ⚡ {activity['average_speed'] * 3.6:.1f} km/h"
+                result += line + "\n"
+
+                extras = []
+                if activity["average_heartrate"]:
+                    extras.append(f"❤️ {int(activity['average_heartrate'])} bpm avg")
+                if activity["max_heartrate"]:
+                    extras.append(f"{int(activity['max_heartrate'])} max")
+                if activity["average_watts"]:
+                    extras.append(f"⚡ {int(activity['average_watts'])}W")
+                if activity["suffer_score"]:
+                    extras.append(f"💪 {activity['suffer_score']:.0f}")
+                stress = store.get_training_stress(activity_id)
+                if stress and stress["method"] == "power":
+                    extras.append(f"TSS {stress['tss']:.0f}")
+                elif stress and stress["trimp"]:
+                    extras.append(f"TRIMP {stress['trimp']:.0f}")
+                if extras:
+                    result += "   " + " | ".join(extras) + "\n"
+                if activity["description"]:
+                    result += f"   📝 {activity['description']}\n"
+                result += "\n"
+
+            if errors:
+                result += "⚠️ Not available:\n"
+                for activity_id, error in errors.items():
+                    result += f"   ID {activity_id}: {error}\n"
+
+            return [TextContent(type="text", text=result)]
+
+        elif name == "get_activity_streams":
+            try:
+                activity_id = int(arguments["activity_id"])
+            except (ValueError, TypeError):
+                return [TextContent(type="text", text="Invalid activity ID. Must be a numeric value.")]
+
+            streams = load_activity_streams(activity_id)
+            if not streams:
+                return [TextContent(type="text", text="No streams available for this activity.")]
+
+            units = {"watts": "W", "heartrate": "bpm", "cadence": "rpm", "altitude": "m",
+                     "velocity_smooth": "km/h", "grade_smooth": "%", "temp": "°C"}
+            summaries = []
+            for stream_type, unit in units.items():
+                data = streams.get(stream_type)
+                if data is None or not len(data):
+                    continue
+                values = data.astype(float)
+                if stream_type == "velocity_smooth":
+                    values = values * 3.6
+                summaries.append((stream_type, unit, float(np.nanmean(values)),
+                                  float(np.nanmin(values)), float(np.nanmax(values))))
+            stress = compute_activity_stress(activity_id)
+
+            if output != TEXT:
+                record = dict(stress, id=activity_id)
+                if "time" in streams and len(streams["time"]):
+                    record.update(samples=len(streams["time"]), duration_s=int(streams["time"][-1]))
+                if "distance" in streams and len(streams["distance"]):
+                    record["distance_km"] = float(np.nanmax(streams["distance"])) / 1000
+                return structured(name, output, record, summaries)
+
+            result = f"📈 ACTIVITY STREAMS (ID {activity_id})\n\n"
+            if "time" in streams and len(streams["time"]):
+                result += f"⏱️ {len(streams['time'])} samples over {timedelta(seconds=int(streams['time'][-1]))}\n"
+            if "distance" in streams and len(streams["distance"]):
+                result += f"📏 {round(float(np.nanmax(streams['distance'])) / 1000, 1)} km\n"
+            result += "\n"
+
+            for stream_type, unit, mean, low, high in summaries:
+                result += f"{stream_type}: avg {mean:.1f} | min {low:.1f} | max {high:.1f} {unit}\n"
+
+            if stress["method"] == "power":
+                result += f"\n⚡ NP: {stress['normalized_power']:.0f}W | IF: {stress['intensity_factor']:.2f} | "
+                result += f"TSS: {stress['tss']:.0f}\n"
+            if stress["trimp"]:
+                result += f"❤️ TRIMP: {stress['trimp']:.0f}\n"
 
             return [TextContent(type="text", text=result)]
 
         elif name == "get_weekly_stats":
             weeks = min(int(arguments.get("weeks", 4)), 52)
-            activities = get_client().get_activities(limit=200)
+            now = datetime.now()
+            activities = load_activities(since=now - timedelta(days=weeks * 7))
 
             weekly_data = {}
-            now = datetime.now()
 
             for activity in activities:
                 activity_date = activity.start_date_local.replace(tzinfo=None)
@@ -499,6 +1372,12 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
                 weekly_data[week_label]["activities"] += 1
 
+            if output != TEXT:
+                rows = [(0 if week == "This week" else int(week[len("Week -"):]), data["activities"],
+                         data["distance"], data["time"].total_seconds() / 3600)
+                        for week, data in weekly_data.items()]
+                return structured(name, output, {"weeks": weeks}, sorted(rows))
+
             result = f"📈 WEEKLY STATISTICS (last {weeks} weeks)\n\n"
 
             for week in sorted(weekly_data.keys(), reverse=True):
@@ -512,16 +1391,82 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
             return [TextContent(type="text", text=result)]
 
+        elif name == "get_period_stats":
+            granularity = arguments.get("granularity") or "week"
+            if granularity not in GRANULARITIES:
+                return [TextContent(type="text", text=f"Invalid granularity. Use one of: {', '.join(GRANULARITIES)}.")]
+            try:
+                end_date = (datetime.strptime(arguments["end_date"], "%Y-%m-%d").date()
+                            if arguments.get("end_date") else datetime.now().date())
+                if arguments.get("start_date"):
+                    start_date = datetime.strptime(arguments["start_date"], "%Y-%m-%d").date()
+                else:
+                    start_date = period_start(end_date, granularity)
+                    for _ in range(max(1, min(int(arguments.get("periods", 12)), MAX_PERIODS)) - 1):
+                        start_date = period_start(start_date - timedelta(days=1), granularity)
+            except ValueError:
+                return [TextContent(type="text", text="Invalid date. Use the format YYYY-MM-DD.")]
+
+            sync_activities()
+            store = get_store()
+            rows = store.period_stats(granularity, start_date, end_date, arguments.get("sport_type"))
+            history_start = None
+            if not store.history_complete() and store.oldest_start_local():
+                history_start = datetime.fromisoformat(store.oldest_start_local()).date()
+
+            if output != TEXT:
+                record = {"granularity": granularity, "start_date": period_start(start_date, granularity),
+                          "end_date": end_date, "history_start": history_start}
+                return structured(name, output, record, [
+                    (row["period"], row["sport_type"], row["count"], row["distance"] / 1000, row["moving_time"],
+                     row["elevation"], row["load"]) for row in rows
+                ])
+
+            result = (f"📊 PERIOD STATS (per {granularity}, {period_start(start_date, granularity).strftime('%d-%m-%Y')}"
+                      f" – {end_date.strftime('%d-%m-%Y')})\n\n")
+            if not rows:
+                result += "No activities in this period.\n"
+
+            current = None
+            for row in rows:
+                if row["period"] != current:
+                    if current is not None:
+                        result += "\n"
+                    current = row["period"]
+                    result += f"{period_label(current, granularity)}:\n"
+                emoji = SPORT_EMOJI.get(row["sport_type"], "🏅")
+                result += (f"  {emoji} {row['sport_type']}: {row['count']}x | {round(row['distance'] / 1000, 1)} km | "
+                           f"{round(row['moving_time'] / 3600, 1)} hrs | {row['elevation']:.0f} m ↑ | "
+                           f"load {row['load']:.0f}\n")
+
+            if rows:
+                result += (f"\nTotal: {sum(r['count'] for r in rows)} activities | "
+                           f"{round(sum(r['distance'] for r in rows) / 1000, 1)} km | "
+                           f"{round(sum(r['moving_time'] for r in rows) / 3600, 1)} hrs | "
+                           f"{sum(r['elevation'] for r in rows):.0f} m ↑\n")
+            if history_start and history_start > start_date:
+                result += (f"\nℹ️ Local history starts on {history_start.strftime('%d-%m-%Y')}; "
+                           f"run backfill_history to include older activities.\n")
+
+            return [TextContent(type="text", text=result)]
+
         elif name == "get_training_load_analysis":
-            activities = list(get_client().get_activities(limit=200))
+            series = load_training_load_series(days=8 * 7)
 
-            loads = calculate_training_loads(activities)
+            loads = current_training_loads(series)
             recommendation = get_training_recommendation(
                 loads["tsb"], loads["atl"], loads["ctl"]
             )
-            weekly_trends = calculate_weekly_trends(loads["daily_loads"], weeks=8)
+            weekly_trends = weekly_trends_from_series(series, weeks=8)
             ramp_rate = calculate_ramp_rate(weekly_trends)
 
+            if output != TEXT:
+                record = dict(loads, status=recommendation["status"], advice=recommendation["advice"])
+                if ramp_rate:
+                    record.update(ramp_rate=ramp_rate["rate"], ramp_status=ramp_rate["status"])
+                rows = [(t["week_label"], t["atl"], t["ctl"], t["tsb"]) for t in weekly_trends[-8:]]
+                return structured(name, output, record, rows)
+
             result = "🏋️ TRAINING LOAD ANALYSIS\n\n"
             result += f"📊 CURRENT STATUS\n"
             result += f"ATL (Acute - 7 days): {loads['atl']}\n"
@@ -550,16 +1495,19 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             return [TextContent(type="text", text=result)]
 
         elif name == "get_weekly_training_plan":
-            activities = list(get_client().get_activities(limit=200))
+            series = load_training_load_series(days=8 * 7)
 
-            loads = calculate_training_loads(activities)
-            weekly_trends = calculate_weekly_trends(loads["daily_loads"], weeks=8)
+            loads = current_training_loads(series)
+            weekly_trends = weekly_trends_from_series(series, weeks=8)
             ramp_rate = calculate_ramp_rate(weekly_trends)
 
             plan = generate_weekly_recommendation(
                 loads["tsb"], loads["atl"], loads["ctl"], ramp_rate
             )
 
+            if output != TEXT:
+                return structured(name, output, plan, plan["plan"].items())
+
             result = "📋 WEEKLY TRAINING PLAN\n\n"
             result += f"⏱️ VOLUME ADVICE\n"
             result += f"Current week: ~{plan['current_hours']} hrs\n"
@@ -576,21 +1524,471 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
             return [TextContent(type="text", text=result)]
 
+        elif name == "get_power_curve":
+            try:
+                end_date = (datetime.strptime(arguments["end_date"], "%Y-%m-%d").date()
+                            if arguments.get("end_date") else datetime.now().date())
+                start_date = (datetime.strptime(arguments["start_date"], "%Y-%m-%d").date()
+                              if arguments.get("start_date")
+                              else end_date - timedelta(days=int(arguments.get("days", 365)) - 1))
+            except ValueError:
+                return [TextContent(type="text", text="Invalid date. Use the format YYYY-MM-DD.")]
+
+            sync_activities()
+            try:
+                update_power_curves(start_date, end_date)
+            except RateLimitExceeded:
+                pass  # show what is analyzed so far, the rest follows in the background
+            best, ride_count = get_store().best_power(start_date, end_date)
+            pending = len(get_store().activities_needing_power_curve(start_date, end_date))
+
+            if output != TEXT:
+                record = {"start_date": start_date, "end_date": end_date, "rides": ride_count, "pending": pending,
+                          "ftp_estimate": best[1200]["watts"] * 0.95 if 1200 in best else None}
+                rows = [(duration, best[duration]["watts"], best[duration]["date"], best[duration]["activity_id"])
+                        for duration in STANDARD_DURATIONS if duration in best]
+                return structured(name, output, record, rows)
+
+            result = f"⚡ POWER CURVE ({start_date.strftime('%d-%m-%Y')} – {end_date.strftime('%d-%m-%Y')})\n\n"
+            if not best:
+                result += "No rides with power data in this period.\n"
+            else:
+                result += f"{'Duration':<10} {'Power':>7}   Date\n"
+                for duration in STANDARD_DURATIONS:
+                    if duration in best:
+                        entry = best[duration]
+                        result += (f"{format_duration(duration):<10} {entry['watts']:>6.0f}W   "
+                                   f"{entry['date'].strftime('%d-%m-%Y')} (ID: {entry['activity_id']})\n")
+                if 1200 in best:
+                    result += f"\n🎯 Estimated FTP (95% of 20min): {best[1200]['watts'] * 0.95:.0f}W\n"
+                result += f"\nBased on {ride_count} rides with power.\n"
+            if pending:
+                result += f"⏳ {pending} rides not analyzed yet; they are added in the background.\n"
+
+            return [TextContent(type="text", text=result)]
+
+        elif name == "backfill_history":
+            backfill = get_backfill()
+            if not backfill.store.backfill_state()["complete"]:
+                backfill.start()
+            status = backfill.status()
+
+            result = "📦 HISTORY BACKFILL\n\n"
+            result += f"Status: {status['state']}\n"
+            result += f"Activities stored: {status['stored_activities']}"
+            if status['total_estimate']:
+                result += f" (≈ {status['total_estimate']} rides, runs and swims on Strava)"
+            result += f"\nPages fetched: {status['pages_done']}\n"
+            if status['activities_this_run']:
+                result += f"⚡ Throughput: {status['activities_per_sec']} activities/sec\n"
+            if status['eta_seconds'] is not None:
+                result += f"⏳ ETA: ~{timedelta(seconds=status['eta_seconds'])}\n"
+            if status['error']:
+                result += f"\n⚠️ Stopped: {status['error']}\nCall again to resume where it stopped.\n"
+
+            return [TextContent(type="text", text=result)]
+
+        elif name == "get_rate_limit_status":
+            status = scheduler.status()
+
+            result = "⏳ STRAVA API BUDGET\n\n"
+            result += f"15-minute window: {status['short_usage']}/{status['short_limit']} used "
+            result += f"(resets in {status['short_reset_in'] // 60} min)\n"
+            result += f"Daily: {status['long_usage']}/{status['long_limit']} used "
+            result += f"(resets in {round(status['long_reset_in'] / 3600, 1)} hrs)\n"
+            result += f"Burst tokens: {status['tokens']}/{status['burst']}\n\n"
+
+            result += f"📨 Requests sent: {status['requests']['interactive']} interactive, "
+            result += f"{status['requests']['background']} background\n"
+            result += f"⏸️ Waiting: {status['waiting']['interactive']} interactive, "
+            result += f"{status['waiting']['background']} background\n"
+            result += f"🚫 Throttled: {status['throttled']}\n"
+            if not status['from_headers']:
+                result += "\nℹ️ No Strava response seen yet; limits are the configured defaults.\n"
+
+            return [TextContent(type="text", text=result)]
+
+        elif name == "get_server_metrics":
+            snapshot = metrics.snapshot()
+            status = scheduler.status()
+
+            result = "📊 SERVER METRICS\n\n"
+            result += f"Uptime: {timedelta(seconds=int(snapshot['uptime']))}\n\n"
+
+            result += "⏱️ TOOL LATENCY\n"
+            if not snapshot["tools"]:
+                result += "No tool calls yet\n"
+            for tool, data in sorted(snapshot["tools"].items()):
+                calls = data["count"]
+                phases = data["phases"]
+                compute = max(0.0, data["sum"] - sum(phases.values()))
+                result += (f"{tool}: {calls} calls | p50 ≤{_ms(data['p50'])} | p95 ≤{_ms(data['p95'])} | "
+                           f"max {_ms(data['max'])}")
+                if data["errors"]:
+                    result += f" | {data['errors']} errors"
+                result += (f"\n  avg {_ms(data['sum'] / calls)} = Strava {_ms(phases['upstream'] / calls)}"
+                           f" + token refresh {_ms(phases['token_refresh'] / calls)}"
+                           f" + quota wait {_ms(phases['rate_limit_wait'] / calls)}"
+                           f" + compute {_ms(compute / calls)}\n")
+
+            result += "\n🌐 STRAVA API CALLS\n"
+            if not snapshot["upstream"]:
+                result += "No Strava requests yet\n"
+            for endpoint, data in sorted(snapshot["upstream"].items()):
+                statuses = ", ".join(f"{status}: {n}" for status, n in sorted(data["status"].items()))
+                result += (f"{endpoint}: {data['count']} calls | avg {_ms(data['sum'] / data['count'])} | "
+                           f"max {_ms(data['max'])} ({statuses})\n")
+            result += f"Waiting for API budget: {_ms(snapshot['rate_limit_wait'])} total\n"
+
+            result += "\n💾 CACHE (tool calls)\n"
+            if not snapshot["cache"]:
+                result += "No cache lookups yet\n"
+            for cache, data in sorted(snapshot["cache"].items()):
+                total = data["hits"] + data["misses"]
+                result += (f"{cache}: {data['hits']} hits / {data['misses']} misses "
+                           f"({round(100 * data['hits'] / total)}% hit)\n")
+
+            result += "\n🔗 SHARED FETCHES\n"
+            if not snapshot["flights"]:
+                result += "No shared fetches yet\n"
+            for fetch, counts in sorted(snapshot["flights"].items()):
+                result += (f"{fetch}: {counts['fetched']} sent | {counts['coalesced']} joined in flight | "
+                           f"{counts['hit']} reused\n")
+
+            result += "\n⏳ API BUDGET\n"
+            result += f"15-minute window: {status['short_usage']}/{status['short_limit']} used\n"
+            result += f"Daily: {status['long_usage']}/{status['long_limit']} used\n"
+            result += f"Throttled requests: {status['throttled']}\n"
+
+            return [TextContent(type="text", text=result)]
+
         else:
             return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
     except Exception as e:
+        metrics.count_tool_error(name)
         return [TextContent(type="text", text=f"Error executing {name}: {str(e)}")]
 
 
+def structured(name, output, record=None, rows=()):
+    """Tool result in the compact or json format (see output_format.py)"""
+    return [TextContent(type="text", text=render(name, output, record, rows))]
+
+
+# get_period_stats: cap on `periods`, and the emoji per sport type
+MAX_PERIODS = 400
+SPORT_EMOJI = {"Ride": "🚴", "VirtualRide": "🚴", "GravelRide": "🚴", "MountainBikeRide": "🚵",
+               "Run": "🏃", "TrailRun": "🏃", "VirtualRun": "🏃", "Walk": "🚶", "Hike": "🥾",
+               "Swim": "🏊", "WeightTraining": "🏋️", "Workout": "💪"}
+
+
+def period_label(start, granularity):
+    if granularity == "day":
+        return start.strftime("%a %d-%m-%Y")
+    if granularity == "week":
+        year, week, _ = start.isocalendar()
+        return f"Week {week} {year} (from {start.strftime('%d-%m-%Y')})"
+    if granularity == "month":
+        return start.strftime("%B %Y")
+    return str(start.year)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms"
+
+
+# Webhook updates that can be applied without refetching the activity
+WEBHOOK_FIELD_UPDATES = {'title': 'name', 'type': 'sport_type', 'sport_type': 'sport_type'}
+
+
+def get_athlete_id():
+    """
+    Strava id of the current athlete, asked once and then kept in its store
+    None while it is not stored and the athlete has no tokens to ask with.
+    """
+    store = get_store()
+    athlete_id = store.athlete_id()
+    if athlete_id is None and has_tokens(current_athlete()):
+        with request_lane(BACKGROUND):
+            athlete_id = int(get_client().get_athlete().id)
+        store.set_athlete_id(athlete_id)
+    return athlete_id
+
+
+def _owns(owner_id):
+    """True when the current athlete is Strava athlete `owner_id`"""
+    try:
+        return get_athlete_id() == owner_id
+    except Exception as e:
+        print(f"Could not identify athlete for webhook event: {e}", file=sys.stderr)
+        return False
+
+
+def apply_webhook_event(event):
+    """
+    Update or invalidate the activity a Strava webhook event refers to
+    The app's subscription delivers the events of every athlete that
+    authorized it; each goes to the store of the athlete with that owner_id
+    (the .env athlete or one of the multi-athlete mode), others are ignored.
+    """
+    if event.get('object_type') != 'activity':
+        # Athlete events (e.g. deauthorization) do not touch the activity store
+        return
+
+    owner_id = event.get('owner_id')
+    if owner_id is None or _owns(int(owner_id)):
+        apply_activity_event(event)
+        return
+    name = _athlete_with_id(int(owner_id))
+    if name is None:
+        print(f"Ignoring webhook event of unknown athlete {owner_id}", file=sys.stderr)
+        return
+    athlete = athletes.acquire(name, touch=False)
+    try:
+        athlete.call(apply_activity_event, event)
+    finally:
+        athletes.release(athlete, touch=False)
+
+
+def _athlete_with_id(owner_id):
+    """
+    Name of the multi-athlete mode athlete with Strava id `owner_id`, or None
+    The ids kept in the athletes' stores are read without opening them; only
+    athletes never identified before are opened to ask Strava (once).
+    """
+    unidentified = []
+    for name in athletes.names():
+        athlete_id = athletes.stored_athlete_id(name)
+        if athlete_id == owner_id:
+            return name
+        if athlete_id is None:
+            unidentified.append(name)
+    for name in unidentified:
+        athlete = athletes.acquire(name, touch=False)
+        try:
+            if athlete.call(_owns, owner_id):
+                return name
+        finally:
+            athletes.release(athlete, touch=False)
+    return None
+
+
+def apply_activity_event(event):
+    """apply_webhook_event() for an activity event of the current athlete"""
+    activity_id = int(event['object_id'])
+    aspect = event.get('aspect_type')
+    store = get_store()
+    # A copy fetched just before the change must not be handed out again
+    flights.forget('activity', (flight_owner(), activity_id))
+
+    if aspect == 'delete':
+        store.delete_activity(activity_id)
+        return
+
+    updates = event.get('updates') or {}
+    if aspect == 'update' and set(updates) <= set(WEBHOOK_FIELD_UPDATES) | {'private'}:
+        fields = {WEBHOOK_FIELD_UPDATES[k]: v for k, v in updates.items() if k in WEBHOOK_FIELD_UPDATES}
+        if not fields or store.update_activity_fields(activity_id, **fields):
+            return
+
+    # New activity or a change we cannot apply locally: fetch just this one
+    with request_lane(BACKGROUND):
+        activity = get_client().get_activity(activity_id)
+    store.save_details([activity])
+    # A backdated upload older than what is stored would leave a gap behind it;
+    # the backfill stores it when it pages that far back
+    oldest = store.oldest_start()
+    if (oldest is not None and project_activity(activity)['start_date'] < oldest
+            and not store.history_complete()):
+        return
+    store.upsert_activities([activity])
+
+
+def start_webhook_receiver():
+    """Start the webhook endpoint if STRAVA_WEBHOOK_PORT is set, returns the receiver or None"""
+    port = os.getenv('STRAVA_WEBHOOK_PORT')
+    if not port:
+        return None
+
+    verify_token = os.getenv('STRAVA_WEBHOOK_VERIFY_TOKEN')
+    if not verify_token:
+        print("Webhook receiver disabled: STRAVA_WEBHOOK_VERIFY_TOKEN is not set", file=sys.stderr)
+        return None
+
+    receiver = WebhookReceiver(
+        apply_webhook_event,
+        verify_token,
+        host=os.getenv('STRAVA_WEBHOOK_HOST', '127.0.0.1'),
+        port=int(port)
+    )
+    receiver.start()
+    return receiver
+
+
+# Seconds between background syncs (0 disables the background task)
+BACKGROUND_SYNC_INTERVAL = int(os.getenv('STRAVA_BACKGROUND_SYNC_INTERVAL', '900'))
+
+# The first sync (and its stravalib import) waits until the client has had
+# time to initialize and list the tools
+STARTUP_SYNC_DELAY = float(os.getenv('STRAVA_STARTUP_SYNC_DELAY', '2'))
+
+
+def refresh_cached_data():
+    """Sync new activities, analyze their streams and update the load series"""
+    with request_lane(BACKGROUND):
+        sync_activities()
+        update_training_stress()
+        update_power_curves(limit=STRESS_BATCH_SIZE)
+        load_training_load_series()
+
+
+def refresh_athlete_data(name):
+    """refresh_cached_data() for an open athlete, without keeping it from going idle"""
+    athlete = athletes.acquire(name, touch=False)
+    try:
+        athlete.call(refresh_cached_data)
+    finally:
+        athletes.release(athlete, touch=False)
+
+
+async def background_sync(interval, delay=0):
+    """Keep the local data warm so tool calls rarely wait on Strava"""
+    await asyncio.sleep(delay)
+    default_athlete = True
+    while True:
+        if default_athlete:
+            try:
+                await asyncio.to_thread(refresh_cached_data)
+            except SystemExit:
+                # Missing credentials; tool calls will report it
+                print("Background sync of the .env athlete disabled: no Strava credentials", file=sys.stderr)
+                default_athlete = False
+            except Exception as e:
+                print(f"Background sync failed: {e}", file=sys.stderr)
+
+        # Athletes of the multi-athlete mode stay warm while they are in use
+        athletes.evict_idle()
+        for name in athletes.loaded():
+            try:
+                await asyncio.to_thread(refresh_athlete_data, name)
+            except Exception as e:
+                print(f"Background sync of athlete {name} failed: {e}", file=sys.stderr)
+        await asyncio.sleep(interval)
+
+
+# Optional Prometheus text file (e.g. for node_exporter's textfile collector)
+METRICS_FILE = os.getenv('STRAVA_METRICS_FILE')
+METRICS_INTERVAL = float(os.getenv('STRAVA_METRICS_INTERVAL', '60'))
+
+
+def write_metrics_file(path=None):
+    metrics.write_prometheus(path or METRICS_FILE, scheduler.status())
+
+
+async def export_metrics(interval):
+    """Rewrite the Prometheus metrics file every `interval` seconds"""
+    while True:
+        try:
+            await asyncio.to_thread(write_metrics_file)
+        except Exception as e:
+            print(f"Writing metrics failed: {e}", file=sys.stderr)
+        await asyncio.sleep(interval)
+
+
+# Transport: 'stdio' (one process per client, the default) or 'http'
+# (streamable HTTP: one long-lived process for many concurrent clients)
+TRANSPORT = os.getenv('STRAVA_MCP_TRANSPORT', 'stdio')
+HTTP_HOST = os.getenv('STRAVA_MCP_HOST', '127.0.0.1')
+HTTP_PORT = int(os.getenv('STRAVA_MCP_PORT', '8000'))
+# Tool calls running at once (across all sessions); further calls wait for a slot
+MAX_CONCURRENT_TOOLS = int(os.getenv('STRAVA_MCP_MAX_CONCURRENCY', '8'))
+# Seconds open requests get to finish when the HTTP server is stopped
+SHUTDOWN_TIMEOUT = float(os.getenv('STRAVA_MCP_SHUTDOWN_TIMEOUT', '10'))
+
+_tool_slots = None
+
+
+@contextlib.asynccontextmanager
+async def background_services():
+    """Webhook receiver, background sync and metrics export for the lifetime of the server"""
+    global _tool_slots
+    _tool_slots = asyncio.Semaphore(MAX_CONCURRENT_TOOLS)
+    webhook_receiver = start_webhook_receiver()
+    sync_task = None
+    if BACKGROUND_SYNC_INTERVAL > 0:
+        sync_task = asyncio.create_task(background_sync(BACKGROUND_SYNC_INTERVAL, STARTUP_SYNC_DELAY))
+    metrics_task = None
+    if METRICS_FILE:
+        metrics_task = asyncio.create_task(export_metrics(METRICS_INTERVAL))
+    try:
+        yield
+    finally:
+        # Release requests still waiting for quota so worker threads can exit
+        scheduler.shutdown()
+        if _backfill is not None:
+            _backfill.stop()
+        athletes.stop()
+        if sync_task is not None:
+            sync_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await sync_task
+        if metrics_task is not None:
+            metrics_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await metrics_task
+            with contextlib.suppress(Exception):
+                write_metrics_file()
+        if webhook_receiver is not None:
+            webhook_receiver.stop()
+        _tool_slots = None
+
+
+def http_app():
+    """Starlette app serving the MCP endpoint at /mcp (streamable HTTP)"""
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    session_manager = StreamableHTTPSessionManager(app=server)
+
+    class MCPEndpoint:
+        # A plain ASGI callable, so Route passes the request through untouched
+        async def __call__(self, scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run(), background_services():
+            yield
+
+    return Starlette(routes=[Route('/mcp', endpoint=MCPEndpoint())], lifespan=lifespan)
+
+
+async def serve_http(host=HTTP_HOST, port=HTTP_PORT):
+    """Serve MCP over streamable HTTP until SIGINT/SIGTERM, then let open requests finish"""
+    import uvicorn
+
+    config = uvicorn.Config(http_app(), host=host, port=port, log_level='warning', access_log=False,
+                            timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    print(f"Strava MCP server listening on http://{host}:{port}/mcp", file=sys.stderr)
+    await uvicorn.Server(config).serve()
+
+
 async def main():
     """Start MCP server"""
+    if TRANSPORT == 'http':
+        await serve_http()
+        return
+    if TRANSPORT != 'stdio':
+        raise SystemExit(f"Unknown STRAVA_MCP_TRANSPORT '{TRANSPORT}' (use 'stdio' or 'http')")
+
     async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+        async with background_services():
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+"""Single-flight coalescing of identical upstream fetches."""
+
+import threading
+import time
+
+# How a fetch request was answered
+FETCHED = 'fetched'
+COALESCED = 'coalesced'
+HIT = 'hit'
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """
+    Sends identical fetches only once
+    A caller asking for a key whose fetch is still running waits for it and
+    gets the same result (or exception). A successful result is also handed
+    out for `window` seconds after it arrived; failures are not kept.
+    Every request is counted in metrics.count_flight(name, outcome).
+    """
+
+    def __init__(self, window=5.0, metrics=None, clock=time.monotonic):
+        self.window = window
+        self.metrics = metrics
+        self.clock = clock
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        expired = [key for key, flight in self._flights.items()
+                   if flight.finished_at is not None and now - flight.finished_at >= self.window]
+        for key in expired:
+            del self._flights[key]
+
+    def do(self, name, key, func, *args, **kwargs):
+        """func(*args, **kwargs), shared with concurrent and recent calls for the same (name, key)"""
+        key = (name, key)
+        with self._lock:
+            self._expire(self.clock())
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                outcome = FETCHED
+            else:
+                outcome = HIT if flight.done.is_set() else COALESCED
+        if self.metrics is not None:
+            self.metrics.count_flight(name, outcome)
+
+        if leader:
+            try:
+                flight.result = func(*args, **kwargs)
+            except BaseException as e:
+                flight.error = e
+                with self._lock:
+                    del self._flights[key]
+                raise
+            finally:
+                flight.finished_at = self.clock()
+                flight.done.set()
+            return flight.result
+
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def forget(self, name, key):
+        """Drop a kept result, so the next request fetches again"""
+        with self._lock:
+            flight = self._flights.get((name, key))
+            if flight is not None and flight.done.is_set():
+                del self._flights[(name, key)]
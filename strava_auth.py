@@ -1,9 +1,10 @@
 import os
-import stat
-import tempfile
+import argparse
 from urllib.parse import urlparse, parse_qs
 from stravalib.client import Client
 from dotenv import load_dotenv
+from athletes import create_athlete
+from tokens import EnvTokenStore
 import webbrowser
 
 # Load environment variables
@@ -11,9 +12,10 @@ load_dotenv()
 
 
 class StravaAuth:
-    def __init__(self):
+    def __init__(self, env_path=None):
         self.client_id = os.getenv('STRAVA_CLIENT_ID')
         self.client_secret = os.getenv('STRAVA_CLIENT_SECRET')
+        self.env_path = env_path or os.path.join(os.path.dirname(__file__), '.env')
         self.client = Client()
 
     def authorize(self):
@@ -55,36 +57,29 @@ class StravaAuth:
         # Update .env file
         self._update_env_tokens(
             token_response['access_token'],
-            token_response['refresh_token']
+            token_response['refresh_token'],
+            token_response['expires_at']
         )
 
-        print("\n✅ Authentication successful! Tokens saved to .env")
+        print(f"\n✅ Authentication successful! Tokens saved to {self.env_path}")
         return token_response
 
-    def _update_env_tokens(self, access_token, refresh_token):
-        """Update .env file with new tokens (atomic write)"""
-        env_path = os.path.join(os.path.dirname(__file__), '.env')
-
-        with open(env_path, 'r') as file:
-            lines = file.readlines()
-
-        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(env_path))
-        try:
-            with os.fdopen(fd, 'w') as tmp_file:
-                for line in lines:
-                    if line.startswith('STRAVA_ACCESS_TOKEN='):
-                        tmp_file.write(f'STRAVA_ACCESS_TOKEN={access_token}\n')
-                    elif line.startswith('STRAVA_REFRESH_TOKEN='):
-                        tmp_file.write(f'STRAVA_REFRESH_TOKEN={refresh_token}\n')
-                    else:
-                        tmp_file.write(line)
-            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
-            os.replace(tmp_path, env_path)
-        except Exception:
-            os.unlink(tmp_path)
-            raise
+    def _update_env_tokens(self, access_token, refresh_token, expires_at=None):
+        """Update .env file with new tokens (atomic write, under the token file lock)"""
+        store = EnvTokenStore(self.env_path)
+        with store.lock():
+            store.save(access_token, refresh_token, expires_at)
 
 
 if __name__ == "__main__":
-    auth = StravaAuth()
+    parser = argparse.ArgumentParser(description="Authorize this server with Strava")
+    parser.add_argument('--athlete', help="add an athlete for multi-athlete mode (tokens go to "
+                                          "athletes/<name>/.env; the Strava app in .env is shared)")
+    args = parser.parse_args()
+
+    env_path = None
+    if args.athlete:
+        athletes_dir = os.getenv('STRAVA_ATHLETES_DIR') or os.path.join(os.path.dirname(__file__), 'athletes')
+        env_path = create_athlete(athletes_dir, args.athlete)
+    auth = StravaAuth(env_path)
     auth.authorize()
@@ -0,0 +1,100 @@
+"""On-disk cache for Strava activity streams as compact typed arrays."""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+DEFAULT_STREAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strava_cache', 'streams')
+
+# Storage type per stream; samples Strava leaves empty become 0 (integers) or NaN (floats)
+STREAM_DTYPES = {
+    'time': np.int32,
+    'distance': np.float32,
+    'altitude': np.float32,
+    'velocity_smooth': np.float32,
+    'grade_smooth': np.float32,
+    'heartrate': np.int16,
+    'cadence': np.int16,
+    'watts': np.int16,
+    'temp': np.int8,
+    'moving': np.bool_,
+    'latlng': np.float64,
+}
+
+STREAM_TYPES = list(STREAM_DTYPES)
+
+# Written last, so a directory without it is an interrupted download
+INDEX_FILE = 'index.json'
+
+
+def to_array(stream_type, data):
+    """Convert a list of stream samples to the compact array for `stream_type`"""
+    dtype = STREAM_DTYPES.get(stream_type, np.float64)
+    if np.issubdtype(dtype, np.floating):
+        if stream_type == 'latlng':
+            return np.array([p if p is not None else (np.nan, np.nan) for p in data], dtype=dtype).reshape(-1, 2)
+        return np.array([np.nan if v is None else v for v in data], dtype=dtype)
+    return np.array([0 if v is None else v for v in data], dtype=dtype)
+
+
+class StreamStore:
+    """
+    Activity streams cached permanently on disk
+    Each activity gets a directory with one .npy file per stream type,
+    loaded memory-mapped so long rides are not read into Python lists.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv('STRAVA_STREAMS_DIR') or DEFAULT_STREAMS_DIR
+        os.makedirs(self.root, exist_ok=True)
+
+    def _activity_dir(self, activity_id):
+        return os.path.join(self.root, str(int(activity_id)))
+
+    def has(self, activity_id):
+        return os.path.exists(os.path.join(self._activity_dir(activity_id), INDEX_FILE))
+
+    def available_types(self, activity_id):
+        """Stream types stored for an activity (empty list if not cached)"""
+        try:
+            with open(os.path.join(self._activity_dir(activity_id), INDEX_FILE)) as f:
+                return json.load(f)['types']
+        except FileNotFoundError:
+            return []
+
+    def save(self, activity_id, streams):
+        """Store {stream_type: samples} for an activity, replacing any cached copy"""
+        target = self._activity_dir(activity_id)
+        tmp_dir = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            for stream_type, data in streams.items():
+                np.save(os.path.join(tmp_dir, f'{stream_type}.npy'), to_array(stream_type, data))
+            with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+                json.dump({'types': sorted(streams)}, f)
+
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            try:
+                os.replace(tmp_dir, target)
+            except OSError:
+                # Another download of the same activity finished first
+                if not self.has(activity_id):
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def load(self, activity_id, types=None):
+        """Memory-mapped arrays {stream_type: array} for the cached streams"""
+        activity_dir = self._activity_dir(activity_id)
+        wanted = self.available_types(activity_id)
+        if types is not None:
+            wanted = [t for t in wanted if t in types]
+        return {
+            stream_type: np.load(os.path.join(activity_dir, f'{stream_type}.npy'), mmap_mode='r')
+            for stream_type in wanted
+        }
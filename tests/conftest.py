@@ -0,0 +1,20 @@
+"""Shared test setup: keep the server's local caches out of the working tree."""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("STRAVA_DB_PATH", str(tmp_path / "strava_cache.db"))
+    monkeypatch.setenv("STRAVA_STREAMS_DIR", str(tmp_path / "streams"))
+    monkeypatch.setattr(server, "_store", None)
+    monkeypatch.setattr(server, "_stream_store", None)
+    monkeypatch.setattr(server, "flights", SingleFlight(server.COALESCE_WINDOW, server.metrics))
@@ -0,0 +1,350 @@
+"""Tests for the local activity store in activity_store.py."""
+
+import sys
+import os
+import asyncio
+import weakref
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from activity_store import ActivityStore, INITIAL_SYNC_LIMIT, decode_cursor, encode_cursor
+
+
+@dataclass
+class MockActivity:
+    """Minimal stand-in for a stravalib SummaryActivity."""
+    id: int
+    start_date: datetime
+    start_date_local: datetime
+    name: str = "Ride"
+    sport_type: str = "Ride"
+    distance: float = 30000.0
+    moving_time: int = 3600
+    average_heartrate: float | None = 140.0
+    suffer_score: int | None = 50
+
+
+def make_activity(activity_id, days_ago):
+    start = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return MockActivity(id=activity_id, start_date=start,
+                        start_date_local=start.replace(tzinfo=None))
+
+
+class FakeClient:
+    """Records get_activities calls and serves activities newer than `after`."""
+
+    def __init__(self, activities):
+        self.activities = activities
+        self.calls = []
+
+    def get_activities(self, before=None, after=None, limit=None):
+        self.calls.append({"after": after, "limit": limit})
+        result = [a for a in self.activities if after is None or a.start_date > after]
+        return result[:limit] if limit else result
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ActivityStore(str(tmp_path / "activities.db"))
+
+
+class TestActivityStore:
+    def test_empty_store(self, store):
+        assert store.count() == 0
+        assert store.get_watermark() is None
+        assert store.last_sync_at() is None
+
+    def test_upsert_is_idempotent(self, store):
+        activity = make_activity(1, 0)
+        store.upsert_activities([activity])
+        store.upsert_activities([activity])
+        assert store.count() == 1
+
+    def test_records_have_tool_fields(self, store):
+        store.upsert_activities([make_activity(1, 0)])
+        record = store.list_activities()[0]
+        assert not hasattr(record, "__dict__")
+        assert record.distance == 30000.0
+        assert record.moving_time == timedelta(hours=1)
+        assert record.suffer_score == 50
+
+    def test_list_since_and_newest_first(self, store):
+        store.upsert_activities([make_activity(i, days_ago=i * 10) for i in range(5)])
+        recent = store.list_activities(since=datetime.now() - timedelta(days=25))
+        assert [a.id for a in recent] == [0, 1, 2]
+
+    def test_load_changes_mark_series_dirty(self, store):
+        activity = make_activity(1, 3)
+        store.upsert_activities([activity])
+        state = store.load_series_state()
+        assert state["dirty_from"] == activity.start_date_local.date()
+
+        store.save_load_series(state["dirty_from"], [1.0], [1.0], state["data_version"])
+        store.upsert_activities([activity])
+        assert store.load_series_state()["dirty_from"] is None
+
+        activity.suffer_score = 90
+        store.upsert_activities([activity])
+        assert store.load_series_state()["data_version"] == state["data_version"] + 1
+
+    def test_delete_activity(self, store):
+        store.upsert_activities([make_activity(1, 0)])
+        assert store.delete_activity(1)
+        assert not store.delete_activity(1)
+        assert store.count() == 0
+
+    def test_detail_cache_follows_changes(self, store):
+        activities = [make_activity(i, i) for i in range(1, 4)]
+        store.upsert_activities(activities)
+        saved = store.save_details(activities + [{"id": 9, "name": "Old", "start_date": "2010-01-01T08:00:00Z",
+                                                  "start_date_local": "2010-01-01T09:00:00Z",
+                                                  "average_speed": 5.0, "description": "First ride"}])
+        assert saved[9]["description"] == "First ride" and saved[1]["average_speed"] is None
+        assert set(store.get_details([1, 2, 3, 9, 10])) == {1, 2, 3, 9}
+        assert store.get_details([1], max_age=-1) == {}
+
+        store.upsert_activities(activities[:2])  # unchanged summaries keep their details
+        activities[1].name = "Renamed"
+        store.upsert_activities(activities[:2])
+        store.update_activity_fields(3, sport_type="Run")
+        store.delete_activity(9)
+        assert set(store.get_details([1, 2, 3, 9])) == {1}
+
+
+class TestPaging:
+    def test_keyset_pages_cover_everything_once(self, store):
+        start = datetime(2026, 3, 1, 9, 0)
+        # Two activities share a start time, so the id breaks the tie
+        activities = [MockActivity(id=i, start_date=start - timedelta(days=i // 2),
+                                   start_date_local=start - timedelta(days=i // 2)) for i in range(7)]
+        store.upsert_activities(activities)
+
+        seen, position = [], None
+        while True:
+            page = store.page_activities(3, cursor=position)
+            if not page:
+                break
+            seen += [a.id for a in page]
+            position, _ = decode_cursor(encode_cursor(page[-1]))
+        assert seen == [1, 0, 3, 2, 5, 4, 6]
+
+    def test_date_bounds(self, store):
+        store.upsert_activities([MockActivity(id=i, start_date=datetime(2026, 3, i + 1, 9),
+                                              start_date_local=datetime(2026, 3, i + 1, 9)) for i in range(5)])
+        page = store.page_activities(10, before="2026-03-04", after="2026-03-02")
+        assert [a.id for a in page] == [2, 1]
+        assert store.oldest_start_local() == "2026-03-01T09:00:00"
+
+    def test_cursor_keeps_after_bound(self):
+        cursor = encode_cursor(make_activity(5, 1), after="2026-01-01")
+        assert decode_cursor(cursor)[1] == "2026-01-01"
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestPeriodRollups:
+    @staticmethod
+    def activity(activity_id, day, sport_type="Ride", **fields):
+        start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+        return MockActivity(id=activity_id, start_date=start, start_date_local=start, sport_type=sport_type, **fields)
+
+    @staticmethod
+    def rollups(store):
+        with store._connect() as conn:
+            return sorted(tuple(row) for row in conn.execute('SELECT * FROM period_rollups'))
+
+    def assert_matches_rebuild(self, store):
+        incremental = self.rollups(store)
+        with store._connect() as conn:
+            store._rebuild_rollups(conn)
+        assert incremental == self.rollups(store)
+
+    def test_iso_weeks_months_and_years(self, store):
+        # Sunday 2026-03-01 belongs to the ISO week starting Monday 2026-02-23
+        store.upsert_activities([
+            self.activity(1, date(2026, 2, 28)),
+            self.activity(2, date(2026, 3, 1), distance=10000.0),
+            self.activity(3, date(2026, 3, 2), sport_type="Run", suffer_score=20),
+        ])
+
+        weeks = store.period_stats("week")
+        assert [(r["period"], r["sport_type"], r["count"]) for r in weeks] == [
+            (date(2026, 2, 23), "Ride", 2), (date(2026, 3, 2), "Run", 1)]
+        assert weeks[0]["distance"] == 40000.0 and weeks[0]["moving_time"] == 7200
+
+        months = store.period_stats("month", sport_type="Ride")
+        assert [(r["period"], r["count"]) for r in months] == [(date(2026, 2, 1), 1), (date(2026, 3, 1), 1)]
+        (year_ride, year_run) = store.period_stats("year", since=date(2026, 6, 1))
+        assert (year_ride["count"], year_run["load"]) == (2, 20)
+        assert store.period_stats("day", since=date(2026, 3, 2)) == [
+            {"period": date(2026, 3, 2), "sport_type": "Run", "count": 1, "distance": 30000.0,
+             "moving_time": 3600, "elevation": 0, "load": 20}]
+
+    def test_maintained_incrementally(self, store):
+        store.upsert_activities([self.activity(i, date(2026, 1, 1) + timedelta(days=3 * i)) for i in range(20)])
+        self.assert_matches_rebuild(store)
+
+        store.upsert_activities([self.activity(5, date(2026, 5, 1), distance=1000.0)])  # moved and edited
+        store.update_activity_fields(6, sport_type="Run")
+        store.delete_activity(7)
+        store.save_training_stress(8, {"method": "power", "tss": 120.0, "normalized_power": 250.0,
+                                       "intensity_factor": 0.9, "trimp": None})
+        self.assert_matches_rebuild(store)
+        assert sum(r["count"] for r in store.period_stats("month")) == 19
+        assert {r["sport_type"] for r in store.period_stats("week")} == {"Ride", "Run"}
+
+    def test_built_for_existing_database(self, tmp_path):
+        path = str(tmp_path / "activities.db")
+        store = ActivityStore(path)
+        store.upsert_activities([self.activity(1, date(2026, 1, 5))])
+        with store._connect() as conn:
+            conn.execute('DELETE FROM period_rollups')
+            conn.execute("DELETE FROM sync_state WHERE key = 'rollup_version'")
+
+        assert [r["count"] for r in ActivityStore(path).period_stats("week")] == [1]
+
+    def test_period_stats_tool(self, store, monkeypatch):
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        today = datetime.now().date()
+        store.upsert_activities([self.activity(1, today), self.activity(2, today, sport_type="Run"),
+                                 self.activity(3, today - timedelta(days=400))])
+
+        text = asyncio.run(server.call_tool("get_period_stats", {"granularity": "month", "periods": 2}))[0].text
+        assert "🚴 Ride: 1x | 30.0 km | 1.0 hrs" in text and "🏃 Run: 1x" in text
+        assert "Total: 2 activities" in text and "backfill_history" not in text
+
+        text = asyncio.run(server.call_tool("get_period_stats", {"granularity": "year", "periods": 3}))[0].text
+        assert "Total: 3 activities" in text and "run backfill_history" in text
+
+        text = asyncio.run(server.call_tool("get_period_stats", {"granularity": "decade"}))[0].text
+        assert text.startswith("Invalid granularity")
+
+
+class TestSync:
+    def test_first_sync_fetches_initial_batch(self, store):
+        client = FakeClient([make_activity(1, 2), make_activity(2, 1)])
+        assert store.sync(client) == 2
+        assert client.calls == [{"after": None, "limit": INITIAL_SYNC_LIMIT}]
+        assert store.last_sync_at() is not None
+
+    def test_second_sync_only_requests_delta(self, store):
+        client = FakeClient([make_activity(1, 2)])
+        store.sync(client)
+        watermark = store.get_watermark()
+
+        client.activities.append(make_activity(2, 0))
+        store.sync(client)
+
+        after = client.calls[-1]["after"]
+        assert after is not None
+        assert after.timestamp() == watermark - 1
+        assert store.count() == 2
+        assert store.get_watermark() > watermark
+
+    def test_webhook_rows_do_not_move_the_watermark(self, store):
+        client = FakeClient([make_activity(1, 5)])
+        store.sync(client)
+        watermark = store.get_watermark()
+
+        # A webhook stores B, then A shows up with an earlier start date
+        store.upsert_activities([make_activity(3, 1)])
+        assert store.get_watermark() == watermark
+        client.activities.append(make_activity(2, 2))
+        store.sync(client)
+
+        assert client.calls[-1]["after"].timestamp() == watermark - 1
+        assert 2 in {a.id for a in store.list_activities()}
+        assert store.count() == 3
+
+    def test_sync_projects_models_as_they_arrive(self, store):
+        alive = []
+
+        class StreamingClient:
+            def get_activities(self, before=None, after=None, limit=None):
+                for i in range(5):
+                    # Only the model handed out last may still be referenced
+                    assert all(ref() is None for ref in alive[:-1])
+                    activity = make_activity(i, i)
+                    alive.append(weakref.ref(activity))
+                    yield activity
+
+        assert store.sync(StreamingClient()) == 5
+        assert all(ref() is None for ref in alive)
+
+
+class TestRecentActivitiesTool:
+    """get_recent_activities pages through the local index and fetches older pages on demand."""
+
+    @pytest.fixture
+    def strava(self, monkeypatch, store):
+        start = datetime(2026, 3, 31, 8, tzinfo=timezone.utc)
+        history = [{"id": i, "name": f"Ride {i}", "sport_type": "Ride",
+                    "start_date": (start - timedelta(days=i)).isoformat(),
+                    "start_date_local": (start - timedelta(days=i)).replace(tzinfo=None).isoformat(),
+                    "distance": 30000.0, "moving_time": 3600} for i in range(25)]
+        calls = []
+
+        def fetch_page(page, before, per_page):
+            calls.append(before)
+            older = [a for a in history if datetime.fromisoformat(a["start_date"]).timestamp() < before]
+            return older[(page - 1) * per_page:page * per_page]
+
+        store.upsert_activities(history[:5])
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        monkeypatch.setattr(server, "fetch_activity_page", fetch_page)
+        monkeypatch.setattr(server, "HISTORY_FETCH_SIZE", 10)
+        return calls
+
+    def test_pages_through_whole_history(self, strava):
+        ids, cursor = [], None
+        while True:
+            activities, cursor = server.activities_page(4, cursor=cursor)
+            ids += [a.id for a in activities]
+            if cursor is None:
+                break
+        assert ids == list(range(25))
+        # 5 stored, then 10 + 10 + a short page that marks the start of history
+        assert len(strava) == 3
+
+    def test_first_page_from_local_index(self, strava):
+        text = asyncio.run(server.call_tool("get_recent_activities", {"limit": 3}))[0].text
+        assert "Ride 0" in text and "Ride 2" in text and "Ride 3" not in text
+        assert 'call again with cursor "' in text
+        assert strava == []
+
+    def test_after_bound_stops_without_fetching(self, strava):
+        activities, cursor = server.activities_page(10, after="2026-03-28")
+        assert [a.id for a in activities] == [0, 1, 2, 3]
+        assert cursor is None and strava == []
+
+    def test_before_older_than_cached_range_keeps_loading(self, strava):
+        text = asyncio.run(server.call_tool("get_recent_activities", {"before": "2026-03-09"}))[0].text
+        assert "Older history is still loading" in text and "No activities in this range" not in text
+
+        ids, cursor = [], text.split('cursor "')[1].split('"')[0]
+        while cursor:
+            activities, cursor = server.activities_page(10, cursor=cursor)
+            ids += [a.id for a in activities]
+        assert ids == [23, 24]
+        assert len(strava) == 3
+
+    def test_upstream_errors_are_not_reported_as_bad_dates(self, strava, monkeypatch):
+        def failing_sync(force=False):
+            raise ValueError("validation failed")
+
+        monkeypatch.setattr(server, "sync_activities", failing_sync)
+        text = asyncio.run(server.call_tool("get_recent_activities", {"before": "2026-03-09"}))[0].text
+        assert text == "Error executing get_recent_activities: validation failed"
+
+    def test_invalid_arguments(self, strava):
+        text = asyncio.run(server.call_tool("get_recent_activities", {"cursor": "garbage"}))[0].text
+        assert text.startswith("Invalid cursor")
+        text = asyncio.run(server.call_tool("get_recent_activities", {"before": "31-03-2026"}))[0].text
+        assert text.startswith("Invalid date")
@@ -0,0 +1,112 @@
+"""Tests for multi-athlete mode in athletes.py and its use by the server."""
+
+import sys
+import os
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from athletes import AthletePool, UnknownAthlete, create_athlete, current_athlete
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def root(tmp_path):
+    for name in ("alice", "bob"):
+        env_path = create_athlete(str(tmp_path), name)
+        with open(env_path, "w") as f:
+            f.write(f"STRAVA_ACCESS_TOKEN={name}-access\nSTRAVA_REFRESH_TOKEN={name}-refresh\n")
+    return str(tmp_path)
+
+
+class TestAthletePool:
+    def test_unknown_and_invalid_names(self, root):
+        pool = AthletePool(root, client_factory=lambda athlete: object())
+        assert pool.names() == ["alice", "bob"]
+        with pytest.raises(UnknownAthlete, match="known: alice, bob"):
+            pool.acquire("carol")
+        with pytest.raises(UnknownAthlete, match="Invalid athlete name"):
+            pool.acquire("../alice")
+
+    def test_client_created_lazily_once(self, root):
+        created = []
+        pool = AthletePool(root, client_factory=lambda athlete: created.append(athlete.name) or athlete.name)
+        with pool.use("alice") as athlete:
+            assert current_athlete() is athlete
+            assert created == []
+            assert athlete.client() == athlete.client() == "alice"
+        assert created == ["alice"]
+        assert current_athlete() is None
+
+    def test_idle_athletes_evicted(self, root):
+        clock = FakeClock()
+        pool = AthletePool(root, client_factory=lambda athlete: object(), idle_timeout=60, clock=clock)
+        alice = pool.acquire("alice")
+        pool.release(pool.acquire("bob"))
+
+        clock.now = 100
+        assert pool.evict_idle() == ["bob"]  # alice is still in a call
+        pool.release(alice)
+        assert pool.evict_idle() == []
+
+        # Background work does not keep an athlete open
+        clock.now = 150
+        pool.release(pool.acquire("alice", touch=False), touch=False)
+        clock.now = 170
+        assert pool.evict_idle() == ["alice"]
+        assert pool.acquire("alice") is not alice
+
+
+class TestServerAthletes:
+    @pytest.fixture
+    def pool(self, root, monkeypatch):
+        pool = AthletePool(root, client_factory=lambda athlete: server.get_authenticated_client(athlete))
+        monkeypatch.setattr(server, "athletes", pool)
+        monkeypatch.setenv("STRAVA_CLIENT_ID", "123")
+        monkeypatch.setenv("STRAVA_CLIENT_SECRET", "secret")
+        return pool
+
+    def test_each_athlete_has_its_own_cache(self, pool):
+        start = datetime.now() - timedelta(days=1)
+        for name, activity_id in (("alice", 1), ("bob", 2)):
+            with pool.use(name) as athlete:
+                athlete.store.upsert_activities([{
+                    "id": activity_id, "name": f"{name} ride", "sport_type": "Ride",
+                    "start_date": start.isoformat() + "Z", "start_date_local": start.isoformat() + "Z",
+                    "distance": 20000.0, "moving_time": 3600,
+                }])
+                athlete.store.mark_history_complete()
+                with athlete.store._connect() as conn:
+                    athlete.store._set_state(conn, "last_sync_at", time.time())
+
+        text = asyncio.run(server.call_tool("get_recent_activities", {"athlete": "bob"}))[0].text
+        assert "bob ride" in text and "alice ride" not in text
+        text = asyncio.run(server.call_tool("get_weekly_stats", {"athlete": "carol"}))[0].text
+        assert text.startswith("Unknown athlete 'carol'")
+
+    def test_clients_share_connection_pool_and_budget(self, pool):
+        sessions = []
+        for name in ("alice", "bob"):
+            with pool.use(name):
+                sessions.append(server.get_client().protocol.rsession)
+        assert sessions[0] is not sessions[1]
+        assert all(s.get_adapter("https://www.strava.com") is server.http_adapter for s in sessions)
+        assert all(s.scheduler is server.scheduler for s in sessions)
+        assert sessions[1].tokens.access_token() == "bob-access"
+
+    def test_athlete_without_tokens(self, pool, root):
+        create_athlete(root, "carol")
+        text = asyncio.run(server.call_tool("get_recent_activities", {"athlete": "carol"}))[0].text
+        assert "python strava_auth.py --athlete carol" in text
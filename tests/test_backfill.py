@@ -0,0 +1,154 @@
+"""Tests for the resumable history backfill in backfill.py."""
+
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from activity_store import ActivityStore
+from backfill import Backfill
+from rate_limit import BACKGROUND, current_lane
+
+PER_PAGE = 5
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def api_activity(activity_id, days_ago):
+    """Raw /athlete/activities entry as returned by the Strava API"""
+    start = NOW - timedelta(days=days_ago)
+    return {
+        "id": activity_id,
+        "name": f"Ride {activity_id}",
+        "sport_type": "Ride",
+        "start_date": start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "start_date_local": start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "distance": 30000.0,
+        "moving_time": 3600,
+        "elapsed_time": 3700,
+        "suffer_score": 40,
+    }
+
+
+class FakeHistory:
+    """Serves pages of activities older than `before`, newest first, like Strava"""
+
+    def __init__(self, count, fail_on_page=None, delay=0.0):
+        self.activities = [api_activity(i, i) for i in range(1, count + 1)]
+        self.fail_on_page = fail_on_page
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, page, before, per_page):
+        with self._lock:
+            self.calls.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if page == self.fail_on_page:
+                raise RuntimeError("connection reset")
+            older = [a for a in self.activities
+                     if datetime.fromisoformat(a["start_date"].replace('Z', '+00:00')).timestamp() < before]
+            return older[(page - 1) * per_page:page * per_page]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ActivityStore(str(tmp_path / "activities.db"))
+    store.start_backfill(NOW.timestamp())
+    return store
+
+
+class TestBackfill:
+    def test_fetches_full_history(self, store):
+        history = FakeHistory(23)
+        status = Backfill(store, history, workers=3, per_page=PER_PAGE).run()
+
+        assert status["state"] == "complete"
+        assert store.count() == 23
+        assert store.backfill_state()["last_page"] == 5
+        assert status["activities_this_run"] == 23
+
+    def test_pages_fetched_concurrently(self, store):
+        history = FakeHistory(40, delay=0.05)
+        Backfill(store, history, workers=4, per_page=PER_PAGE).run()
+
+        assert store.count() == 40
+        assert history.max_in_flight > 1
+
+    def test_resumes_after_failure(self, store):
+        history = FakeHistory(23, fail_on_page=3)
+        status = Backfill(store, history, workers=1, per_page=PER_PAGE).run()
+
+        assert status["state"] == "failed"
+        assert "connection reset" in status["error"]
+        assert store.backfill_state()["pages_done"] == {1, 2}
+        assert store.count() == 10
+
+        history.fail_on_page = None
+        history.calls.clear()
+        status = Backfill(store, history, workers=1, per_page=PER_PAGE).run()
+
+        assert status["state"] == "complete"
+        assert store.count() == 23
+        # Stored pages are not fetched again
+        assert 1 not in history.calls and 2 not in history.calls
+
+    def test_complete_backfill_does_nothing(self, store):
+        history = FakeHistory(3)
+        Backfill(store, history, per_page=PER_PAGE).run()
+        history.calls.clear()
+
+        status = Backfill(store, history, per_page=PER_PAGE).run()
+        assert status["state"] == "complete"
+        assert history.calls == []
+
+    def test_cursor_fixed_across_runs(self, store):
+        store.start_backfill(time.time())
+        assert store.backfill_state()["before"] == int(NOW.timestamp())
+
+    def test_status_reports_throughput_and_eta(self, store):
+        history = FakeHistory(20, delay=0.01)
+        backfill = Backfill(store, history, estimate_total=lambda: 20, workers=2, per_page=PER_PAGE)
+        status = backfill.run()
+
+        assert status["total_estimate"] == 20
+        assert status["activities_per_sec"] > 0
+        # Only a running backfill has an ETA
+        assert status["eta_seconds"] is None
+
+    def test_estimate_uses_the_backfill_lane(self, store):
+        lanes = []
+        backfill = Backfill(store, FakeHistory(3), estimate_total=lambda: lanes.append(current_lane()) or 3,
+                            per_page=PER_PAGE)
+        thread = threading.Thread(target=backfill.run)  # a fresh context, like start()
+        thread.start()
+        thread.join(5)
+        assert lanes == [BACKGROUND]
+
+    def test_stop_keeps_checkpoint(self, store):
+        history = FakeHistory(50, delay=0.02)
+        backfill = Backfill(store, history, workers=1, per_page=PER_PAGE)
+        backfill.start()
+        time.sleep(0.05)
+        backfill.stop()
+        for _ in range(100):
+            if backfill.status()["state"] != "running":
+                break
+            time.sleep(0.02)
+
+        status = backfill.status()
+        assert status["state"] == "stopped"
+        assert 0 < status["pages_done"] < 10
+        assert store.count() == status["pages_done"] * PER_PAGE
@@ -0,0 +1,56 @@
+"""Tests for the benchmark helpers in benchmarks/training_load.py."""
+
+import sys
+import os
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+import server
+from training_load import benchmark_cases, compare, synthetic_history
+
+END = datetime(2026, 6, 1, 7, tzinfo=timezone.utc)
+
+
+class TestSyntheticHistory:
+    def test_covers_requested_years(self):
+        activities = synthetic_history(5, end=END)
+        days = {a.start_date.date() for a in activities}
+        assert (END.date() - min(days)).days == 5 * 365 - 1
+        # Daily training: rest days are the exception
+        assert len(days) > 0.8 * 5 * 365
+
+    def test_deterministic(self):
+        assert synthetic_history(1, end=END) == synthetic_history(1, end=END)
+        assert synthetic_history(1, seed=1, end=END) != synthetic_history(1, seed=2, end=END)
+
+    def test_newest_first_with_unique_ids(self):
+        activities = synthetic_history(1, end=END)
+        assert activities[0].start_date >= activities[-1].start_date
+        assert len({a.id for a in activities}) == len(activities)
+
+    def test_produces_training_load(self):
+        loads = server.calculate_training_loads(synthetic_history(1))
+        assert loads["ctl"] > 0 and loads["atl"] > 0
+
+
+class TestCompare:
+    def test_slower_case_fails(self):
+        baseline = {"1y/a": 0.010, "1y/b": 0.010}
+        results = {"1y/a": 0.011, "1y/b": 0.020}
+        assert [name for name, _, _ in compare(results, baseline, tolerance=0.3)] == ["1y/b"]
+
+    def test_calibration_scale_applied(self):
+        # Baseline recorded on a machine twice as fast
+        assert compare({"1y/a": 0.020}, {"1y/a": 0.010}, tolerance=0.3, scale=2.0) == []
+
+    def test_new_cases_skipped(self):
+        assert compare({"1y/new": 1.0}, {}) == []
+
+
+def test_cases_run_against_local_store(tmp_path):
+    cases = benchmark_cases(1, str(tmp_path))
+    assert "1y/render_training_load_analysis" in cases
+    assert "TRAINING LOAD ANALYSIS" in cases["1y/render_training_load_analysis"]()[0].text
+    assert cases["1y/calculate_ramp_rate"]() is not None
@@ -0,0 +1,193 @@
+"""Tests for recording and replaying Strava HTTP traffic in cassette.py."""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+import server
+from cassette import (
+    CassetteMiss,
+    RecordingAdapter,
+    ReplayAdapter,
+    load_cassette,
+    mount_cassette,
+    request_key,
+)
+from replay import replay_session
+
+RESPONSE_DELAY = 0.05
+
+
+class FakeStravaHandler(BaseHTTPRequestHandler):
+    """Activities by id, an OAuth token endpoint and rate-limit headers."""
+
+    def do_GET(self):
+        time.sleep(RESPONSE_DELAY)
+        self.server.hits += 1
+        path = urlparse(self.path).path
+        if path.startswith("/api/v3/activities/"):
+            activity_id = int(path.rstrip("/").split("/")[-1])
+            self._respond(200, {
+                "id": activity_id,
+                "name": f"Ride {activity_id} (hit {self.server.hits})",
+                "start_date": "2026-01-02T08:00:00Z",
+                "start_date_local": "2026-01-02T09:00:00Z",
+                "distance": 42000.0,
+                "moving_time": 5400,
+                "elapsed_time": 5600,
+                "average_speed": 7.8,
+            })
+        else:
+            self._respond(404, {"message": "Record Not Found"})
+
+    def do_POST(self):
+        self._respond(200, {"access_token": "secret-a", "refresh_token": "secret-r", "expires_at": 1})
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Limit", "200,2000")
+        self.send_header("X-RateLimit-Usage", "3,40")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalRecordingAdapter(RecordingAdapter):
+    """Records traffic for https://www.strava.com while sending it to the fake server."""
+
+    def __init__(self, path, base_url):
+        super().__init__(path)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace("https://www.strava.com", self.base_url)
+        return super().send(request, **kwargs)
+
+
+@pytest.fixture
+def fake_strava():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeStravaHandler)
+    httpd.hits = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def record(path, base_url, paths, method="GET"):
+    session = requests.Session()
+    mount_cassette(session, path, mode="record")
+    return [session.request(method, f"{base_url}{p}") for p in paths]
+
+
+class TestCassette:
+    def test_request_key_ignores_query_order_and_tokens(self):
+        assert (request_key("get", "https://x/api/v3/athlete/activities?per_page=5&page=1&access_token=t")
+                == "GET /api/v3/athlete/activities?page=1&per_page=5")
+
+    @pytest.mark.parametrize("name", ["strava.cassette.jsonl", "strava.cassette.jsonl.gz"])
+    def test_record_then_replay(self, tmp_path, fake_strava, name):
+        path = str(tmp_path / name)
+        recorded = record(path, fake_strava, ["/api/v3/activities/1", "/api/v3/missing"])
+
+        session = requests.Session()
+        mount_cassette(session, path)
+        replayed = [session.get(f"https://www.strava.com{p}") for p in ("/api/v3/activities/1", "/api/v3/missing")]
+
+        assert [r.status_code for r in replayed] == [200, 404]
+        assert replayed[0].json() == recorded[0].json()
+        assert replayed[0].headers["X-RateLimit-Usage"] == "3,40"
+
+    def test_tokens_redacted(self, tmp_path, fake_strava):
+        path = str(tmp_path / "strava.cassette.jsonl")
+        record(path, fake_strava, ["/oauth/token"], method="POST")
+
+        with open(path) as f:
+            text = f.read()
+        assert "secret" not in text
+        assert json.loads(load_cassette(path)[0]["body"])["expires_at"] == 1
+
+    def test_repeated_requests_replayed_in_order(self, tmp_path, fake_strava):
+        path = str(tmp_path / "strava.cassette.jsonl")
+        record(path, fake_strava, ["/api/v3/activities/1"] * 2)
+        adapter = ReplayAdapter.from_file(path)
+        session = requests.Session()
+        session.mount("https://", adapter)
+
+        names = [session.get("https://www.strava.com/api/v3/activities/1").json()["name"] for _ in range(3)]
+        assert names == ["Ride 1 (hit 1)", "Ride 1 (hit 2)", "Ride 1 (hit 2)"]
+
+    def test_unrecorded_request_raises(self, tmp_path, fake_strava):
+        path = str(tmp_path / "strava.cassette.jsonl")
+        record(path, fake_strava, ["/api/v3/activities/1"])
+        session = requests.Session()
+        mount_cassette(session, path)
+
+        with pytest.raises(CassetteMiss):
+            session.get("https://www.strava.com/api/v3/activities/2")
+
+    def test_replay_timing(self, tmp_path, fake_strava):
+        path = str(tmp_path / "strava.cassette.jsonl")
+        record(path, fake_strava, ["/api/v3/activities/1"])
+        url = "https://www.strava.com/api/v3/activities/1"
+
+        for latency, minimum, maximum in ((None, 0, 0.03), (0.1, 0.1, 0.2), ("recorded", RESPONSE_DELAY, 0.2)):
+            session = requests.Session()
+            mount_cassette(session, path, latency=latency)
+            start = time.perf_counter()
+            response = session.get(url)
+            elapsed = time.perf_counter() - start
+            assert minimum <= elapsed < maximum
+            assert response.elapsed.total_seconds() >= minimum
+
+
+def record_tool_call(path, base_url, monkeypatch, name, arguments):
+    """Run one tool call against the fake Strava, recording its traffic"""
+    from stravalib.client import Client
+    session = requests.Session()
+    session.mount("https://", LocalRecordingAdapter(path, base_url))
+    monkeypatch.setattr(server, "_client", Client(access_token="test-token", requests_session=session))
+    return asyncio.run(server.call_tool(name, arguments))[0].text
+
+
+def test_server_replays_recorded_session(tmp_path, fake_strava, monkeypatch):
+    path = str(tmp_path / "strava.cassette.jsonl")
+    recorded = record_tool_call(path, fake_strava, monkeypatch, "get_activity_details", {"activity_id": "7"})
+
+    # Replay it without credentials or network
+    for name in ("STRAVA_CLIENT_ID", "STRAVA_CLIENT_SECRET", "STRAVA_ACCESS_TOKEN", "STRAVA_REFRESH_TOKEN"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(server, "CASSETTE_PATH", path)
+    monkeypatch.setattr(server, "CASSETTE_MODE", "replay")
+    monkeypatch.setattr(server, "_client", None)
+    replayed = asyncio.run(server.call_tool("get_activity_details", {"activity_id": "7"}))[0].text
+
+    assert "Ride 7" in recorded
+    assert replayed == recorded
+
+
+def test_replay_benchmark_reports_missing_requests(tmp_path, fake_strava, monkeypatch):
+    path = str(tmp_path / "strava.cassette.jsonl")
+    record_tool_call(path, fake_strava, monkeypatch, "get_activity_details", {"activity_id": "1"})
+
+    results = replay_session(path, calls=[("get_activity_details", {"activity_id": "1"}),
+                                          ("get_activity_details", {"activity_id": "2"})])
+    assert [ok for _, _, ok in results] == [True, False]
+    assert server.CASSETTE_PATH is None
@@ -0,0 +1,228 @@
+"""Tests that concurrent tool calls overlap instead of blocking the event loop."""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from stravalib.client import Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from metrics import Metrics
+from rate_limit import RateLimitExceeded
+from singleflight import SingleFlight
+
+RESPONSE_DELAY = 0.5
+
+
+class FakeStravaHandler(BaseHTTPRequestHandler):
+    """Serves GET /api/v3/activities/<id> after a fixed delay (404 for ID 404)."""
+
+    def do_GET(self):
+        state = self.server.state
+        with state["lock"]:
+            state["requests"] += 1
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        time.sleep(RESPONSE_DELAY)
+        with state["lock"]:
+            state["in_flight"] -= 1
+
+        activity_id = int(urlparse(self.path).path.rstrip("/").split("/")[-1])
+        if activity_id == 404:
+            body = json.dumps({"message": "Record Not Found", "errors": []}).encode()
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = json.dumps({
+            "id": activity_id,
+            "name": f"Ride {activity_id}",
+            "start_date": "2026-01-02T08:00:00Z",
+            "start_date_local": "2026-01-02T09:00:00Z",
+            "distance": 42000.0,
+            "moving_time": 5400,
+            "elapsed_time": 5600,
+            "average_speed": 7.8,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalStravaAdapter(HTTPAdapter):
+    """Redirects https://www.strava.com requests to the local fake server."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace("https://www.strava.com", self.base_url)
+        return super().send(request, **kwargs)
+
+
+@pytest.fixture
+def fake_strava(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeStravaHandler)
+    httpd.state = {"lock": threading.Lock(), "requests": 0, "in_flight": 0, "max_in_flight": 0}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    session = requests.Session()
+    session.mount("https://www.strava.com", LocalStravaAdapter(f"http://127.0.0.1:{httpd.server_port}"))
+    client = Client(access_token="test-token", requests_session=session)
+    monkeypatch.setattr(server, "_client", client)
+
+    yield httpd.state
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_concurrent_tool_calls_overlap(fake_strava):
+    async def run_both():
+        return await asyncio.gather(
+            server.call_tool("get_activity_details", {"activity_id": "1"}),
+            server.call_tool("get_activity_details", {"activity_id": "2"}),
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run_both())
+    elapsed = time.perf_counter() - start
+
+    assert "Ride 1" in results[0][0].text
+    assert "Ride 2" in results[1][0].text
+    assert fake_strava["max_in_flight"] == 2
+    assert elapsed < 2 * RESPONSE_DELAY
+
+
+def test_event_loop_stays_responsive(fake_strava):
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await server.call_tool("get_activity_details", {"activity_id": "3"})
+        task.cancel()
+        return ticks
+
+    # A blocked loop would not tick at all during the upstream delay
+    assert asyncio.run(run()) >= 5
+
+
+def test_identical_requests_share_one_fetch(fake_strava, monkeypatch):
+    monkeypatch.setattr(server, "metrics", Metrics())
+    monkeypatch.setattr(server, "flights", SingleFlight(server.COALESCE_WINDOW, server.metrics))
+
+    async def run_both():
+        return await asyncio.gather(
+            server.call_tool("get_activity_details", {"activity_id": "5"}),
+            server.call_tool("get_activity_details", {"activity_id": "5"}),
+        )
+
+    results = asyncio.run(run_both())
+    assert results[0][0].text == results[1][0].text
+    asyncio.run(server.call_tool("get_activity_details", {"activity_id": "5"}))
+    assert fake_strava["requests"] == 1
+
+    text = asyncio.run(server.call_tool("get_server_metrics", {}))[0].text
+    assert "activity: 1 sent | 1 joined in flight | 0 reused" in text
+    assert "activity_details: 1 hits / 2 misses" in text  # the third call is answered from the cache
+
+
+def test_batch_details_fetched_concurrently_and_cached(fake_strava):
+    arguments = {"activity_ids": ["11", "12", 12, "13", "404"]}
+
+    start = time.perf_counter()
+    text = asyncio.run(server.call_tool("get_activity_details_batch", arguments))[0].text
+    elapsed = time.perf_counter() - start
+
+    assert text.startswith("📊 ACTIVITY DETAILS (3 of 4)")
+    assert all(f"Ride {i} (ID: {i})" in text for i in (11, 12, 13))
+    assert "📏 42.0 km | ⏱️ 1:30:00 | ⚡ 28.1 km/h" in text
+    assert "ID 404: " in text
+    assert fake_strava["requests"] == 4 and fake_strava["max_in_flight"] == 4
+    assert elapsed < 2 * RESPONSE_DELAY
+
+    # Only the failed ID is requested again
+    data = json.loads(asyncio.run(server.call_tool(
+        "get_activity_details_batch", {**arguments, "format": "json"}))[0].text)
+    assert fake_strava["requests"] == 5
+    assert [row[0] for row in data["rows"]] == [11, 12, 13, 404]
+    assert data["rows"][1][1] == "Ride 12" and data["rows"][3][-1]
+    assert (data["found"], data["failed"]) == (3, 1)
+
+
+def test_details_served_from_cache_when_budget_is_exhausted(fake_strava, monkeypatch):
+    first = asyncio.run(server.call_tool("get_activity_details", {"activity_id": "7"}))[0].text
+    assert "⏱️ Time: 5400" in first
+
+    def exhausted(activity_id):
+        raise RateLimitExceeded("Strava API budget exhausted")
+
+    monkeypatch.setattr(server, "fetch_activity", exhausted)
+    monkeypatch.setattr(server, "DETAIL_CACHE_TTL", -1)  # even an outdated copy is served
+    assert asyncio.run(server.call_tool("get_activity_details", {"activity_id": "7"}))[0].text == first
+    text = asyncio.run(server.call_tool("get_activity_details", {"activity_id": "8"}))[0].text
+    assert text == "Error executing get_activity_details: Strava API budget exhausted"
+    assert fake_strava["requests"] == 1
+
+
+def test_background_sync_repeats_and_cancels_cleanly(monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, "refresh_cached_data", lambda: calls.append(time.monotonic()))
+
+    async def run():
+        task = asyncio.create_task(server.background_sync(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return task.cancelled()
+        return False
+
+    assert asyncio.run(run())
+    assert len(calls) >= 2
+
+
+def test_background_sync_survives_failures(monkeypatch):
+    calls = []
+
+    def failing_refresh():
+        calls.append(1)
+        raise RuntimeError("Strava unavailable")
+
+    monkeypatch.setattr(server, "refresh_cached_data", failing_refresh)
+
+    async def run():
+        task = asyncio.create_task(server.background_sync(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert len(calls) >= 2
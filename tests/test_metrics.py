@@ -0,0 +1,126 @@
+"""Tests for the metrics in metrics.py and the get_server_metrics tool."""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from metrics import Histogram, Metrics, endpoint_label
+from rate_limit import RateLimitScheduler, ScheduledSession
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Answers every GET with {} after 50 ms, 404 for /missing."""
+
+    def do_GET(self):
+        time.sleep(0.05)
+        data = json.dumps({}).encode()
+        self.send_response(404 if self.path.startswith("/missing") else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_url():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHistogram:
+    def test_quantiles_and_cumulative_buckets(self):
+        h = Histogram(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.05, 0.5, 3.0):
+            h.observe(seconds)
+        assert h.count == 4 and h.max == 3.0
+        assert h.quantile(0.5) == 0.1
+        assert h.quantile(0.99) == 3.0
+        assert h.cumulative() == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+
+
+def test_endpoint_label_groups_ids():
+    assert endpoint_label("https://www.strava.com/api/v3/activities/123/streams?keys=time") == "/activities/{id}/streams"
+    assert endpoint_label("https://www.strava.com/api/v3/athlete/activities") == "/athlete/activities"
+    assert endpoint_label("https://www.strava.com/oauth/token") == "/oauth/token"
+
+
+class TestMetrics:
+    def test_upstream_time_attributed_to_tool_call(self, api_url):
+        metrics = Metrics()
+        session = ScheduledSession(RateLimitScheduler(), metrics)
+
+        async def call():
+            with metrics.track_tool("get_activity_details"):
+                await asyncio.to_thread(session.get, f"{api_url}/api/v3/activities/42")
+                await asyncio.to_thread(time.sleep, 0.02)
+
+        asyncio.run(call())
+        snapshot = metrics.snapshot()
+
+        tool = snapshot["tools"]["get_activity_details"]
+        assert tool["count"] == 1
+        assert tool["phases"]["upstream"] >= 0.05
+        assert tool["sum"] - tool["phases"]["upstream"] >= 0.02
+        assert snapshot["upstream"]["/activities/{id}"]["status"] == {"200": 1}
+
+    def test_requests_outside_tool_calls_still_counted(self, api_url):
+        metrics = Metrics()
+        session = ScheduledSession(RateLimitScheduler(), metrics)
+        session.get(f"{api_url}/missing/1")
+        assert metrics.snapshot()["upstream"]["/missing/{id}"]["status"] == {"404": 1}
+        assert metrics.snapshot()["tools"] == {}
+
+    def test_cache_counts(self):
+        metrics = Metrics()
+        metrics.count_cache("streams", hit=True)
+        metrics.count_cache("streams", hit=True)
+        metrics.count_cache("streams", hit=False)
+        assert metrics.snapshot()["cache"] == {"streams": {"hits": 2, "misses": 1}}
+
+    def test_prometheus_file(self, tmp_path):
+        metrics = Metrics()
+        with metrics.track_tool("get_weekly_stats"):
+            pass
+        metrics.count_tool_error("get_weekly_stats")
+        metrics.count_cache("activities", hit=False)
+        path = tmp_path / "strava.prom"
+
+        metrics.write_prometheus(str(path), RateLimitScheduler().status())
+        text = path.read_text()
+
+        assert '# TYPE strava_mcp_tool_latency_seconds histogram' in text
+        assert 'strava_mcp_tool_latency_seconds_bucket{tool="get_weekly_stats",le="+Inf"} 1' in text
+        assert 'strava_mcp_tool_errors_total{tool="get_weekly_stats"} 1' in text
+        assert 'strava_mcp_cache_requests_total{cache="activities",result="miss"} 1' in text
+        assert 'strava_mcp_rate_limit_limit{window="15min"} 100' in text
+        assert list(tmp_path.iterdir()) == [path]
+
+
+def test_server_metrics_tool(monkeypatch):
+    monkeypatch.setattr(server, "metrics", Metrics())
+    store = server.get_store()
+    with store._connect() as conn:
+        store._set_state(conn, "last_sync_at", time.time())
+
+    asyncio.run(server.call_tool("get_weekly_stats", {"weeks": 2}))
+    text = asyncio.run(server.call_tool("get_server_metrics", {}))[0].text
+
+    assert "SERVER METRICS" in text
+    assert "get_weekly_stats: 1 calls" in text
+    assert "activities: 1 hits / 0 misses (100% hit)" in text
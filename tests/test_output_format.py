@@ -0,0 +1,94 @@
+"""Tests for the compact and JSON tool output in output_format.py."""
+
+import sys
+import os
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from activity_store import ActivityStore
+from output_format import SCHEMAS, Schema, parse_format
+
+
+class TestSchema:
+    def test_json_has_every_field_and_plain_values(self):
+        schema = Schema("tool", fields=("when", "missing"), columns=("seconds", "watts", "count"))
+        data = json.loads(schema.json({"when": date(2026, 3, 1), "other": 1},
+                                      [(timedelta(minutes=5), np.float64(301.456), np.int64(3))]))
+        assert data == {"tool": "tool", "when": "2026-03-01", "missing": None,
+                        "columns": ["seconds", "watts", "count"], "rows": [[300, 301.46, 3]]}
+
+    def test_compact_lines(self):
+        schema = Schema("tool", fields=("note",), columns=("name", "km"))
+        text = schema.compact({"note": "a\nb"}, [("Ride | Home", 42.123), ("Run", None)])
+        assert text == "# tool\nnote=a b\nname|km\nRide / Home|42.12\nRun|\n"
+
+    def test_parse_format(self):
+        assert parse_format({}) == "text"
+        assert parse_format({"format": "json"}) == "json"
+        with pytest.raises(ValueError):
+            parse_format({"format": "xml"})
+
+
+@dataclass
+class StoredActivity:
+    id: int
+    start_date: datetime
+    start_date_local: datetime
+    name: str = "Ride"
+    sport_type: str = "Ride"
+    distance: float = 30000.0
+    moving_time: int = 3600
+    average_heartrate: float | None = 140.0
+    suffer_score: int | None = 50
+
+
+class TestServerFormats:
+    @pytest.fixture(autouse=True)
+    def store(self, tmp_path, monkeypatch):
+        store = ActivityStore(str(tmp_path / "activities.db"))
+        start = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        store.upsert_activities([StoredActivity(id=i, start_date=start - timedelta(days=i),
+                                                start_date_local=start - timedelta(days=i)) for i in range(3)])
+        store.mark_history_complete()
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        return store
+
+    @staticmethod
+    def call(name, arguments):
+        return asyncio.run(server.call_tool(name, arguments))[0].text
+
+    def test_default_output_unchanged(self):
+        assert self.call("get_recent_activities", {"limit": 1}) == self.call(
+            "get_recent_activities", {"limit": 1, "format": "text"})
+        assert self.call("get_recent_activities", {"limit": 1}).startswith("🚴 RECENT ACTIVITIES\n\n📅 ")
+
+    def test_recent_activities_json(self):
+        data = json.loads(self.call("get_recent_activities", {"limit": 2, "format": "json"}))
+        assert data["columns"] == list(SCHEMAS["get_recent_activities"].columns)
+        assert [row[0] for row in data["rows"]] == [0, 1]
+        assert data["rows"][0][4:] == [30.0, 3600, 140]
+        assert data["next_cursor"]
+
+    def test_weekly_stats_compact_is_smaller(self):
+        text = self.call("get_weekly_stats", {"weeks": 52})
+        compact = self.call("get_weekly_stats", {"weeks": 52, "format": "compact"})
+        assert compact.splitlines()[:3] == ["# get_weekly_stats", "weeks=52", "weeks_ago|activities|distance_km|hours"]
+        assert sum(int(line.split("|")[1]) for line in compact.splitlines()[3:]) == 3
+        assert len(compact) < len(text)
+
+    def test_unknown_format(self):
+        assert self.call("get_weekly_stats", {"format": "xml"}).startswith("Unknown format 'xml'")
+
+    def test_format_argument_advertised(self):
+        tools = {tool.name: tool for tool in asyncio.run(server.list_tools())}
+        assert "format" in tools["get_power_curve"].inputSchema["properties"]
+        assert "format" not in tools["get_server_metrics"].inputSchema["properties"]
@@ -0,0 +1,102 @@
+"""Tests for the mean-maximal power curve in power_curve.py."""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from activity_store import ActivityStore
+from power_curve import mean_max_power
+
+
+def brute_force_best(watts, duration):
+    return max(np.mean(watts[i:i + duration]) for i in range(len(watts) - duration + 1))
+
+
+class TestMeanMaxPower:
+    def test_matches_brute_force(self):
+        watts = np.random.default_rng(3).integers(0, 800, 1500).astype(float)
+        curve = mean_max_power(watts, (1, 5, 60, 300, 1200))
+        for duration, best in curve.items():
+            assert best == pytest.approx(brute_force_best(watts, duration), abs=0.05)
+
+    def test_durations_longer_than_ride_skipped(self):
+        curve = mean_max_power(np.full(600, 250.0))
+        assert set(curve) == {5, 60, 300}
+
+    def test_curve_is_non_increasing(self):
+        watts = np.random.default_rng(4).integers(0, 800, 4000).astype(float)
+        values = list(mean_max_power(watts).values())
+        assert values == sorted(values, reverse=True)
+
+
+def make_ride(activity_id, days_ago):
+    start = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return SimpleNamespace(
+        id=activity_id, name=f"Ride {activity_id}", sport_type="Ride", start_date=start,
+        start_date_local=start.replace(tzinfo=None), distance=40000.0, moving_time=3600,
+        average_heartrate=None, average_watts=200.0, suffer_score=50,
+    )
+
+
+class TestPowerCurveTool:
+    @pytest.fixture
+    def setup(self, tmp_path, monkeypatch):
+        store = ActivityStore(str(tmp_path / "activities.db"))
+        store.upsert_activities([make_ride(1, 10), make_ride(2, 100), make_ride(3, 500)])
+        # Ride 1 has the best sprint, ride 2 the best hour, ride 3 is out of range
+        powers = {1: np.r_[np.full(10, 1000.0), np.full(3590, 150.0)],
+                  2: np.full(3600, 280.0),
+                  3: np.full(3600, 400.0)}
+        loads = []
+
+        def fake_streams(activity_id, types=None):
+            loads.append(activity_id)
+            if activity_id not in powers:
+                raise requests.HTTPError("404 Not Found", response=SimpleNamespace(status_code=404))
+            return {"time": np.arange(3600), "watts": powers[activity_id]}
+
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        monkeypatch.setattr(server, "load_activity_streams", fake_streams)
+        return SimpleNamespace(store=store, loads=loads, powers=powers)
+
+    def test_merges_best_efforts_within_range(self, setup):
+        best, count = setup.store.best_power()
+        assert count == 0
+
+        server.update_power_curves(since=datetime.now().date() - timedelta(days=364))
+        best, count = setup.store.best_power(since=datetime.now().date() - timedelta(days=364))
+        assert count == 2
+        assert best[5]["watts"] == 1000
+        assert best[5]["activity_id"] == 1
+        assert best[3600]["watts"] == 280
+        assert best[3600]["activity_id"] == 2
+
+    def test_curves_cached_per_activity(self, setup):
+        first = asyncio.run(server.call_tool("get_power_curve", {"days": 365}))[0].text
+        second = asyncio.run(server.call_tool("get_power_curve", {"days": 365}))[0].text
+        assert sorted(setup.loads) == [1, 2]
+        assert first == second
+        assert "1000W" in first
+
+    def test_deleted_ride_does_not_block_the_others(self, setup):
+        setup.store.upsert_activities([make_ride(4, 1)])  # newest, gone on Strava
+        text = asyncio.run(server.call_tool("get_power_curve", {"days": 365}))[0].text
+        assert "1000W" in text and "Based on 2 rides" in text
+        assert setup.store.activities_needing_power_curve() == [3]
+
+        asyncio.run(server.call_tool("get_power_curve", {"days": 365}))
+        assert sorted(setup.loads) == [1, 2, 4]
+
+    def test_invalid_date(self, setup):
+        result = asyncio.run(server.call_tool("get_power_curve", {"start_date": "yesterday"}))
+        assert "Invalid date" in result[0].text
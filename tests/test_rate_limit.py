@@ -0,0 +1,109 @@
+"""Tests for the request scheduler in rate_limit.py."""
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from rate_limit import (
+    BACKGROUND,
+    INTERACTIVE,
+    RateLimitExceeded,
+    RateLimitScheduler,
+    request_lane,
+)
+
+
+class TestRateLimitScheduler:
+    def test_headers_update_quota(self):
+        scheduler = RateLimitScheduler()
+        scheduler.update_from_headers({
+            "X-RateLimit-Limit": "200,2000",
+            "X-RateLimit-Usage": "12,340",
+        })
+        status = scheduler.status()
+        assert (status["short_limit"], status["long_limit"]) == (200, 2000)
+        assert (status["short_usage"], status["long_usage"]) == (12, 340)
+        assert status["from_headers"]
+
+    def test_read_quota_preferred(self):
+        scheduler = RateLimitScheduler()
+        scheduler.update_from_headers({
+            "X-RateLimit-Limit": "200,2000",
+            "X-RateLimit-Usage": "12,340",
+            "X-ReadRateLimit-Limit": "100,1000",
+            "X-ReadRateLimit-Usage": "10,300",
+        })
+        assert scheduler.status()["short_limit"] == 100
+
+    def test_malformed_headers_ignored(self):
+        scheduler = RateLimitScheduler()
+        scheduler.update_from_headers({"X-RateLimit-Limit": "garbage"})
+        assert not scheduler.status()["from_headers"]
+
+    def test_acquire_counts_usage_per_lane(self):
+        scheduler = RateLimitScheduler()
+        scheduler.acquire()
+        with request_lane(BACKGROUND):
+            scheduler.acquire()
+        status = scheduler.status()
+        assert status["short_usage"] == 2
+        assert status["requests"] == {INTERACTIVE: 1, BACKGROUND: 1}
+
+    def test_exhausted_interactive_raises_instead_of_waiting(self):
+        scheduler = RateLimitScheduler(max_wait=0.1)
+        scheduler.mark_exhausted()
+        with pytest.raises(RateLimitExceeded):
+            scheduler.acquire(INTERACTIVE)
+        assert scheduler.status()["throttled"] == 1
+
+    def test_background_cannot_use_interactive_reserve(self):
+        scheduler = RateLimitScheduler(short_limit=100, background_reserve=0.2)
+        scheduler.update_from_headers({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "85,85"})
+        scheduler.acquire(INTERACTIVE)
+        with pytest.raises(RateLimitExceeded):
+            scheduler.acquire(BACKGROUND, max_wait=0)
+
+    def test_interactive_goes_before_waiting_background(self):
+        # 10 tokens/s refill, bucket starts empty
+        scheduler = RateLimitScheduler(short_limit=9000, long_limit=100000, burst=1)
+        scheduler.tokens = 0
+        order = []
+
+        def worker(lane):
+            scheduler.acquire(lane)
+            order.append(lane)
+
+        background = threading.Thread(target=worker, args=(BACKGROUND,))
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=worker, args=(INTERACTIVE,))
+        interactive.start()
+        background.join(5)
+        interactive.join(5)
+
+        assert order == [INTERACTIVE, BACKGROUND]
+
+    def test_shutdown_releases_waiting_background_request(self):
+        scheduler = RateLimitScheduler()
+        scheduler.mark_exhausted()
+        errors = []
+
+        def worker():
+            try:
+                scheduler.acquire(BACKGROUND)
+            except RateLimitExceeded as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.05)
+        scheduler.shutdown()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert len(errors) == 1
@@ -0,0 +1,80 @@
+"""Tests for coalescing identical upstream fetches in singleflight.py."""
+
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from metrics import Metrics
+from singleflight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_callers_share_one_fetch():
+    metrics = Metrics()
+    flights = SingleFlight(window=5, metrics=metrics)
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"id": 1}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flights.do, "activity", 1, fetch) for _ in range(4)]
+        while sum(metrics.flights.get("activity", {}).values()) < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert metrics.snapshot()["flights"] == {"activity": {"fetched": 1, "coalesced": 3, "hit": 0}}
+
+
+def test_results_reused_within_window():
+    clock = FakeClock()
+    metrics = Metrics()
+    flights = SingleFlight(window=5, metrics=metrics, clock=clock)
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        return len(calls)
+
+    assert flights.do("activity", 1, fetch, 1) == 1
+    clock.now = 4
+    assert flights.do("activity", 1, fetch, 1) == 1
+    assert flights.do("activity", 2, fetch, 2) == 2  # other key
+    clock.now = 5
+    assert flights.do("activity", 1, fetch, 1) == 3
+    flights.forget("activity", 1)
+    assert flights.do("activity", 1, fetch, 1) == 4
+    assert metrics.flights["activity"] == {"fetched": 4, "coalesced": 0, "hit": 1}
+    assert 'strava_mcp_shared_fetches_total{fetch="activity",result="hit"} 1' in metrics.prometheus_text()
+
+
+def test_failures_are_shared_but_not_kept():
+    flights = SingleFlight(window=5)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise ConnectionError("Strava is down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            flights.do("streams", 7, fetch)
+    assert len(calls) == 2
@@ -0,0 +1,26 @@
+"""Tests for cold start: heavy imports are deferred until first use."""
+
+import sys
+import os
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+from startup import measure_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_server_does_not_load_stravalib():
+    output = subprocess.run(
+        [sys.executable, "-c", "import sys, server; print('stravalib' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == "False"
+
+
+def test_list_tools_answers_after_cold_start():
+    result = measure_startup()
+    assert "get_recent_activities" in result["tools"]
+    assert result["initialize_ms"] <= result["list_tools_ms"]
@@ -0,0 +1,72 @@
+"""Tests for the activity stream cache in streams.py."""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from streams import StreamStore
+
+
+def ride_streams(seconds=3600):
+    return {
+        "time": list(range(seconds)),
+        "watts": [200 + (i % 60) for i in range(seconds)],
+        "heartrate": [140] * (seconds - 1) + [None],
+        "distance": [i * 8.0 for i in range(seconds)],
+        "latlng": [[52.0, 4.0]] * seconds,
+    }
+
+
+@pytest.fixture
+def stream_store(tmp_path):
+    return StreamStore(str(tmp_path / "streams"))
+
+
+class TestStreamStore:
+    def test_roundtrip_is_memory_mapped_and_compact(self, stream_store):
+        stream_store.save(1, ride_streams())
+        streams = stream_store.load(1)
+        assert isinstance(streams["watts"], np.memmap)
+        assert streams["watts"].dtype == np.int16
+        assert streams["watts"][59] == 259
+        assert streams["latlng"].shape == (3600, 2)
+
+    def test_missing_samples_become_zero(self, stream_store):
+        stream_store.save(1, ride_streams())
+        assert stream_store.load(1)["heartrate"][-1] == 0
+
+    def test_has_and_available_types(self, stream_store):
+        assert not stream_store.has(1)
+        stream_store.save(1, {"time": [0, 1], "heartrate": [120, 121]})
+        assert stream_store.has(1)
+        assert stream_store.available_types(1) == ["heartrate", "time"]
+        assert list(stream_store.load(1, types=["time"])) == ["time"]
+
+
+class FakeStreamClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_activity_streams(self, activity_id, types=None):
+        self.calls += 1
+        return {name: SimpleNamespace(data=data) for name, data in ride_streams().items()}
+
+
+class TestStreamsTool:
+    def test_streams_downloaded_once(self, stream_store, monkeypatch):
+        client = FakeStreamClient()
+        monkeypatch.setattr(server, "_client", client)
+        monkeypatch.setattr(server, "_stream_store", stream_store)
+
+        for _ in range(2):
+            result = asyncio.run(server.call_tool("get_activity_streams", {"activity_id": "7"}))
+        assert client.calls == 1
+        assert "3600 samples" in result[0].text
+        assert "watts: avg" in result[0].text
@@ -0,0 +1,281 @@
+"""Tests for token refresh in tokens.py."""
+
+import sys
+import os
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from rate_limit import RateLimitScheduler
+from tokens import AuthorizedSession, EnvTokenStore, TokenManager, file_lock
+
+
+class FakeRefresher:
+    """Hands out access-1, access-2, ... and counts refreshes."""
+
+    def __init__(self, delay=0.0, lifetime=6 * 3600):
+        self.delay = delay
+        self.lifetime = lifetime
+        self.calls = []
+        self.saved = []
+        self._lock = threading.Lock()
+
+    def __call__(self, refresh_token):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(refresh_token)
+            n = len(self.calls)
+        return {
+            "access_token": f"access-{n}",
+            "refresh_token": f"refresh-{n}",
+            "expires_at": int(time.time()) + self.lifetime,
+        }
+
+
+def make_manager(refresher, expires_at, access_token="access-0"):
+    return TokenManager(access_token, "refresh-0", expires_at, refresh=refresher,
+                        on_refresh=refresher.saved.append)
+
+
+class TestTokenManager:
+    def test_valid_token_not_refreshed(self):
+        refresher = FakeRefresher()
+        tokens = make_manager(refresher, time.time() + 3600)
+        assert tokens.access_token() == "access-0"
+        assert refresher.calls == []
+
+    def test_refreshes_shortly_before_expiry(self):
+        refresher = FakeRefresher()
+        tokens = make_manager(refresher, time.time() + 60)
+        assert tokens.access_token() == "access-1"
+        assert refresher.calls == ["refresh-0"]
+        # The new tokens are persisted, including the expiry
+        assert refresher.saved[0]["refresh_token"] == "refresh-1"
+        assert tokens.expires_at == refresher.saved[0]["expires_at"]
+
+    def test_unknown_expiry_uses_token_as_is(self):
+        refresher = FakeRefresher()
+        tokens = make_manager(refresher, "")
+        assert tokens.access_token() == "access-0"
+        assert refresher.calls == []
+
+    def test_concurrent_callers_share_one_refresh(self):
+        refresher = FakeRefresher(delay=0.1)
+        tokens = make_manager(refresher, time.time() - 10)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(tokens.access_token()))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert refresher.calls == ["refresh-0"]
+        assert results == ["access-1"] * 10
+
+    def test_rejected_token_refreshed_once(self):
+        refresher = FakeRefresher()
+        tokens = make_manager(refresher, None)
+        assert tokens.refresh_rejected("access-0") == "access-1"
+        # A second call that still used the old token gets the new one
+        assert tokens.refresh_rejected("access-0") == "access-1"
+        assert refresher.calls == ["refresh-0"]
+
+
+class FakeStravaOAuth:
+    """
+    Strava's token endpoint across processes, kept in a JSON file
+    Refresh tokens rotate: using one that was already exchanged fails, which
+    on the real API means the user has to authorize again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def setup(self):
+        with open(self.path, "w") as f:
+            json.dump({"refresh_token": "refresh-0", "refreshes": 0, "rejected": 0}, f)
+
+    def state(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def __call__(self, refresh_token):
+        with file_lock(self.path + ".lock"):
+            state = self.state()
+            if refresh_token != state["refresh_token"]:
+                state["rejected"] += 1
+                result = None
+            else:
+                state["refreshes"] += 1
+                n = state["refreshes"]
+                state["refresh_token"] = f"refresh-{n}"
+                result = {"access_token": f"access-{n}", "refresh_token": f"refresh-{n}",
+                          "expires_at": int(time.time()) + 6 * 3600}
+            with open(self.path, "w") as f:
+                json.dump(state, f)
+        if result is None:
+            raise ValueError("invalid refresh token")
+        time.sleep(0.02)
+        return result
+
+
+def write_env(path, access_token, refresh_token, expires_at):
+    with open(path, "w") as f:
+        f.write("STRAVA_CLIENT_ID=1\n"
+                f"STRAVA_ACCESS_TOKEN={access_token}\n"
+                f"STRAVA_REFRESH_TOKEN={refresh_token}\n"
+                f"STRAVA_TOKEN_EXPIRES_AT={expires_at}\n")
+
+
+def token_worker(env_path, oauth_path, barrier, results):
+    """One server process: a few threads asking for tokens, then a 401 on the token it got"""
+    store = EnvTokenStore(env_path)
+    initial = store.load()
+    tokens = TokenManager(initial["access_token"], initial["refresh_token"], initial["expires_at"],
+                          refresh=FakeStravaOAuth(oauth_path), store=store)
+    barrier.wait()
+
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(tokens.access_token())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every process holds the refreshed token before the 401s start
+    barrier.wait()
+    after_401 = tokens.refresh_rejected(seen[0])
+    results.put((sorted(set(seen)), after_401))
+
+
+class TestEnvTokenStore:
+    def test_save_replaces_token_lines(self, tmp_path):
+        env_path = str(tmp_path / ".env")
+        with open(env_path, "w") as f:
+            f.write("STRAVA_CLIENT_ID=1\nSTRAVA_ACCESS_TOKEN=old\nSTRAVA_REFRESH_TOKEN=old\n")
+        store = EnvTokenStore(env_path)
+
+        with store.lock():
+            store.save("new-access", "new-refresh", 1700000000)
+
+        assert store.load() == {"access_token": "new-access", "refresh_token": "new-refresh",
+                                "expires_at": 1700000000}
+        with open(env_path) as f:
+            assert f.read().count("STRAVA_TOKEN_EXPIRES_AT=") == 1
+
+    def test_refresh_by_other_process_is_taken_over(self, tmp_path):
+        env_path = str(tmp_path / ".env")
+        write_env(env_path, "access-0", "refresh-0", int(time.time()) - 10)
+        refresher = FakeRefresher()
+        tokens = TokenManager("access-0", "refresh-0", int(time.time()) - 10,
+                              refresh=refresher, store=EnvTokenStore(env_path))
+
+        # Another process refreshed after this one loaded its tokens
+        write_env(env_path, "access-9", "refresh-9", int(time.time()) + 3600)
+
+        assert tokens.access_token() == "access-9"
+        assert refresher.calls == []
+        assert tokens.adopted == 1
+
+    def test_refresh_uses_newest_stored_refresh_token(self, tmp_path):
+        env_path = str(tmp_path / ".env")
+        write_env(env_path, "access-9", "refresh-9", "")
+        refresher = FakeRefresher()
+        tokens = TokenManager("access-9", "refresh-0", None, refresh=refresher,
+                              store=EnvTokenStore(env_path))
+
+        tokens.refresh_rejected("access-9")
+        assert refresher.calls == ["refresh-9"]
+        assert EnvTokenStore(env_path).load()["access_token"] == "access-1"
+
+
+def test_processes_share_one_refresh(tmp_path):
+    env_path = str(tmp_path / ".env")
+    oauth_path = str(tmp_path / "oauth.json")
+    write_env(env_path, "access-0", "refresh-0", int(time.time()) - 10)
+    FakeStravaOAuth(oauth_path).setup()
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(6)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=token_worker, args=(env_path, oauth_path, barrier, results))
+                 for _ in range(6)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(10)
+
+    state = FakeStravaOAuth(oauth_path).state()
+    assert all(process.exitcode == 0 for process in processes)
+    # No process ever presented a rotated-out refresh token
+    assert state["rejected"] == 0
+    # One refresh for the expiry, one for the first 401 on access-1
+    assert state["refreshes"] == 2
+    assert all(seen == ["access-1"] and after_401 == "access-2" for seen, after_401 in outcomes)
+    assert EnvTokenStore(env_path).load()["refresh_token"] == "refresh-2"
+
+
+class AuthCheckingHandler(BaseHTTPRequestHandler):
+    """Answers 401 unless the bearer token is the server's current token."""
+
+    def do_GET(self):
+        state = self.server.state
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        state["seen"].append(token)
+        if token != state["valid_token"]:
+            status, body = 401, {"message": "Authorization Error"}
+        else:
+            status, body = 200, {"ok": True}
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), AuthCheckingHandler)
+    httpd.state = {"valid_token": "access-1", "seen": []}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestAuthorizedSession:
+    def test_401_refreshes_and_retries_once(self, fake_api):
+        refresher = FakeRefresher()
+        session = AuthorizedSession(RateLimitScheduler(), make_manager(refresher, None))
+
+        response = session.get(f"http://127.0.0.1:{fake_api.server_port}/api/v3/athlete",
+                               headers={"Authorization": "Bearer stale"})
+
+        assert response.status_code == 200
+        assert fake_api.state["seen"] == ["access-0", "access-1"]
+        assert refresher.calls == ["refresh-0"]
+
+    def test_persistent_401_is_returned(self, fake_api):
+        fake_api.state["valid_token"] = "never"
+        refresher = FakeRefresher()
+        session = AuthorizedSession(RateLimitScheduler(), make_manager(refresher, None))
+
+        response = session.get(f"http://127.0.0.1:{fake_api.server_port}/api/v3/athlete")
+
+        assert response.status_code == 401
+        assert len(fake_api.state["seen"]) == 2
@@ -10,7 +10,11 @@ import pytest
 # Add project root to path so we can import server functions
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import server
 from server import (
+    ewma,
+    training_load_series,
+    weekly_trends_from_series,
     calculate_training_loads,
     get_training_recommendation,
     calculate_weekly_trends,
@@ -90,6 +94,36 @@ class TestCalculateTrainingLoads:
         assert len(result["daily_loads"]) == 2
 
 
+# ── training load engine ──────────────────────────────────────────────
+
+
+class TestTrainingLoadEngine:
+    @pytest.mark.parametrize("days", [1, 7, 42])
+    def test_ewma_matches_recursive_definition(self, days):
+        # Long enough to cross several vectorization blocks
+        loads = [float((i * 37) % 150) for i in range(1000)]
+        expected, y = [], 5.0
+        for x in loads:
+            y += (x - y) / days
+            expected.append(y)
+        assert ewma(loads, days, initial=5.0) == pytest.approx(expected)
+
+    def test_series_covers_full_history(self):
+        today = datetime.now().date()
+        daily_loads = {today - timedelta(days=3 * 365): 100}
+        series = training_load_series(daily_loads)
+        assert len(series["atl"]) == 3 * 365 + 1
+        assert series["ctl"][0] == pytest.approx(100 / 42)
+
+    def test_trends_see_load_older_than_ctl_window(self):
+        # A ride 60 days ago still shows up in the week -7 CTL
+        today = datetime.now().date()
+        series = training_load_series({today - timedelta(days=60): 420})
+        trends = weekly_trends_from_series(series, weeks=8)
+        assert trends[0]["ctl"] > 0
+        assert trends[0]["week_label"] == "Week -7"
+
+
 # ── get_training_recommendation ───────────────────────────────────────
 
 
@@ -228,3 +262,96 @@ class TestGenerateWeeklyRecommendation:
     def test_returns_all_keys(self):
         result = generate_weekly_recommendation(tsb=0, atl=20, ctl=20, ramp_rate_data=None)
         assert set(result.keys()) == {"target_hours", "current_hours", "volume_advice", "plan", "intensity_note"}
+
+
+# ── persisted training load series ────────────────────────────────────
+
+
+@dataclass
+class StoredMockActivity:
+    """Activity with the fields the activity store projects."""
+    id: int
+    start_date: datetime
+    start_date_local: datetime
+    suffer_score: int | None
+    name: str = "Ride"
+    sport_type: str = "Ride"
+    distance: float = 30000.0
+    moving_time: int = 3600
+    average_heartrate: float | None = None
+
+
+class TestPersistedLoadSeries:
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        from activity_store import ActivityStore
+        store = ActivityStore(str(tmp_path / "activities.db"))
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        return store
+
+    @pytest.fixture
+    def full_recomputes(self, monkeypatch):
+        calls = []
+        original = server.training_load_series
+
+        def counting(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(server, "training_load_series", counting)
+        return calls
+
+    @staticmethod
+    def activity(activity_id, days_ago, score):
+        start = datetime.now() - timedelta(days=days_ago)
+        return StoredMockActivity(id=activity_id, start_date=start,
+                                  start_date_local=start, suffer_score=score)
+
+    @staticmethod
+    def expected(store):
+        return training_load_series(store.daily_loads())
+
+    def test_matches_full_computation(self, store):
+        store.upsert_activities([self.activity(i, i * 3, 50 + i) for i in range(40)])
+        series = server.load_training_load_series(days=56)
+        expected = self.expected(store)
+        assert series["atl"] == pytest.approx(expected["atl"][-56:])
+        assert series["ctl"] == pytest.approx(expected["ctl"][-56:])
+
+    def test_new_activity_rolls_forward(self, store, full_recomputes):
+        store.upsert_activities([self.activity(1, 10, 80)])
+        server.load_training_load_series()
+        assert len(full_recomputes) == 1
+
+        store.upsert_activities([self.activity(2, 0, 120)])
+        series = server.load_training_load_series()
+        assert len(full_recomputes) == 1
+        assert series["atl"][-1] == pytest.approx(self.expected(store)["atl"][-1])
+
+    def test_unchanged_data_is_not_recomputed(self, store, full_recomputes):
+        store.upsert_activities([self.activity(1, 5, 80)])
+        server.load_training_load_series()
+        state = store.load_series_state()
+        server.load_training_load_series()
+        assert store.load_series_state() == state
+        assert len(full_recomputes) == 1
+
+    def test_edited_older_activity_recomputes_from_that_day(self, store):
+        store.upsert_activities([self.activity(1, 30, 80), self.activity(2, 20, 60)])
+        server.load_training_load_series()
+
+        store.upsert_activities([self.activity(2, 20, 200)])
+        assert store.load_series_state()["dirty_from"] is not None
+        series = server.load_training_load_series()
+        assert series["ctl"][-1] == pytest.approx(self.expected(store)["ctl"][-1])
+        assert store.load_series_state()["dirty_from"] is None
+
+    def test_deleting_first_activity_triggers_full_recompute(self, store, full_recomputes):
+        store.upsert_activities([self.activity(1, 30, 80), self.activity(2, 20, 60)])
+        server.load_training_load_series()
+
+        store.delete_activity(1)
+        series = server.load_training_load_series()
+        assert len(full_recomputes) == 2
+        assert series["ctl"][-1] == pytest.approx(self.expected(store)["ctl"][-1])
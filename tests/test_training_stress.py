@@ -0,0 +1,125 @@
+"""Tests for stream-based training stress in training_stress.py."""
+
+import sys
+import os
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from activity_store import ActivityStore
+from training_stress import (
+    heart_rate_trimp,
+    normalized_power,
+    power_training_stress,
+    resample_1hz,
+    training_stress,
+)
+
+FTP = 250
+
+
+class TestPowerMetrics:
+    def test_constant_power_np_equals_power(self):
+        assert normalized_power(np.full(3600, 200.0)) == pytest.approx(200)
+
+    def test_variable_power_np_above_average(self):
+        watts = np.tile(np.r_[np.full(60, 400.0), np.full(60, 100.0)], 30)
+        assert normalized_power(watts) > watts.mean()
+
+    def test_one_hour_at_ftp_is_100_tss(self):
+        result = power_training_stress(np.arange(3600), np.full(3600, FTP), FTP)
+        assert result["intensity_factor"] == pytest.approx(1.0)
+        assert result["tss"] == pytest.approx(100, abs=0.1)
+
+    def test_resample_fills_short_gaps_and_drops_pauses(self):
+        time_stream = [0, 1, 4, 5, 600]
+        assert len(resample_1hz(time_stream, [1, 2, 3, 4, 5])) == 1 + 3 + 1 + 1 + 1
+
+
+class TestHeartRateFallback:
+    def test_trimp_grows_with_intensity(self):
+        seconds = np.arange(3600)
+        easy = heart_rate_trimp(seconds, np.full(3600, 120), max_hr=190, rest_hr=60)
+        hard = heart_rate_trimp(seconds, np.full(3600, 170), max_hr=190, rest_hr=60)
+        assert 0 < easy < hard
+
+    def test_heartrate_used_without_power(self):
+        streams = {"time": np.arange(3600), "heartrate": np.full(3600, 150)}
+        result = training_stress(streams, ftp=FTP)
+        assert result["method"] == "heartrate"
+        assert result["tss"] == result["trimp"] > 0
+
+    def test_power_needs_ftp(self):
+        streams = {"time": np.arange(600), "watts": np.full(600, 200), "heartrate": np.full(600, 150)}
+        assert training_stress(streams, ftp=None)["method"] == "heartrate"
+        assert training_stress(streams, ftp=FTP)["method"] == "power"
+
+    def test_no_data(self):
+        assert training_stress({"time": np.arange(10)})["method"] is None
+
+
+def test_hundreds_of_rides_compute_in_seconds():
+    rng = np.random.default_rng(1)
+    rides = [
+        {"time": np.arange(7200), "watts": rng.integers(0, 600, 7200).astype(np.int16),
+         "heartrate": rng.integers(100, 180, 7200).astype(np.int16)}
+        for _ in range(300)
+    ]
+    start = time.perf_counter()
+    for streams in rides:
+        training_stress(streams, ftp=FTP)
+    assert time.perf_counter() - start < 5
+
+
+class TestStressInTrainingLoad:
+    def test_cached_stress_replaces_suffer_score(self, tmp_path, monkeypatch):
+        store = ActivityStore(str(tmp_path / "activities.db"))
+        start = datetime.now(timezone.utc)
+        store.upsert_activities([SimpleNamespace(
+            id=1, name="Ride", sport_type="Ride", start_date=start, start_date_local=start.replace(tzinfo=None),
+            distance=40000.0, moving_time=3600, average_heartrate=150.0, average_watts=220.0, suffer_score=30,
+        )])
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "FTP", FTP)
+        monkeypatch.setattr(server, "load_activity_streams", lambda activity_id, types=None: {
+            "time": np.arange(3600), "watts": np.full(3600, FTP),
+        })
+
+        assert store.activities_needing_stress(FTP) == [1]
+        assert server.update_training_stress() == 1
+        assert store.activities_needing_stress(FTP) == []
+        # A different FTP makes the power-based value stale
+        assert store.activities_needing_stress(FTP + 10) == [1]
+
+        assert store.daily_loads()[start.date()] == pytest.approx(100, abs=0.1)
+        assert store.list_activities()[0].training_stress == pytest.approx(100, abs=0.1)
+        assert store.load_series_state()["dirty_from"] == start.date()
+
+    def test_deleted_activity_does_not_block_the_queue(self, tmp_path, monkeypatch):
+        store = ActivityStore(str(tmp_path / "activities.db"))
+        start = datetime.now(timezone.utc)
+        store.upsert_activities([SimpleNamespace(
+            id=activity_id, name="Ride", sport_type="Ride", start_date=start, start_date_local=start.replace(tzinfo=None),
+            distance=40000.0, moving_time=3600, average_heartrate=150.0, average_watts=None, suffer_score=30,
+        ) for activity_id in (1, 2)])
+
+        def fake_streams(activity_id, types=None):
+            if activity_id == 1:
+                raise requests.HTTPError("404 Not Found", response=SimpleNamespace(status_code=404))
+            return {"time": np.arange(3600), "heartrate": np.full(3600, 150.0)}
+
+        monkeypatch.setattr(server, "_store", store)
+        monkeypatch.setattr(server, "load_activity_streams", fake_streams)
+        monkeypatch.setattr(server, "sync_activities", lambda force=False: 0)
+        server.refresh_cached_data()
+
+        assert store.activities_needing_stress(server.FTP) == []
+        assert store.get_training_stress(1)["method"] is None
+        assert store.get_training_stress(2)["method"] == "heartrate"
@@ -0,0 +1,91 @@
+"""Tests for the streamable HTTP transport and the tool concurrency limit in server.py."""
+
+import sys
+import os
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from metrics import Metrics
+
+
+@pytest.fixture(autouse=True)
+def no_background_work(monkeypatch):
+    monkeypatch.setattr(server, "BACKGROUND_SYNC_INTERVAL", 0)
+    monkeypatch.setattr(server, "METRICS_FILE", None)
+
+
+def test_tool_calls_limited_while_running(monkeypatch):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_tool(name, arguments):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return []
+
+    monkeypatch.setattr(server, "run_tool", slow_tool)
+    monkeypatch.setattr(server, "MAX_CONCURRENT_TOOLS", 2)
+
+    async def calls():
+        async with server.background_services():
+            await asyncio.gather(*(server.call_tool("get_weekly_stats", {}) for _ in range(6)))
+
+    asyncio.run(calls())
+    assert peak[0] == 2
+    assert server._tool_slots is None
+
+
+@pytest.fixture
+def http_server():
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(server.http_app(), host="127.0.0.1", port=port, log_level="warning")
+    uvicorn_server = uvicorn.Server(config)
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not uvicorn_server.started and time.time() < deadline:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}/mcp"
+    uvicorn_server.should_exit = True
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+# streamablehttp_client exists in every mcp version since the 1.8.0 minimum; newer ones deprecate it
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_sessions_share_one_server(http_server, monkeypatch):
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    monkeypatch.setattr(server, "metrics", Metrics())
+
+    async def session_call(name):
+        async with streamablehttp_client(http_server) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                result = await session.call_tool(name, {})
+                return [tool.name for tool in tools.tools], result.content[0].text
+
+    tools, budget = asyncio.run(session_call("get_rate_limit_status"))
+    assert "get_recent_activities" in tools
+    assert budget.startswith("⏳ STRAVA API BUDGET")
+
+    # A second client session is served by the same warm process
+    _, metrics_text = asyncio.run(session_call("get_server_metrics"))
+    assert "get_rate_limit_status: 1 calls" in metrics_text
@@ -0,0 +1,151 @@
+"""End-to-end tests for the Strava webhook receiver."""
+
+import sys
+import os
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import server
+from activity_store import ActivityStore
+from athletes import AthletePool, create_athlete
+from webhook import WebhookReceiver
+
+VERIFY_TOKEN = "test-verify-token"
+
+
+def make_activity(activity_id, name="Morning Ride", suffer_score=40, days_ago=1):
+    start = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return SimpleNamespace(
+        id=activity_id, name=name, sport_type="Ride", start_date=start,
+        start_date_local=start.replace(tzinfo=None), distance=25000.0,
+        moving_time=3000, average_heartrate=None, suffer_score=suffer_score,
+    )
+
+
+class FakeClient:
+    def __init__(self, days_ago=1):
+        self.fetched = []
+        self.days_ago = days_ago
+
+    def get_activity(self, activity_id):
+        self.fetched.append(activity_id)
+        return make_activity(activity_id, name="Fetched Ride", days_ago=self.days_ago)
+
+    def get_athlete(self):
+        return SimpleNamespace(id=1)
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    store = ActivityStore(str(tmp_path / "activities.db"))
+    client = FakeClient()
+    # The .env athlete has tokens, so its Strava id can be asked for
+    for name in server.CREDENTIAL_VARS:
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setattr(server, "_store", store)
+    monkeypatch.setattr(server, "_client", client)
+
+    receiver = WebhookReceiver(server.apply_webhook_event, VERIFY_TOKEN, port=0)
+    receiver.start()
+    yield SimpleNamespace(store=store, client=client, receiver=receiver,
+                          url=f"http://127.0.0.1:{receiver.port}/webhook")
+    receiver.stop()
+
+
+def post_event(setup, **event):
+    request = urllib.request.Request(
+        setup.url, data=json.dumps(event).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 200
+    setup.receiver.wait_idle()
+
+
+class TestValidation:
+    def test_handshake_echoes_challenge(self, setup):
+        query = f"?hub.mode=subscribe&hub.challenge=abc123&hub.verify_token={VERIFY_TOKEN}"
+        with urllib.request.urlopen(setup.url + query) as response:
+            assert json.loads(response.read()) == {"hub.challenge": "abc123"}
+
+    def test_wrong_verify_token_rejected(self, setup):
+        query = "?hub.mode=subscribe&hub.challenge=abc123&hub.verify_token=wrong"
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(setup.url + query)
+        assert exc.value.code == 403
+
+
+class TestEvents:
+    def test_create_fetches_and_stores_activity(self, setup):
+        post_event(setup, object_type="activity", aspect_type="create", object_id=11, owner_id=1)
+        assert setup.client.fetched == [11]
+        assert setup.store.list_activities()[0].name == "Fetched Ride"
+
+    def test_backdated_create_left_to_the_backfill(self, setup):
+        setup.store.upsert_activities([make_activity(16)])
+        setup.client.days_ago = 30
+        post_event(setup, object_type="activity", aspect_type="create", object_id=17, owner_id=1)
+        assert [a.id for a in setup.store.list_activities()] == [16]
+        assert setup.store.get_details([17])[17]["name"] == "Fetched Ride"
+
+        setup.store.mark_history_complete()
+        post_event(setup, object_type="activity", aspect_type="create", object_id=17, owner_id=1)
+        assert [a.id for a in setup.store.list_activities()] == [16, 17]
+
+    def test_title_update_applied_without_fetch(self, setup):
+        setup.store.upsert_activities([make_activity(12)])
+        post_event(setup, object_type="activity", aspect_type="update", object_id=12,
+                   updates={"title": "Renamed Ride"})
+        assert setup.client.fetched == []
+        assert setup.store.list_activities()[0].name == "Renamed Ride"
+
+    def test_other_update_refetches_activity(self, setup):
+        setup.store.upsert_activities([make_activity(13)])
+        post_event(setup, object_type="activity", aspect_type="update", object_id=13,
+                   updates={"distance": 1})
+        assert setup.client.fetched == [13]
+
+    def test_delete_removes_only_that_activity(self, setup):
+        setup.store.upsert_activities([make_activity(14), make_activity(15)])
+        post_event(setup, object_type="activity", aspect_type="delete", object_id=14)
+        assert [a.id for a in setup.store.list_activities()] == [15]
+        assert setup.store.load_series_state()["dirty_from"] is not None
+
+    def test_athlete_event_ignored(self, setup):
+        post_event(setup, object_type="athlete", aspect_type="update", object_id=1,
+                   updates={"authorized": "false"})
+        assert setup.client.fetched == []
+
+    def test_events_go_to_the_owning_athlete(self, setup, tmp_path, monkeypatch):
+        clients = []
+        pool = AthletePool(str(tmp_path / "athletes"), client_factory=lambda athlete: clients.append(athlete.name))
+        create_athlete(pool.root, "bob")
+        create_athlete(pool.root, "carol")  # no tokens yet
+        monkeypatch.setattr(server, "athletes", pool)
+        bob_store = ActivityStore(os.path.join(pool.root, "bob", "strava_cache.db"))
+        bob_store.set_athlete_id(2)
+        bob_store.upsert_activities([make_activity(21)])
+        setup.store.upsert_activities([make_activity(21)])
+
+        post_event(setup, object_type="activity", aspect_type="delete", object_id=21, owner_id=2)
+        assert [a.id for a in setup.store.list_activities()] == [21]
+        assert bob_store.count() == 0
+        assert pool.loaded() == ["bob"]
+
+        # Unknown owner: carol cannot be asked without tokens, no client is built
+        post_event(setup, object_type="activity", aspect_type="create", object_id=22, owner_id=3)
+        assert setup.client.fetched == [] and setup.store.count() == 1
+        assert clients == []
+
+    def test_invalid_json_rejected(self, setup):
+        request = urllib.request.Request(setup.url, data=b"not json", method="POST")
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(request)
+        assert exc.value.code == 400
@@ -0,0 +1,201 @@
+"""OAuth token handling: proactive expiry-based refresh and 401 retry."""
+
+import contextlib
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+from rate_limit import ScheduledSession
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Refresh this many seconds before the access token expires
+REFRESH_MARGIN = 300
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on `path`, held across processes until the block exits"""
+    with open(path, 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _expiring(expires_at, margin, now):
+    return expires_at is not None and now >= expires_at - margin
+
+
+class EnvTokenStore:
+    """
+    Tokens kept in the .env file, shared by every server process on the machine
+    Writers hold lock() (a .lock file next to .env) while they read, refresh
+    and save, so a process can see that another one already rotated the tokens.
+    """
+
+    def __init__(self, env_path):
+        self.env_path = env_path
+        self.lock_path = env_path + '.lock'
+
+    def lock(self):
+        return file_lock(self.lock_path)
+
+    def load(self):
+        """{access_token, refresh_token, expires_at} as currently on disk"""
+        from dotenv import dotenv_values
+
+        values = dotenv_values(self.env_path) if os.path.exists(self.env_path) else {}
+        expires_at = values.get('STRAVA_TOKEN_EXPIRES_AT')
+        return {
+            "access_token": values.get('STRAVA_ACCESS_TOKEN') or None,
+            "refresh_token": values.get('STRAVA_REFRESH_TOKEN') or None,
+            "expires_at": int(expires_at) if expires_at else None,
+        }
+
+    def save(self, access_token, refresh_token, expires_at=None):
+        """Rewrite the token lines of .env (atomic write); call with lock() held"""
+        with open(self.env_path, 'r') as file:
+            lines = file.readlines()
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.env_path)))
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                for line in lines:
+                    if line.startswith('STRAVA_ACCESS_TOKEN='):
+                        tmp_file.write(f'STRAVA_ACCESS_TOKEN={access_token}\n')
+                    elif line.startswith('STRAVA_REFRESH_TOKEN='):
+                        tmp_file.write(f'STRAVA_REFRESH_TOKEN={refresh_token}\n')
+                    elif not line.startswith('STRAVA_TOKEN_EXPIRES_AT='):
+                        tmp_file.write(line)
+                if expires_at is not None:
+                    if lines and not lines[-1].endswith('\n'):
+                        tmp_file.write('\n')
+                    tmp_file.write(f'STRAVA_TOKEN_EXPIRES_AT={expires_at}\n')
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
+            os.replace(tmp_path, self.env_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class TokenManager:
+    """
+    Current Strava access token, refreshed shortly before it expires
+    refresh(refresh_token) returns a dict with access_token, refresh_token
+    and expires_at. Concurrent callers share a single refresh: they wait on
+    the lock and find the token already replaced when they get it.
+
+    With a `store` (EnvTokenStore) the refresh also holds the store's file
+    lock and re-reads it first, so tokens another process refreshed are
+    taken over instead of refreshed again with a rotated-out refresh token.
+    on_refresh(tokens) is called after every refresh or takeover.
+    """
+
+    def __init__(self, access_token, refresh_token, expires_at, refresh,
+                 on_refresh=None, store=None, margin=REFRESH_MARGIN, clock=time.time):
+        self._access_token = access_token
+        self._refresh_token = refresh_token
+        self.expires_at = int(expires_at) if expires_at else None
+        self.refresh = refresh
+        self.on_refresh = on_refresh
+        self.store = store
+        self.margin = margin
+        self.clock = clock
+        self.refreshes = 0
+        self.adopted = 0
+        self._lock = threading.Lock()
+
+    def _expiring(self):
+        # Unknown expiry (tokens from before expires_at was stored): rely on the 401 path
+        return _expiring(self.expires_at, self.margin, self.clock())
+
+    def _set(self, tokens):
+        self._access_token = tokens['access_token']
+        self._refresh_token = tokens['refresh_token']
+        self.expires_at = int(tokens['expires_at']) if tokens.get('expires_at') else None
+
+    def _refresh(self, reusable):
+        """Refresh under the store lock unless the stored tokens are `reusable(stored)`"""
+        with self.store.lock() if self.store is not None else contextlib.nullcontext():
+            if self.store is not None:
+                stored = self.store.load()
+                if stored['access_token'] and reusable(stored):
+                    self._set(stored)
+                    self.adopted += 1
+                    if self.on_refresh is not None:
+                        self.on_refresh(stored)
+                    return
+                # Strava rotates refresh tokens: always use the newest one
+                if stored['refresh_token']:
+                    self._refresh_token = stored['refresh_token']
+
+            print("Token expired, refreshing...", file=sys.stderr)
+            tokens = self.refresh(self._refresh_token)
+            self._set(tokens)
+            self.refreshes += 1
+            if self.store is not None:
+                self.store.save(tokens['access_token'], tokens['refresh_token'], tokens.get('expires_at'))
+        if self.on_refresh is not None:
+            self.on_refresh(tokens)
+
+    def access_token(self):
+        """A token that is valid for at least `margin` more seconds (as far as known)"""
+        if not self._expiring():
+            return self._access_token
+        with self._lock:
+            if self._expiring():
+                self._refresh(lambda stored: stored['expires_at'] is not None
+                              and not _expiring(stored['expires_at'], self.margin, self.clock()))
+            return self._access_token
+
+    def refresh_rejected(self, rejected_token):
+        """Strava answered 401 for `rejected_token`: refresh unless another call already did"""
+        with self._lock:
+            if self._access_token == rejected_token:
+                self._refresh(lambda stored: stored['access_token'] != rejected_token)
+            return self._access_token
+
+
+class AuthorizedSession(ScheduledSession):
+    """ScheduledSession that sends the managed access token and retries once on 401"""
+
+    def __init__(self, scheduler, tokens, metrics=None):
+        super().__init__(scheduler, metrics)
+        self.tokens = tokens
+
+    def request(self, method, url, *args, **kwargs):
+        if '/oauth/' in url:
+            return super().request(method, url, *args, **kwargs)
+
+        token = self.tokens.access_token()
+        kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Authorization': f'Bearer {token}'}
+        response = super().request(method, url, *args, **kwargs)
+
+        if response.status_code == 401:
+            token = self.tokens.refresh_rejected(token)
+            kwargs['headers']['Authorization'] = f'Bearer {token}'
+            response = super().request(method, url, *args, **kwargs)
+        return response
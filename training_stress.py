@@ -0,0 +1,107 @@
+"""Training stress from activity streams: NP/IF/TSS from power, TRIMP from heart rate."""
+
+import numpy as np
+
+# Rolling window for Normalized Power (seconds)
+NP_WINDOW = 30
+
+# Recording gaps up to this many seconds are filled with the last sample;
+# longer gaps are pauses and are left out
+MAX_GAP = 10
+
+# Banister TRIMP weighting factors (a, b) in a * HRr * e^(b * HRr)
+TRIMP_FACTORS = {
+    'male': (0.64, 1.92),
+    'female': (0.86, 1.67),
+}
+
+
+def resample_1hz(time, values):
+    """
+    Stream values on a 1-second grid
+    Short recording gaps are forward-filled, pauses longer than MAX_GAP
+    contribute a single sample.
+    """
+    values = np.asarray(values, dtype=float)
+    if time is None or len(time) != len(values) or len(values) < 2:
+        return values
+
+    gaps = np.diff(np.asarray(time, dtype=np.int64), append=int(time[-1]) + 1)
+    repeats = np.where((gaps >= 1) & (gaps <= MAX_GAP), gaps, 1)
+    return np.repeat(values, repeats)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over `window` samples via cumulative sums (len(values) - window + 1 results)"""
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def normalized_power(watts_1hz):
+    """Normalized Power: 4th-power mean of the 30-second rolling average power"""
+    watts_1hz = np.nan_to_num(np.asarray(watts_1hz, dtype=float))
+    if len(watts_1hz) == 0:
+        return 0.0
+    if len(watts_1hz) < NP_WINDOW:
+        return float(watts_1hz.mean())
+    rolling = rolling_mean(watts_1hz, NP_WINDOW)
+    return float(np.mean(rolling ** 4) ** 0.25)
+
+
+def power_training_stress(time, watts, ftp):
+    """Normalized Power, Intensity Factor and TSS for a power stream"""
+    watts_1hz = resample_1hz(time, watts)
+    np_watts = normalized_power(watts_1hz)
+    intensity = np_watts / ftp
+    seconds = len(watts_1hz)
+
+    return {
+        "normalized_power": round(np_watts, 1),
+        "intensity_factor": round(intensity, 3),
+        "tss": round(seconds * np_watts * intensity / (ftp * 3600) * 100, 1),
+    }
+
+
+def heart_rate_trimp(time, heartrate, max_hr, rest_hr, sex='male'):
+    """Banister TRIMP: sum over minutes of HRr * a * e^(b * HRr)"""
+    hr_1hz = resample_1hz(time, heartrate)
+    # 0 marks a missing sample in the stream cache
+    hr_1hz = hr_1hz[hr_1hz > 0]
+    if len(hr_1hz) == 0:
+        return 0.0
+
+    a, b = TRIMP_FACTORS.get(sex, TRIMP_FACTORS['male'])
+    reserve = np.clip((hr_1hz - rest_hr) / (max_hr - rest_hr), 0.0, 1.0)
+    return round(float(np.sum(reserve * a * np.exp(b * reserve)) / 60), 1)
+
+
+def training_stress(streams, ftp=None, max_hr=190, rest_hr=60, sex='male'):
+    """
+    Training stress for one activity from its streams
+    Uses power (TSS) when a watts stream and FTP are available, otherwise
+    heart rate TRIMP. Returns a dict with "method" ("power", "heartrate"
+    or None), "tss" (the load used for ATL/CTL) and the details.
+    """
+    time = streams.get('time')
+    watts = streams.get('watts')
+    heartrate = streams.get('heartrate')
+
+    result = {
+        "method": None,
+        "tss": None,
+        "normalized_power": None,
+        "intensity_factor": None,
+        "trimp": None,
+    }
+
+    if heartrate is not None and len(heartrate):
+        result["trimp"] = heart_rate_trimp(time, heartrate, max_hr, rest_hr, sex)
+
+    if ftp and watts is not None and len(watts) and np.any(np.asarray(watts) > 0):
+        result.update(power_training_stress(time, watts, ftp))
+        result["method"] = "power"
+    elif result["trimp"]:
+        result["tss"] = result["trimp"]
+        result["method"] = "heartrate"
+
+    return result
@@ -0,0 +1,110 @@
+"""Receiver for Strava webhook (push subscription) events."""
+
+import json
+import queue
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WEBHOOK_PATH = '/webhook'
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """HTTP side of the Strava push subscription protocol"""
+
+    def do_GET(self):
+        # Subscription validation: echo hub.challenge if the verify token matches
+        url = urlparse(self.path)
+        if url.path != self.server.receiver.path:
+            self._respond(404, {"error": "not found"})
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if (params.get('hub.mode') != 'subscribe'
+                or params.get('hub.verify_token') != self.server.receiver.verify_token):
+            self._respond(403, {"error": "verification failed"})
+            return
+
+        self._respond(200, {"hub.challenge": params.get('hub.challenge', '')})
+
+    def do_POST(self):
+        if urlparse(self.path).path != self.server.receiver.path:
+            self._respond(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            event = json.loads(self.rfile.read(length))
+        except (ValueError, TypeError):
+            self._respond(400, {"error": "invalid JSON"})
+            return
+
+        # Strava expects an answer within 2 seconds, so process later
+        self.server.receiver.events.put(event)
+        self._respond(200, {"status": "ok"})
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # stdout belongs to the MCP stdio transport
+        pass
+
+
+class WebhookReceiver:
+    """
+    Local HTTP endpoint for Strava webhook events
+    Validation requests are answered directly; events are queued and passed
+    one at a time to `handle_event` on a worker thread.
+    """
+
+    def __init__(self, handle_event, verify_token, host='127.0.0.1', port=8080, path=WEBHOOK_PATH):
+        self.handle_event = handle_event
+        self.verify_token = verify_token
+        self.path = path
+        self.events = queue.Queue()
+
+        self.httpd = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.httpd.receiver = self
+        self._threads = []
+
+    @property
+    def port(self):
+        return self.httpd.server_port
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self.httpd.serve_forever, name='strava-webhook-http', daemon=True),
+            threading.Thread(target=self._process_events, name='strava-webhook-events', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _process_events(self):
+        while True:
+            event = self.events.get()
+            try:
+                if event is None:
+                    return
+                self.handle_event(event)
+            except Exception as e:
+                print(f"Webhook event failed: {e}", file=sys.stderr)
+            finally:
+                self.events.task_done()
+
+    def wait_idle(self):
+        """Block until every received event has been handled"""
+        self.events.join()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.events.put(None)
+        for thread in self._threads:
+            thread.join(5)